@@ -13,22 +13,112 @@ DB_NAME = os.getenv("DB_NAME", "e_nose_db")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-import threading
-
-# Status untuk setiap sensor (threading.Event)
-sensor_status = {
-    "mq135": threading.Event(),
-    "mq2": threading.Event(),
-    "mq4": threading.Event(),
-    "mq7": threading.Event(),
-    "all": threading.Event()
-}
-
-# Thread untuk setiap sensor
-sensor_threads = {
-    "mq135": None,
-    "mq2": None,
-    "mq4": None,
-    "mq7": None,
-    "all": None
-}
+# Backend pembacaan sensor: "ads1115" (hardware I2C) atau "replay" (rekaman data/*.csv)
+SENSOR_BACKEND = os.getenv("SENSOR_BACKEND", "ads1115")
+# File rekaman untuk replay, dipisah koma (boleh pola glob)
+REPLAY_FILES = os.getenv("REPLAY_FILES", "data/arabika100.csv,data/robusta100.csv")
+# Kecepatan replay: 1 = real time, N = N kali lebih cepat, 0 = satu baris per pembacaan
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))
+
+# Scheduler scan ADS1115
+ADS_DATA_RATE = int(os.getenv("ADS_DATA_RATE", "860"))  # SPS: 8, 16, 32, 64, 128, 250, 475, 860
+ADS_CONTINUOUS = os.getenv("ADS_CONTINUOUS", "1") == "1"  # mode konversi kontinu
+ADS_SCAN_INTERVAL = float(os.getenv("ADS_SCAN_INTERVAL", "0.1"))  # jeda antar scan P0-P3 (detik)
+ADS_MAX_AGE = float(os.getenv("ADS_MAX_AGE", "2.0"))  # umur maksimum nilai valid terakhir (detik)
+ADS_GAIN = os.getenv("ADS_GAIN", "1")  # PGA: 2/3 (±6.144 V), 1 (±4.096 V), 2, 4, 8, 16
+# Oversampling per scan: K konversi per channel digabung jadi satu nilai (1 = tanpa oversampling),
+# filter "median" atau "mean", ambang outlier dalam kelipatan MAD (0 = nonaktif), minimum konversi valid
+OVERSAMPLE_K = int(os.getenv("OVERSAMPLE_K", "1"))
+OVERSAMPLE_FILTER = os.getenv("OVERSAMPLE_FILTER", "median")
+OVERSAMPLE_REJECT = float(os.getenv("OVERSAMPLE_REJECT", "3.5"))
+OVERSAMPLE_MIN_VALID = int(os.getenv("OVERSAMPLE_MIN_VALID", "1"))
+# Penyimpanan sampel lokal: "volts" (kolom float) atau "raw" (hitungan ADC int16 + rentang PGA,
+# dikonversi ke volt saat dibaca)
+SENSOR_STORAGE = os.getenv("SENSOR_STORAGE", "volts")
+# Ringkasan sesi pengukuran: baseline = median N detik pertama, steady-state = rata-rata N detik terakhir
+SESSION_BASELINE_SECONDS = float(os.getenv("SESSION_BASELINE_SECONDS", "10"))
+SESSION_STEADY_SECONDS = float(os.getenv("SESSION_STEADY_SECONDS", "30"))
+
+# Writer ingest: batch insert + jurnal disk saat database tidak tersedia
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "1.0"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_JOURNAL_PATH = os.getenv("INGEST_JOURNAL_PATH", "spool/ingest_journal.ndjson")
+# Sampel yang ditolak database (constraint/data tidak valid) dipisahkan ke sini agar jurnal tetap terkuras
+INGEST_DEAD_LETTER_PATH = os.getenv("INGEST_DEAD_LETTER_PATH", "spool/ingest_dead_letter.ndjson")
+
+# Nama sensor yang bisa dijalankan lewat /sensor/start/{sensor}
+SENSOR_NAMES = ("mq135", "mq2", "mq4", "mq7", "all")
+
+# Periode tick engine akuisisi (detik)
+ACQ_PERIOD = float(os.getenv("ACQ_PERIOD", "1.0"))
+
+# WebSocket /sensor/ws: ukuran antrian per klien dan batas waktu kirim sebelum klien diputus
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "1"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+
+# Ring buffer sampel terbaru di memori (detik); kapasitas = RING_BUFFER_SECONDS / ACQ_PERIOD sampel
+RING_BUFFER_SECONDS = float(os.getenv("RING_BUFFER_SECONDS", "600"))
+
+# Ekspor CSV berkala (export_loop)
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/home/Yehezkiel/E-Nose-Backend/data")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Arsip Parquet (opsional, butuh pyarrow): dipartisi per tanggal dan label
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+# Klasifikasi aroma lokal (kNN NumPy) untuk kolom jenis
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", "models/aroma_knn.npz")
+CLASSIFIER_TRAIN_FILES = os.getenv("CLASSIFIER_TRAIN_FILES", "data/arabika*.csv,data/robusta*.csv,data/*%*.csv")
+
+# Jendela fitur bergulir (detik), dipisah koma
+FEATURE_WINDOWS = tuple(float(w) for w in os.getenv("FEATURE_WINDOWS", "10,60").split(",") if w.strip())
+
+# Store dataset latih terkompilasi (memmap .npy), dibangun ulang bila file sumber berubah
+DATASET_SOURCES = os.getenv("DATASET_SOURCES", "data/*")
+DATASET_DIR = os.getenv("DATASET_DIR", "cache/dataset")
+
+# AI klasifikasi: "remote" (skrip di AI_SERVER_URL) atau "local" (process pool di backend ini)
+AI_MODE = os.getenv("AI_MODE", "remote")
+AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://192.168.129.105:8001")
+# Micro-batch inferensi lokal: ukuran batch, batas tunggu (detik), jumlah proses worker
+INFER_BATCH_SIZE = int(os.getenv("INFER_BATCH_SIZE", "64"))
+INFER_MAX_WAIT = float(os.getenv("INFER_MAX_WAIT", "0.5"))
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", "1"))
+INFER_QUEUE_SIZE = int(os.getenv("INFER_QUEUE_SIZE", "10000"))
+# Klien AI server remote: timeout (detik), retry + backoff, circuit breaker, pool koneksi
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "2.0"))
+AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "5.0"))
+AI_RETRIES = int(os.getenv("AI_RETRIES", "2"))
+AI_BACKOFF = float(os.getenv("AI_BACKOFF", "0.2"))
+AI_BREAKER_THRESHOLD = int(os.getenv("AI_BREAKER_THRESHOLD", "5"))
+AI_BREAKER_RESET = float(os.getenv("AI_BREAKER_RESET", "30"))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "10"))
+
+# Identitas e-nose lokal (kolom device_id) dan batas ukuran batch POST /sensor/ingest (sampel dan byte body)
+DEVICE_ID = os.getenv("DEVICE_ID", "local")
+DEVICE_INGEST_MAX_SAMPLES = int(os.getenv("DEVICE_INGEST_MAX_SAMPLES", "20000"))
+DEVICE_INGEST_MAX_BYTES = int(os.getenv("DEVICE_INGEST_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Partisi harian sensor_data: jumlah hari partisi dibuat di muka, retensi (hari, 0 = simpan selamanya),
+# pemadatan data mentah lebih tua dari N hari (0 = nonaktif) ke rata-rata per COMPACT_BUCKET_SECONDS
+PARTITION_AHEAD_DAYS = int(os.getenv("PARTITION_AHEAD_DAYS", "7"))
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))
+COMPACT_AFTER_DAYS = int(os.getenv("COMPACT_AFTER_DAYS", "0"))
+COMPACT_BUCKET_SECONDS = int(os.getenv("COMPACT_BUCKET_SECONDS", "10"))
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+
+# Sink log API (tabel api_logs): ukuran batch INSERT, interval flush (detik), kapasitas antrian,
+# jumlah entri terakhir di memori untuk dashboard, dan sampling log per sampel (1 = semua, 0 = tidak dicatat)
+API_LOG_BATCH_SIZE = int(os.getenv("API_LOG_BATCH_SIZE", "500"))
+API_LOG_FLUSH_INTERVAL = float(os.getenv("API_LOG_FLUSH_INTERVAL", "2.0"))
+API_LOG_QUEUE_SIZE = int(os.getenv("API_LOG_QUEUE_SIZE", "10000"))
+API_LOG_RECENT = int(os.getenv("API_LOG_RECENT", "50"))
+API_LOG_SAMPLE_EVERY = int(os.getenv("API_LOG_SAMPLE_EVERY", "60"))
+
+# Kalibrasi sensor MQ: file R0 per perangkat, resistor beban modul (kΩ), tegangan suplai pemanas/pembagi (V),
+# dan jumlah minimum sampel udara bersih yang valid per sensor untuk menghitung R0
+CALIBRATION_PATH = os.getenv("CALIBRATION_PATH", "models/calibration.json")
+MQ_LOAD_KOHM = float(os.getenv("MQ_LOAD_KOHM", "10.0"))
+MQ_SUPPLY_VOLTAGE = float(os.getenv("MQ_SUPPLY_VOLTAGE", "5.0"))
+CALIBRATION_MIN_SAMPLES = int(os.getenv("CALIBRATION_MIN_SAMPLES", "30"))
@@ -1,8 +1,11 @@
+import argparse
 import logging
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.database import Base
-from app.models import SensorData, ApiLogs
+from app.models import SensorData, ApiLogs, SensorRollup, MeasurementSession
+from app.services.partitions import ensure_partitions, is_partitioned
+from app.config import PARTITION_AHEAD_DAYS
 
 # Konfigurasi logging
 logging.basicConfig(level=logging.INFO)
@@ -26,15 +29,30 @@ except Exception as e:
     logger.error(f"❌ Gagal membuat engine database: {e}")
     raise
 
-def init_db():
+def init_db(reset: bool = False):
     try:
-        # Buat semua tabel yang didefinisikan di models
-        Base.metadata.drop_all(bind=engine)  # Hapus tabel lama
+        if reset:
+            # Hapus tabel lama hanya bila diminta eksplisit
+            Base.metadata.drop_all(bind=engine)
+        # Buat tabel yang belum ada; sensor_data berpartisi harian + partisi default
         Base.metadata.create_all(bind=engine)
-        logger.info("✅ Tabel database berhasil dibuat: sensor_data, api_logs")
+        db = SessionLocal()
+        try:
+            # Tabel sensor_data lama (tanpa partisi) tidak diubah oleh create_all; partisi baru
+            # hanya dibuat setelah dimigrasi
+            partitioned = is_partitioned(db)
+            created = ensure_partitions(db, PARTITION_AHEAD_DAYS) if partitioned else []
+        finally:
+            db.close()
+        if not partitioned:
+            logger.warning("⚠️ sensor_data belum berpartisi; jalankan: python -m app.services.partitions migrate")
+        logger.info(f"✅ Tabel database siap: sensor_data ({len(created)} partisi baru), api_logs, sensor_rollup, measurement_session")
     except Exception as e:
         logger.error(f"❌ Gagal membuat tabel database: {e}")
         raise
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Membuat tabel database")
+    parser.add_argument("--reset", action="store_true", help="Hapus semua tabel (dan datanya) lebih dulu")
+    args = parser.parse_args()
+    init_db(reset=args.reset)
\ No newline at end of file
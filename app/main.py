@@ -1,65 +1,163 @@
 import time
 import threading
+import asyncio
 import os
 from datetime import datetime
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from app.database import SessionLocal, get_db
+from app.database import SessionLocal
 from app.routes.sensor import router as sensor_router
 from app.services import sensor_service
-from app.services.sensor_reader import baca_sensor, start_sensor, stop_sensor, stop_all_sensors
-from app.schemas.sensor import SensorCreate
-from fastapi.responses import HTMLResponse
+from app.services.sensor_reader import SENSORS, baca_channels, scheduler
+from app.services.ingest_writer import IngestWriter
+from app.services.acquisition import AcquisitionEngine
+from app.services.broadcaster import broadcaster
+from app.services.ring_buffer import ring_buffer
+from app.services.features import feature_stage
+from app.services.inference import inference_service
+from app.services.ai_gateway import ai_gateway
+from app.services.partitions import PartitionMaintainer
+from app.services.log_sink import api_log_sink
+from app.services.sessions import session_manager
+from app.services.metrics import registry, QUEUE_DEPTH, HTTP_REQUEST_SECONDS
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import logging
-from app.config import sensor_status, sensor_threads
+from app.config import (
+    SENSOR_NAMES, ACQ_PERIOD, EXPORT_DIR, EXPORT_BATCH_SIZE,
+    INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_QUEUE_SIZE, INGEST_JOURNAL_PATH, INGEST_DEAD_LETTER_PATH,
+    PARTITION_AHEAD_DAYS, RETENTION_DAYS, COMPACT_AFTER_DAYS, COMPACT_BUCKET_SECONDS, MAINTENANCE_INTERVAL,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Writer tunggal untuk semua thread sensor (batch insert + jurnal disk)
+ingest_writer = IngestWriter(
+    SessionLocal,
+    batch_size=INGEST_BATCH_SIZE,
+    flush_interval=INGEST_FLUSH_INTERVAL,
+    queue_size=INGEST_QUEUE_SIZE,
+    journal_path=INGEST_JOURNAL_PATH,
+    dead_letter_path=INGEST_DEAD_LETTER_PATH,
+    log_sink=api_log_sink,
+)
+def on_committed(samples):
+    # Id hasil commit ditempelkan ke ring buffer, lalu sampel diteruskan ke inferensi lokal
+    # (no-op bila tidak berjalan)
+    ring_buffer.attach_ids(samples)
+    inference_service.submit_samples(samples)
+
+ingest_writer.commit_hook = on_committed
+
+# Kedalaman antrian dibaca saat /metrics di-scrape
+QUEUE_DEPTH.labels(queue="ingest").set_function(ingest_writer.queue.qsize)
+QUEUE_DEPTH.labels(queue="api_log").set_function(api_log_sink.queue.qsize)
+QUEUE_DEPTH.labels(queue="inference").set_function(inference_service.queue.qsize)
+
+def ingest_sample(mask, writer: IngestWriter):
+    # Satu tick akuisisi: baca channel dalam mask -> klasifikasi -> serahkan ke writer (tanpa menunggu DB)
+    channels = list(SENSORS) if "all" in mask else [s for s in SENSORS if s in mask]
+    sensor_data = baca_channels(channels)
+    sensor_data["jenis"] = sensor_service.tentukan_jenis(sensor_data)
+    sample = {
+        "timestamp": sensor_data["timestamp"],
+        "mq135": sensor_data["mq135"],
+        "mq2": sensor_data["mq2"],
+        "mq4": sensor_data["mq4"],
+        "mq7": sensor_data["mq7"],
+        "jenis": sensor_data["jenis"]
+    }
+    if "raw" in sensor_data:
+        # SENSOR_STORAGE=raw: writer menyimpan hitungan int16 + rentang PGA, bukan volt
+        sample["raw"] = sensor_data["raw"]
+        sample["adc_fsr_mv"] = sensor_data["adc_fsr_mv"]
+    # Sampel ditandai sesi pengukuran aktif; ringkasan sesi dikumpulkan di memori
+    sample["session_id"] = session_manager.observe(sample)
+    # Fitur bergulir diperbarui per tick (O(1)), dibaca lewat /sensor/features/latest
+    feature_stage.update([sample[ch] for ch in SENSORS])
+    # Nomor urut ring buffer ikut ke writer agar id hasil commit bisa ditempelkan kembali
+    sample["buffer_seq"] = ring_buffer.append(sample)
+    writer.submit(sample)
+    broadcaster.publish(ring_buffer.latest())
+    logger.debug("✅ Data %s diantrikan: %s", sorted(mask), sample)
+    return sample
+
+# Partisi harian sensor_data: dibuat di muka, retensi dan pemadatan berkala
+partition_maintainer = PartitionMaintainer(
+    SessionLocal,
+    interval=MAINTENANCE_INTERVAL,
+    ahead_days=PARTITION_AHEAD_DAYS,
+    retention_days=RETENTION_DAYS,
+    compact_after_days=COMPACT_AFTER_DAYS,
+    compact_bucket=COMPACT_BUCKET_SECONDS,
+)
+
+# Satu engine akuisisi untuk semua sensor; sensor aktif = mask engine
+acquisition = AcquisitionEngine(
+    lambda mask: ingest_sample(mask, ingest_writer),
+    period=ACQ_PERIOD,
+    on_active=scheduler.start,
+    on_idle=scheduler.stop,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    broadcaster.bind(asyncio.get_running_loop())
+    api_log_sink.start()
+    # Klien AI bersama (pool keep-alive) dibuat sekali untuk seluruh request
+    await ai_gateway.start()
+    partition_maintainer.start()
+    ingest_writer.start()
+    # Sesi yang tertinggal terbuka (crash/restart) diringkas dari sensor_data
+    await asyncio.to_thread(session_manager.recover)
+    acquisition.start()
+    yield
+    acquisition.stop()
+    await asyncio.to_thread(session_manager.close)
+    # Sisa antrian disimpan sebelum aplikasi berhenti
+    ingest_writer.stop()
+    inference_service.stop()
+    await ai_gateway.close()
+    partition_maintainer.stop()
+    api_log_sink.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 app.include_router(sensor_router)
 templates = Jinja2Templates(directory="app/templates")
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label memakai template route (/sensor/start/{sensor}), bukan path mentah
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        ).observe(time.perf_counter() - started)
+
 # Thread untuk ekspor
 export_thread = None
 
-def sensor_loop(sensor_name: str):
-    while True:
-        if not sensor_status[sensor_name].is_set():
-            break
-        db = SessionLocal()
-        try:
-            sensor_data = baca_sensor(sensor_name if sensor_name != "all" else None)
-            sensor_data["jenis"] = sensor_service.tentukan_jenis(sensor_data)
-            sensor_model = SensorCreate(**{
-                "timestamp": sensor_data["timestamp"],
-                "mq135": float(sensor_data["mq135"]) if sensor_data.get("mq135") else None,
-                "mq2": float(sensor_data["mq2"]) if sensor_data.get("mq2") else None,
-                "mq4": float(sensor_data["mq4"]) if sensor_data.get("mq4") else None,
-                "mq7": float(sensor_data["mq7"]) if sensor_data.get("mq7") else None,
-                "jenis": sensor_data["jenis"]
-            })
-            sensor_service.create_sensor_data(db, sensor_model)
-            logger.info(f"✅ Data {sensor_name} tersimpan: {sensor_data}")
-        except Exception as e:
-            logger.error(f"❌ Gagal menyimpan data {sensor_name}: {e}")
-        finally:
-            db.close()
-        time.sleep(1)
-
 def export_loop():
     db = SessionLocal()
-    output_dir = "/home/Yehezkiel/E-Nose-Backend/data"
+    output_dir = EXPORT_DIR
     os.makedirs(output_dir, exist_ok=True)
     while True:
-        if not any(sensor_status[s].is_set() for s in sensor_status):
+        if not acquisition.is_active():
             break
         try:
-            result = sensor_service.export_sensor_data_to_csv(db, output_dir)
+            result = sensor_service.export_sensor_data_to_csv(db, output_dir, EXPORT_BATCH_SIZE)
             logger.info(f"✅ {result['message']}")
         except Exception as e:
             logger.error(f"❌ Gagal ekspor data: {e}")
@@ -67,87 +165,89 @@ def export_loop():
     db.close()
 
 @app.get("/", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
-    api_logs = sensor_service.get_logs_api(db)
+def dashboard(request: Request):
+    # Log terakhir dari memori sink, tanpa query api_logs per halaman
+    api_logs = api_log_sink.recent_logs(10)
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
         "api_logs": api_logs
     })
 
+@app.get("/sensor/ingest/status")
+def ingest_status():
+    return {
+        **ingest_writer.stats,
+        "queue_depth": ingest_writer.queue.qsize(),
+        "journal_bytes": ingest_writer.journal_size(),
+        "dead_letter_bytes": ingest_writer.dead_letter_size(),
+    }
+
+@app.get("/sensor/logs/status")
+def logs_status():
+    return {**api_log_sink.stats, "queue_depth": api_log_sink.queue.qsize(), "recent": len(api_log_sink.recent)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Format teks Prometheus untuk scrape
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/sensor/adc/status")
+def adc_status():
+    return scheduler.stats()
+
+@app.get("/sensor/ws/status")
+def ws_status():
+    return {**broadcaster.stats, "subscribers": broadcaster.subscriber_count()}
+
+@app.get("/sensor/acquisition/status")
+def acquisition_status():
+    return acquisition.stats()
+
 @app.post("/sensor/start/{sensor}")
-async def start_sensor_endpoint(sensor: str, db: Session = Depends(get_db)):
+async def start_sensor_endpoint(sensor: str):
     global export_thread
-    if sensor not in sensor_status:
+    if sensor not in SENSOR_NAMES:
         return {"error": f"Sensor {sensor} tidak valid"}
 
-    # Jika "all" dimulai, hentikan semua sensor individu
-    if sensor == "all":
-        for s in ["mq135", "mq2", "mq4", "mq7"]:
-            if sensor_status[s].is_set():
-                stop_sensor(s)
-                sensor_status[s].clear()
-                if sensor_threads[s]:
-                    sensor_threads[s].join(timeout=5.0)
-                    sensor_threads[s] = None
-    else:
-        # Jika sensor individu dimulai, hentikan "all"
-        if sensor_status["all"].is_set():
-            stop_sensor("all")
-            sensor_status["all"].clear()
-            if sensor_threads["all"]:
-                sensor_threads["all"].join(timeout=5.0)
-                sensor_threads["all"] = None
-
-    if sensor_status[sensor].is_set():
+    current = acquisition.mask
+    if sensor in current:
         return {"message": f"Sensor {sensor.upper()} sudah berjalan!"}
 
-    try:
-        start_sensor(sensor)
-        sensor_status[sensor].set()
-        sensor_threads[sensor] = threading.Thread(target=sensor_loop, args=(sensor,), daemon=True)
-        sensor_threads[sensor].start()
-    except Exception as e:
-        logger.error(f"❌ Gagal memulai sensor {sensor}: {e}")
-        return {"error": f"Gagal memulai sensor: {e}"}
+    # "all" menggantikan sensor individu, sensor individu menggantikan "all"
+    if sensor == "all":
+        mask = {"all"}
+    else:
+        mask = (set(current) - {"all"}) | {sensor}
+    # Sesi pengukuran dibuat saat akuisisi mulai dari keadaan diam; sensor tambahan ikut sesi yang sama
+    session_id = await asyncio.to_thread(session_manager.open, mask)
+    acquisition.set_mask(mask)
 
     if not export_thread or not export_thread.is_alive():
         export_thread = threading.Thread(target=export_loop, daemon=True)
         export_thread.start()
 
     logger.info(f"Sensor {sensor.upper()} dimulai")
-    return {"message": f"Sensor {sensor.upper()} mulai mengambil data!"}
+    return {"message": f"Sensor {sensor.upper()} mulai mengambil data!", "session_id": session_id}
 
 @app.post("/sensor/stop/{sensor}")
-async def stop_sensor_endpoint(sensor: str, db: Session = Depends(get_db)):
-    if sensor not in sensor_status:
+async def stop_sensor_endpoint(sensor: str):
+    if sensor not in SENSOR_NAMES:
         return {"error": f"Sensor {sensor} tidak valid"}
 
-    try:
-        stop_sensor(sensor)
-        sensor_status[sensor].clear()
-        if sensor_threads[sensor]:
-            sensor_threads[sensor].join(timeout=5.0)
-            sensor_threads[sensor] = None
-        logger.info(f"Sensor {sensor.upper()} dihentikan")
-        return {"message": f"Sensor {sensor.upper()} berhenti mengambil data!"}
-    except Exception as e:
-        logger.error(f"❌ Gagal menghentikan sensor {sensor}: {e}")
-        return {"error": f"Gagal menghentikan sensor: {e}"}
+    # "all" dijabarkan ke sensor individu agar satu channel bisa dihentikan; stop/all menghentikan semuanya
+    active = set(SENSORS) if "all" in acquisition.mask else set(acquisition.mask)
+    acquisition.set_mask(set() if sensor == "all" else active - {sensor})
+    logger.info(f"Sensor {sensor.upper()} dihentikan")
+    # Sensor terakhir berhenti: sesi ditutup dan ringkasannya dihitung
+    session = await asyncio.to_thread(session_manager.close) if not acquisition.mask else None
+    return {"message": f"Sensor {sensor.upper()} berhenti mengambil data!", "session": session}
 
 @app.post("/sensor/stop")
-async def stop_all_sensors_endpoint(db: Session = Depends(get_db)):
-    try:
-        stop_all_sensors()
-        for sensor in sensor_status:
-            sensor_status[sensor].clear()
-            if sensor_threads[sensor]:
-                sensor_threads[sensor].join(timeout=5.0)
-                sensor_threads[sensor] = None
-        logger.info("Semua sensor dihentikan")
-        return {"message": "Semua sensor berhenti mengambil data!"}
-    except Exception as e:
-        logger.error(f"❌ Gagal menghentikan semua sensor: {e}")
-        return {"error": f"Gagal menghentikan semua sensor: {e}"}
+async def stop_all_sensors_endpoint():
+    acquisition.set_mask(())
+    logger.info("Semua sensor dihentikan")
+    session = await asyncio.to_thread(session_manager.close)
+    return {"message": "Semua sensor berhenti mengambil data!", "session": session}
 
 # Konfigurasi CORS
 app.add_middleware(
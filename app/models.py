@@ -1,16 +1,29 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, SmallInteger, Float, String, DateTime, Boolean, Text, Index, DDL, event, text
 from sqlalchemy.sql import func
 from app.database import Base
 
 class SensorData(Base):
     __tablename__ = "sensor_data"
 
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # PK komposit (id, timestamp): PostgreSQL mewajibkan kunci partisi ada di primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
+    # E-nose asal sampel; "local" = ADS1115 yang terpasang di backend ini
+    device_id = Column(String(64), nullable=False, server_default="local")
     mq135 = Column(Float, nullable=True)
     mq2 = Column(Float, nullable=True)
     mq4 = Column(Float, nullable=True)
     mq7 = Column(Float, nullable=True)
+    # SENSOR_STORAGE=raw: hitungan ADC int16 per channel + rentang PGA (mV), kolom volt dibiarkan NULL.
+    # Tegangan = hitungan * adc_fsr_mv / 32767000 (lihat app/services/adc.py)
+    mq135_raw = Column(SmallInteger, nullable=True)
+    mq2_raw = Column(SmallInteger, nullable=True)
+    mq4_raw = Column(SmallInteger, nullable=True)
+    mq7_raw = Column(SmallInteger, nullable=True)
+    adc_fsr_mv = Column(SmallInteger, nullable=True)
+    # Sesi pengukuran (start -> stop) asal sampel; tanpa foreign key agar batch insert/COPY
+    # dan pemadatan partisi tidak terbebani pengecekan constraint
+    session_id = Column(Integer, nullable=True)
     
     # Kolom AI hasil klasifikasi
     jenis = Column(String, nullable=True)  # Contoh: "Arabika", "Robusta", "Campuran"
@@ -18,6 +31,26 @@ class SensorData(Base):
     
     exported = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Index parsial: ekspor hanya memindai baris yang belum diekspor, urut id
+        Index("ix_sensor_data_unexported", "id", postgresql_where=text("exported = false")),
+        # Riwayat per perangkat: filter device_id + rentang waktu
+        Index("ix_sensor_data_device_timestamp", "device_id", "timestamp"),
+        # Sampel satu sesi pengukuran (ringkasan ulang, ekspor per sesi)
+        Index("ix_sensor_data_session", "session_id", "timestamp"),
+        # Dipartisi harian per timestamp (lihat app/services/partitions.py)
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+# Partisi default menampung baris yang belum punya partisi harian, sehingga
+# insert tidak pernah gagal walau job maintenance belum membuat partisinya
+event.listen(
+    SensorData.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS sensor_data_default PARTITION OF sensor_data DEFAULT")
+    .execute_if(dialect="postgresql"),
+)
+
 class ApiLogs(Base):
     __tablename__ = "api_logs"
 
@@ -27,3 +60,61 @@ class ApiLogs(Base):
     status_code = Column(Integer)
     response = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+class SensorRollup(Base):
+    # Agregat sensor_data per bucket waktu (10 detik, 1 menit, 5 menit, 1 jam)
+    __tablename__ = "sensor_rollup"
+
+    resolution = Column(Integer, primary_key=True)  # Lebar bucket dalam detik
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Awal bucket
+    samples = Column(Integer, nullable=False, default=0)
+
+    mq135_sum = Column(Float, nullable=True)
+    mq135_count = Column(Integer, nullable=False, default=0)
+    mq135_min = Column(Float, nullable=True)
+    mq135_max = Column(Float, nullable=True)
+    mq2_sum = Column(Float, nullable=True)
+    mq2_count = Column(Integer, nullable=False, default=0)
+    mq2_min = Column(Float, nullable=True)
+    mq2_max = Column(Float, nullable=True)
+    mq4_sum = Column(Float, nullable=True)
+    mq4_count = Column(Integer, nullable=False, default=0)
+    mq4_min = Column(Float, nullable=True)
+    mq4_max = Column(Float, nullable=True)
+    mq7_sum = Column(Float, nullable=True)
+    mq7_count = Column(Integer, nullable=False, default=0)
+    mq7_min = Column(Float, nullable=True)
+    mq7_max = Column(Float, nullable=True)
+
+    jenis = Column(String, nullable=True)  # Label terakhir di bucket
+
+class MeasurementSession(Base):
+    # Satu pengukuran sampel kopi: dari /sensor/start sampai semua sensor dihentikan
+    __tablename__ = "measurement_session"
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(64), nullable=False, server_default="local")
+    sensors = Column(String, nullable=True)  # Mask saat dimulai, mis. "all" atau "mq135,mq2"
+    started_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    ended_at = Column(DateTime(timezone=True), nullable=True)
+    samples = Column(Integer, nullable=False, default=0)
+
+    # Ringkasan per channel, dihitung sekali saat sesi ditutup (volt, time_to_peak dalam detik)
+    mq135_baseline = Column(Float, nullable=True)
+    mq135_peak = Column(Float, nullable=True)
+    mq135_steady = Column(Float, nullable=True)
+    mq135_time_to_peak = Column(Float, nullable=True)
+    mq2_baseline = Column(Float, nullable=True)
+    mq2_peak = Column(Float, nullable=True)
+    mq2_steady = Column(Float, nullable=True)
+    mq2_time_to_peak = Column(Float, nullable=True)
+    mq4_baseline = Column(Float, nullable=True)
+    mq4_peak = Column(Float, nullable=True)
+    mq4_steady = Column(Float, nullable=True)
+    mq4_time_to_peak = Column(Float, nullable=True)
+    mq7_baseline = Column(Float, nullable=True)
+    mq7_peak = Column(Float, nullable=True)
+    mq7_steady = Column(Float, nullable=True)
+    mq7_time_to_peak = Column(Float, nullable=True)
+
+    final_jenis = Column(String, nullable=True)  # Label terbanyak di jendela steady-state
@@ -1,21 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import SensorData
+from ..database import get_db, SessionLocal
+from ..models import SensorData, MeasurementSession
+from ..services.broadcaster import broadcaster
+from ..services.ring_buffer import ring_buffer
+from ..services.rollup import query_rollups, rebuild_rollups, pick_bucket
+from ..services.downsample import downsample_rows
+from ..services.sensor_service import (
+    iter_sensor_export, EXPORT_FORMATS, parse_classification, apply_classifications,
+)
+from ..services.features import feature_stage
+from ..services.inference import inference_service
+from ..services import device_ingest
+from ..services.partitions import delete_range, is_partitioned, list_partitions
+from ..services.ai_gateway import ai_gateway, AIGatewayError, CircuitOpenError
+from ..services.adc import volt_columns
+from ..services.sessions import session_manager, session_to_dict
+from ..services.calibration import (
+    CHANNELS as CALIBRATION_CHANNELS, CURVES, calibration_store, calibrate_r0, capture_from_db, json_safe,
+    save_capture,
+)
+from typing import List, Optional
+from ..config import WS_SEND_TIMEOUT, AI_MODE, DEVICE_INGEST_MAX_SAMPLES, DEVICE_INGEST_MAX_BYTES, DEVICE_ID
 import json
+import time
 import asyncio
+import numpy as np
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import pytz
-import httpx
 
 router = APIRouter(prefix="/sensor", tags=["sensor"])
 logger = logging.getLogger(__name__)
 active_connections = []
 
+# Rentang riwayat panjang yang dilayani dari tabel rollup
+HISTORY_RANGES = {
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "24h": timedelta(days=1),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
 @router.get("/latest")
 async def get_latest_sensor_data(db: Session = Depends(get_db)):
-    latest_data = db.query(SensorData).order_by(SensorData.timestamp.desc()).first()
+    # Sampel terbaru dari ring buffer; id None sampai writer meng-commit batch-nya (paling lama
+    # INGEST_FLUSH_INTERVAL detik)
+    latest = ring_buffer.latest()
+    if latest:
+        return latest
+    latest_data = db.query(
+        SensorData.id, SensorData.timestamp, *volt_columns(), SensorData.jenis, SensorData.ai_classification
+    ).order_by(SensorData.timestamp.desc()).first()
     if latest_data:
         ai_classification_json = {}
         if latest_data.ai_classification:
@@ -35,82 +73,313 @@ async def get_latest_sensor_data(db: Session = Depends(get_db)):
         }
     return {"error": "No data available"}
 
+@router.get("/features/latest")
+def get_latest_features():
+    # Vektor fitur bergulir dari tick terakhir (mean/std/slope/min/max/rise per jendela + rasio)
+    features = feature_stage.latest_dict()
+    if features is None:
+        return {"error": "No feature data available"}
+    return {"windows": list(feature_stage.window_seconds), "features": features}
+
+@router.get("/calibration")
+def get_calibration():
+    # R0 tersimpan per perangkat + kurva gas yang dipakai konversi ppm
+    return {"devices": calibration_store.devices(), "curves": {ch: c.to_dict() for ch, c in CURVES.items()}}
+
+@router.post("/calibration/capture")
+def capture_calibration(
+    device_id: str = DEVICE_ID,
+    seconds: float = Query(60.0, gt=0),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Menghitung R0 dari rekaman udara bersih: rentang start/end di database, atau
+    `seconds` detik terakhir di ring buffer untuk perangkat lokal."""
+    if not (start and end) and device_id != DEVICE_ID:
+        raise HTTPException(status_code=400, detail="start and end are required for remote devices")
+    try:
+        if start and end:
+            return capture_from_db(db, device_id, start, end)
+        ts, volts, _, _ = ring_buffer.window(time.time() - seconds)
+        return save_capture(device_id, calibrate_r0(volts), len(ts))
+    except ValueError as e:
+        # Tidak ada sensor yang terkalibrasi: file kalibrasi tidak disentuh
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/calibrated/latest")
+def get_calibrated_latest():
+    # Sampel terbaru dari ring buffer dikonversi ke Rs/R0 dan ppm
+    latest = ring_buffer.latest()
+    calibration = calibration_store.get(DEVICE_ID)
+    if not latest or calibration is None:
+        return {"error": "No data or calibration available"}
+    ratio, ppm = calibration.convert([[latest[ch] for ch in CALIBRATION_CHANNELS]])
+    return {
+        "timestamp": latest["timestamp"],
+        "rs_r0": dict(zip(CALIBRATION_CHANNELS, json_safe(ratio[0]))),
+        "ppm": dict(zip(CALIBRATION_CHANNELS, json_safe(ppm[0]))),
+        "gas": {ch: CURVES[ch].gas for ch in CALIBRATION_CHANNELS},
+    }
+
+@router.get("/calibrated/history")
+def get_calibrated_history(
+    start: datetime,
+    end: datetime,
+    device_id: str = DEVICE_ID,
+    limit: int = Query(20000, ge=1, le=200000),
+    db: Session = Depends(get_db),
+):
+    """Riwayat Rs/R0 dan ppm satu perangkat; seluruh rentang dikonversi dalam satu pass NumPy."""
+    calibration = calibration_store.get(device_id)
+    if calibration is None:
+        raise HTTPException(status_code=404, detail=f"Device {device_id} has not been calibrated")
+    rows = db.query(SensorData.timestamp, *volt_columns()).filter(
+        SensorData.device_id == device_id, SensorData.timestamp >= start, SensorData.timestamp < end
+    ).order_by(SensorData.timestamp).limit(limit).all()
+    volts = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, len(CALIBRATION_CHANNELS))
+    ratio, ppm = calibration.convert(volts)
+    return {
+        "device_id": device_id,
+        "timestamp": [row[0].isoformat() for row in rows],
+        "rs_r0": {ch: json_safe(ratio[:, c]) for c, ch in enumerate(CALIBRATION_CHANNELS)},
+        "ppm": {ch: json_safe(ppm[:, c]) for c, ch in enumerate(CALIBRATION_CHANNELS)},
+    }
+
+@router.get("/sessions")
+def list_sessions(
+    device_id: Optional[str] = None,
+    ids: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Daftar sesi pengukuran beserta ringkasannya (terbaru dulu); `ids=3,5,8` untuk membandingkan sesi."""
+    query = db.query(MeasurementSession)
+    if device_id:
+        query = query.filter(MeasurementSession.device_id == device_id)
+    if ids:
+        try:
+            wanted = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        query = query.filter(MeasurementSession.id.in_(wanted))
+    sessions = query.order_by(MeasurementSession.started_at.desc()).offset(offset).limit(limit).all()
+    return {"sessions": [session_to_dict(s) for s in sessions]}
+
+@router.get("/sessions/current")
+def current_session():
+    return session_manager.status()
+
+@router.get("/sessions/{session_id}")
+def get_session(session_id: int, db: Session = Depends(get_db)):
+    session = db.get(MeasurementSession, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session_to_dict(session)
+
+@router.post("/sessions/{session_id}/summarize")
+async def summarize_session(session_id: int):
+    # Hitung ulang ringkasan dari sensor_data (mis. sesi yang ditutup saat recovery)
+    if session_id == session_manager.status().get("id"):
+        raise HTTPException(status_code=409, detail=f"Session {session_id} is still running")
+    session = await asyncio.to_thread(session_manager.resummarize, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket):
+    # Tidak ada query DB per klien: frame dikirim oleh broadcaster dari jalur ingest
+    await websocket.accept()
+    logger.info("WebSocket connection opened")
+    active_connections.append(websocket)
+    queue = broadcaster.subscribe()
     try:
-        await websocket.accept()
-        logger.info("WebSocket connection opened")
-        active_connections.append(websocket)
-        last_data_id = None
+        if broadcaster.latest:
+            await websocket.send_text(broadcaster.latest)
+        else:
+            await websocket.send_json({"error": "No sensor data available"})
         while True:
-            latest_data = db.query(SensorData).order_by(SensorData.timestamp.desc()).first()
-            if latest_data:
-                current_data_id = latest_data.id
-                if last_data_id != current_data_id:
-                    last_data_id = current_data_id
-                    ai_classification_json = {}
-                    if latest_data.ai_classification:
-                        try:
-                            ai_classification_json = json.loads(latest_data.ai_classification)
-                        except json.JSONDecodeError:
-                            ai_classification_json = {"raw": latest_data.ai_classification}
-                    await websocket.send_json({
-                        "timestamp": latest_data.timestamp.isoformat(),
-                        "mq135": latest_data.mq135,
-                        "mq2": latest_data.mq2,
-                        "mq4": latest_data.mq4,
-                        "mq7": latest_data.mq7,
-                        "jenis": latest_data.jenis,
-                        "ai_classification": ai_classification_json
-                    })
-            else:
-                await websocket.send_json({"error": "No sensor data available"})
-            await asyncio.sleep(3)
+            text = await queue.get()
+            try:
+                await asyncio.wait_for(websocket.send_text(text), timeout=WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Klien terlalu lambat menerima: putuskan agar tidak menumpuk
+                broadcaster.stats["dropped_clients"] += 1
+                logger.warning("WebSocket client too slow, dropping connection")
+                break
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed")
-        active_connections.remove(websocket)
     finally:
-        await websocket.close()
+        broadcaster.unsubscribe(queue)
+        if websocket in active_connections:
+            active_connections.remove(websocket)
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass
+
+def _publish_classifications(items):
+    # Hasil ditempelkan ke sampel yang sama di ring buffer lalu frame terbaru dikirim ulang
+    for key, payload in items:
+        if key[0] == "id":
+            ring_buffer.attach_classification(payload, sample_id=key[1])
+        elif key[1][0] == DEVICE_ID:
+            ring_buffer.attach_classification(payload, key[1][1].timestamp())
+    latest = ring_buffer.latest()
+    if latest:
+        broadcaster.publish(latest)
 
 @router.post("/classification")
 async def save_classification(classification: dict, db: Session = Depends(get_db)):
+    # Sampel ditunjuk lewat sample_id atau timestamp; tanpa keduanya (klien lama) ke sampel terbaru di DB
     try:
-        logger.info(f"Received classification: {classification}")
-        required_keys = {"type", "confidence", "composition"}
-        if not all(key in classification for key in required_keys):
-            logger.error(f"Invalid classification format: Missing keys")
-            return {"status": "error", "message": f"Missing required keys"}
-        classification_json = {
-            "type": classification.get("type"),
-            "confidence": classification.get("confidence"),
-            "composition": classification.get("composition")
-        }
-        latest_sensor = db.query(SensorData).order_by(SensorData.timestamp.desc()).first()
-        if not latest_sensor:
-            logger.error("No sensor data found to update classification")
-            return {"status": "error", "message": "No sensor data available"}
-        latest_sensor.ai_classification = json.dumps(classification_json)
+        logger.debug("Received classification: %s", classification)
+        try:
+            key, payload = parse_classification(classification)
+        except ValueError as e:
+            logger.error(f"Invalid classification format: {e}")
+            return {"status": "error", "message": str(e)}
+        legacy = key is None
+        if legacy:
+            latest_id = db.query(SensorData.id).filter(SensorData.device_id == DEVICE_ID)\
+                .order_by(SensorData.timestamp.desc()).limit(1).scalar()
+            if latest_id is None:
+                logger.error("No sensor data found to update classification")
+                return {"status": "error", "message": "No sensor data available"}
+            key = ("id", latest_id)
+        matched = apply_classifications(db, [(key, payload)])
         db.commit()
-        db.refresh(latest_sensor)
-        logger.info(f"Updated ai_classification for sensor ID {latest_sensor.id}")
+        if key not in matched:
+            logger.error(f"No sensor data found for {key[0]} {key[1]}")
+            return {"status": "error", "message": f"Sample not found: {key[0]} {key[1]}"}
+        _publish_classifications([(key, payload)])
+        logger.debug("Updated ai_classification for sensor %s %s", key[0], key[1])
         return {"status": "success", "message": "Classification saved"}
     except Exception as e:
+        db.rollback()
         logger.error(f"Error saving classification: {e}")
         return {"status": "error", "message": str(e)}
 
-@router.delete("/delete")
-async def delete_sensor_data(db: Session = Depends(get_db)):
+@router.post("/classification/bulk")
+def save_classifications_bulk(classifications: List[dict], db: Session = Depends(get_db)):
+    # Banyak hasil AI sekaligus; setiap item wajib membawa sample_id atau timestamp
+    items, invalid = [], []
+    for i, item in enumerate(classifications):
+        try:
+            key, payload = parse_classification(item)
+        except (ValueError, TypeError) as e:
+            invalid.append({"index": i, "error": str(e)})
+            continue
+        if key is None:
+            invalid.append({"index": i, "error": "sample_id or timestamp required"})
+            continue
+        items.append((key, payload))
     try:
-        deleted_rows = db.query(SensorData).delete()
+        matched = apply_classifications(db, items)
         db.commit()
-        logger.info(f"Deleted {deleted_rows} sensor data entries")
-        return {"message": f"Deleted {deleted_rows} sensor data entries successfully"}
     except Exception as e:
+        db.rollback()
+        logger.error(f"Error saving {len(items)} classifications: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to save classifications: {e}")
+    _publish_classifications([(key, payload) for key, payload in items if key in matched])
+    updated = sum(1 for key, _ in items if key in matched)
+    logger.info(f"Bulk classification: {updated}/{len(classifications)} samples updated")
+    return {
+        "status": "success",
+        "received": len(classifications),
+        "updated": updated,
+        "not_found": len(items) - updated,
+        "invalid": invalid,
+    }
+
+@router.post("/ingest")
+async def ingest_device_samples(request: Request, device_id: Optional[str] = None):
+    """Batch sampel dari e-nose lain (NDJSON atau MessagePack), divalidasi kolumnar lalu di-COPY.
+
+    device_id per sampel mengalahkan query parameter device_id.
+    """
+    # Body kebesaran ditolak sebelum dibaca utuh ke memori
+    too_large = HTTPException(status_code=413, detail=f"Maximum {DEVICE_INGEST_MAX_BYTES} bytes per request")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > DEVICE_INGEST_MAX_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > DEVICE_INGEST_MAX_BYTES:
+            raise too_large
+    body = bytes(body)
+    try:
+        records = device_ingest.parse_payload(body, request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if len(records) > DEVICE_INGEST_MAX_SAMPLES:
+        raise HTTPException(status_code=413, detail=f"Maximum {DEVICE_INGEST_MAX_SAMPLES} samples per request")
+
+    def store():
+        rows, rejected = device_ingest.validate_batch(records, device_id)
+        db = SessionLocal()
+        try:
+            result = device_ingest.insert_rows(db, rows)
+        finally:
+            db.close()
+        # Baris ber-DEVICE_ID lokal tidak ada di ring buffer: jendela yang memuatnya dibaca dari DB
+        ring_buffer.note_external([r["timestamp"].timestamp() for r in rows if r["device_id"] == DEVICE_ID])
+        return result, rejected
+
+    try:
+        result, rejected = await asyncio.to_thread(store)
+    except Exception as e:
+        logger.error(f"Failed to ingest {len(records)} device samples: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to ingest samples: {e}")
+    return {"status": "success", "received": len(records), **result,
+            "rejected": len(rejected), "errors": rejected[:100]}
+
+@router.delete("/delete")
+async def delete_sensor_data(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    # Partisi harian yang tercakup penuh di-TRUNCATE, hanya tepi rentang yang memakai DELETE
+    try:
+        result = delete_range(db, start, end)
+        # Sampel yang dihapus juga dibuang dari ring buffer agar /latest dan jendela pendek ikut kosong
+        ring_buffer.clear(start.timestamp() if start else None, end.timestamp() if end else None)
+        if result["deleted_rows"] is None:
+            message = "Deleted all sensor data entries successfully"
+        else:
+            message = (f"Deleted {result['deleted_rows']} sensor data entries and truncated "
+                       f"{len(result['truncated_partitions'])} daily partitions successfully")
+        logger.info(message)
+        return {"message": message, **result}
+    except Exception as e:
+        db.rollback()
         logger.error(f"Failed to delete data: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to delete data: {e}")
 
+@router.get("/partitions/status")
+def partitions_status(db: Session = Depends(get_db)):
+    if not is_partitioned(db):
+        return {"partitioned": False}
+    return {
+        "partitioned": True,
+        "partitions": [{"day": day.isoformat(), "name": name, "compacted": compacted}
+                       for day, name, compacted in list_partitions(db)],
+    }
+
 @router.get("/data/db/{interval}")
-async def get_sensor_data(interval: str, db: Session = Depends(get_db)):
+async def get_sensor_data(
+    interval: str,
+    max_points: Optional[int] = Query(None, ge=4, le=20000),
+    method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+    device_id: str = DEVICE_ID,
+    db: Session = Depends(get_db),
+):
     try:
         now = datetime.now(pytz.timezone('Asia/Jakarta'))
         if interval == "3s":
@@ -125,8 +394,18 @@ async def get_sensor_data(interval: str, db: Session = Depends(get_db)):
             time_delta = timedelta(minutes=5)  # 5 menit terakhir
         else:
             raise HTTPException(status_code=400, detail="Invalid interval")
-        data = db.query(SensorData).filter(
-            SensorData.timestamp >= now - time_delta
+        since = now - time_delta
+        if device_id == DEVICE_ID and ring_buffer.covers(since.timestamp()):
+            # Jendela pendek dilayani dari memori (hanya berisi sampel lokal), DB untuk perangkat lain
+            # dan data yang lebih lama dari buffer
+            result = [{"device_id": device_id, **row}
+                      for row in ring_buffer.rows(since.timestamp(), max_points, method)]
+            logger.info(f"Fetched {len(result)} data points for interval {interval} from ring buffer")
+            return result
+        data = db.query(
+            SensorData.timestamp, *volt_columns(), SensorData.jenis, SensorData.ai_classification
+        ).filter(
+            SensorData.device_id == device_id, SensorData.timestamp >= now - time_delta
         ).order_by(SensorData.timestamp.asc()).all()
         result = []
         for d in data:
@@ -137,6 +416,7 @@ async def get_sensor_data(interval: str, db: Session = Depends(get_db)):
                 except json.JSONDecodeError:
                     ai_classification_json = {"raw": d.ai_classification}
             result.append({
+                "device_id": device_id,
                 "timestamp": d.timestamp.isoformat(),
                 "mq135": d.mq135,
                 "mq2": d.mq2,
@@ -145,46 +425,111 @@ async def get_sensor_data(interval: str, db: Session = Depends(get_db)):
                 "jenis": d.jenis,
                 "ai_classification": ai_classification_json
             })
+        result = downsample_rows(result, max_points, method)
         logger.info(f"Fetched {len(result)} data points for interval {interval}")
         return result
     except Exception as e:
         logger.error(f"Error fetching sensor data for interval {interval}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/start-ai")
-async def start_ai():
+@router.get("/data/history/{range_name}")
+def get_sensor_history(
+    range_name: str,
+    max_points: Optional[int] = Query(None, ge=4, le=20000),
+    method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+    db: Session = Depends(get_db),
+):
+    if range_name not in HISTORY_RANGES:
+        raise HTTPException(status_code=400, detail="Invalid range")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post("http://192.168.129.105:8001/start-ai")
-            response.raise_for_status()
-            result = response.json()
-            if result["status"] == "error":
-                logger.error(f"AI script error: {result['message']}")
-                return {"status": "error", "message": result["message"]}
-            logger.info(f"AI script success: {result['message']}")
-            return {"status": "success", "message": "AI berhasil dijalankan"}
-    except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error calling AI server: {e}")
-        return {"status": "error", "message": f"Error komunikasi dengan AI server: {str(e)}"}
+        time_delta = HISTORY_RANGES[range_name]
+        end = datetime.now(timezone.utc)
+        bucket = pick_bucket(time_delta.total_seconds())
+        result = downsample_rows(query_rollups(db, end - time_delta, end, bucket), max_points, method)
+        logger.info(f"Fetched {len(result)} rollup buckets ({bucket}s) for range {range_name}")
+        return result
     except Exception as e:
-        logger.error(f"Error starting AI: {e}")
-        return {"status": "error", "message": f"Error memulai AI: {str(e)}"}
+        logger.error(f"Error fetching sensor history for range {range_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/stop-ai")
-async def stop_ai():
+@router.get("/export")
+def export_sensor_range(
+    start: datetime,
+    end: Optional[datetime] = None,
+    jenis: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    device_id: str = DEVICE_ID,
+):
+    # Generator sinkron dijalankan StreamingResponse di threadpool, event loop tidak terblokir
+    end = end or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.astimezone()
+    if end.tzinfo is None:
+        end = end.astimezone()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    filename = f"sensor_data_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        # File .gz utuh untuk diunduh, bukan Content-Encoding transparan
+        filename += ".gz"
+        media_type = "application/gzip"
+    logger.info(f"Streaming export {device_id} {start.isoformat()} - {end.isoformat()} ({format}, gzip={gzip})")
+    return StreamingResponse(
+        iter_sensor_export(SessionLocal, start, end, jenis, format, gzip, device_id=device_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/rollup/rebuild")
+def rebuild_sensor_rollups(hours: float = 24, db: Session = Depends(get_db)):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post("http://192.168.129.105:8001/stop-ai")
-            response.raise_for_status()
-            result = response.json()
-            if result["status"] == "error":
-                logger.error(f"AI script error: {result['message']}")
-                return {"status": "error", "message": result["message"]}
-            logger.info(f"AI script success: {result['message']}")
-            return {"status": "success", "message": "AI berhasil dihentikan"}
-    except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error calling AI server: {e}")
-        return {"status": "error", "message": f"Error komunikasi dengan AI server: {str(e)}"}
+        buckets = rebuild_rollups(db, datetime.now(timezone.utc) - timedelta(hours=hours))
+        return {"message": f"Rebuilt {buckets} rollup buckets for the last {hours} hours"}
     except Exception as e:
-        logger.error(f"Error stopping AI: {e}")
-        return {"status": "error", "message": f"Error menghentikan AI: {str(e)}"}
\ No newline at end of file
+        db.rollback()
+        logger.error(f"Failed to rebuild rollups: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild rollups: {e}")
+
+@router.get("/ai/status")
+def ai_status():
+    return {
+        "mode": AI_MODE,
+        "running": inference_service.is_running(),
+        **inference_service.stats,
+        "gateway": ai_gateway.stats(),
+    }
+
+async def _call_ai(path: str, action: str, idempotent: bool = False):
+    try:
+        result = await ai_gateway.post(path, idempotent=idempotent)
+    except CircuitOpenError as e:
+        logger.warning(f"AI server call skipped: {e}")
+        return {"status": "error", "message": str(e)}
+    except AIGatewayError as e:
+        logger.error(f"Error calling AI server: {e}")
+        return {"status": "error", "message": f"Error komunikasi dengan AI server: {str(e)}"}
+    if result.get("status") == "error":
+        logger.error(f"AI script error: {result.get('message')}")
+        return {"status": "error", "message": result.get("message")}
+    logger.info(f"AI script success: {result.get('message')}")
+    return {"status": "success", "message": f"AI berhasil {action}"}
+
+@router.post("/start-ai")
+async def start_ai():
+    if AI_MODE == "local":
+        # Process pool di-spawn di thread agar event loop tidak tertahan
+        await asyncio.to_thread(inference_service.start)
+        logger.info("Inferensi lokal dijalankan")
+        return {"status": "success", "message": "AI berhasil dijalankan"}
+    return await _call_ai("/start-ai", "dijalankan")
+
+@router.post("/stop-ai")
+async def stop_ai():
+    if AI_MODE == "local":
+        await asyncio.to_thread(inference_service.stop)
+        logger.info("Inferensi lokal dihentikan")
+        return {"status": "success", "message": "AI berhasil dihentikan"}
+    # Menghentikan dua kali tidak mengubah apa pun, jadi aman di-retry setelah timeout
+    return await _call_ai("/stop-ai", "dihentikan", idempotent=True)
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+import logging
+from app.services.metrics import ACQ_JITTER_SECONDS, ACQ_TICK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class AcquisitionEngine:
+    """Satu worker akuisisi dengan tick tetap berbasis jam monotonic.
+
+    Sensor yang aktif hanyalah `mask` pada engine ini, bukan thread terpisah.
+    Setiap tick memanggil `tick_fn(mask)`. Jadwal tick dihitung dari jam
+    monotonic (bukan sleep setelah pekerjaan selesai) sehingga periode tidak
+    bergeser oleh latensi I2C/DB. Tick yang terlewat dihitung sebagai overrun
+    dan dilompati, bukan dikejar beruntun.
+
+    set_mask() hanya mengganti mask dan membangunkan worker, jadi handler
+    request tidak pernah menunggu thread berhenti.
+    """
+
+    def __init__(self, tick_fn, period=1.0, on_active=None, on_idle=None, history=1000):
+        self.tick_fn = tick_fn
+        self.period = period
+        self.on_active = on_active
+        self.on_idle = on_idle
+        self.mask = frozenset()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._jitter = deque(maxlen=history)
+        self._durations = deque(maxlen=history)
+        self.counters = {"ticks": 0, "errors": 0, "overruns": 0, "missed_ticks": 0}
+
+    # --- mask ---
+
+    def set_mask(self, mask):
+        self.mask = frozenset(mask)
+        self._wake.set()
+
+    def is_active(self) -> bool:
+        return bool(self.mask)
+
+    # --- siklus hidup ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="acquisition", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        active = False
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            mask = self.mask
+            if not mask:
+                if active and self.on_idle:
+                    self.on_idle()
+                active = False
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if not active:
+                if self.on_active:
+                    self.on_active()
+                active = True
+                next_tick = time.monotonic()
+
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                # Dibangunkan lebih awal bila mask berubah atau engine dihentikan
+                if self._wake.wait(delay):
+                    self._wake.clear()
+                    continue
+
+            started = time.monotonic()
+            self._jitter.append(started - next_tick)
+            ACQ_JITTER_SECONDS.observe(max(0.0, started - next_tick))
+            try:
+                self.tick_fn(mask)
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.error(f"❌ Tick akuisisi gagal: {e}")
+            finished = time.monotonic()
+            self._durations.append(finished - started)
+            ACQ_TICK_SECONDS.observe(finished - started)
+            self.counters["ticks"] += 1
+
+            next_tick += self.period
+            if self.period > 0 and finished > next_tick:
+                # Pekerjaan melewati jadwal tick berikutnya; tick yang sudah lewat penuh dilompati
+                self.counters["overruns"] += 1
+                missed = int((finished - next_tick) // self.period)
+                if missed:
+                    self.counters["missed_ticks"] += missed
+                    next_tick += missed * self.period
+        if active and self.on_idle:
+            self.on_idle()
+
+    # --- statistik ---
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {"mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(values)
+
+        def pick(q):
+            return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+
+        return {
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+            "p50_ms": pick(0.50) * 1000,
+            "p99_ms": pick(0.99) * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "mask": sorted(self.mask),
+            "period": self.period,
+            **self.counters,
+            "jitter": self._summary(list(self._jitter)),
+            "tick_duration": self._summary(list(self._durations)),
+        }
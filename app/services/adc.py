@@ -0,0 +1,60 @@
+from fractions import Fraction
+import numpy as np
+from sqlalchemy import Float, cast, func
+from app.models import SensorData
+
+CHANNELS = ["mq135", "mq2", "mq4", "mq7"]
+RAW_COLUMNS = [f"{ch}_raw" for ch in CHANNELS]
+
+# Rentang skala penuh PGA ADS1115 per gain (mV), sama dengan _ADS1X15_PGA_RANGE pustaka Adafruit
+PGA_RANGE_MV = {Fraction(2, 3): 6144, 1: 4096, 2: 2048, 4: 1024, 8: 512, 16: 256}
+# AnalogIn.voltage = value * rentang / 32767
+FULL_SCALE_COUNT = 32767
+
+
+def parse_gain(value):
+    """Gain PGA dari konfigurasi ("2/3", "1", "16", ...) -> nilai yang diterima ADS1115.gain."""
+    gain = Fraction(str(value).strip())
+    if gain not in PGA_RANGE_MV:
+        raise ValueError(f"Gain ADS1115 tidak valid: {value} (pilihan: 2/3, 1, 2, 4, 8, 16)")
+    return int(gain) if gain.denominator == 1 else float(gain)
+
+
+def gain_range_mv(gain) -> int:
+    return PGA_RANGE_MV[Fraction(gain).limit_denominator(3)]
+
+
+def counts_to_volts(counts, fsr_mv) -> np.ndarray:
+    """Hitungan ADC int16 -> volt untuk seluruh array sekaligus (None/NaN tetap NaN).
+
+    `fsr_mv` boleh skalar atau array sepanjang baris (gain berbeda per sampel).
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    scale = np.asarray(fsr_mv, dtype=np.float64) / (FULL_SCALE_COUNT * 1000.0)
+    if counts.ndim == 2 and scale.ndim == 1:
+        scale = scale[:, None]
+    return counts * scale
+
+
+def volts_to_counts(volts, fsr_mv) -> np.ndarray:
+    """Kebalikan counts_to_volts, dibulatkan dan dijepit ke rentang int16."""
+    counts = np.rint(np.asarray(volts, dtype=np.float64) / fsr_mv * FULL_SCALE_COUNT * 1000.0)
+    return np.clip(counts, -FULL_SCALE_COUNT - 1, FULL_SCALE_COUNT).astype(np.int16)
+
+
+# --- konversi saat baca di database ---
+
+def volt_column(ch: str):
+    """Ekspresi SQL tegangan satu channel: kolom volt bila terisi, selain itu dari hitungan mentah."""
+    raw = getattr(SensorData, f"{ch}_raw")
+    converted = cast(raw, Float) * SensorData.adc_fsr_mv / (FULL_SCALE_COUNT * 1000.0)
+    return func.coalesce(getattr(SensorData, ch), converted).label(ch)
+
+
+def volt_columns() -> list:
+    return [volt_column(ch) for ch in CHANNELS]
+
+
+def volt_sql(ch: str) -> str:
+    # Versi teks volt_column untuk query SQL mentah (rollup, pemadatan partisi)
+    return f"COALESCE({ch}, {ch}_raw::float8 * adc_fsr_mv / {FULL_SCALE_COUNT * 1000.0})"
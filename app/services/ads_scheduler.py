@@ -0,0 +1,215 @@
+import threading
+import time
+from datetime import datetime
+import logging
+import numpy as np
+from app.services.adc import counts_to_volts, gain_range_mv
+from app.services.metrics import I2C_READ_SECONDS, I2C_READ_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# Data rate yang didukung ADS1115 (sampel per detik)
+ADS1115_DATA_RATES = (8, 16, 32, 64, 128, 250, 475, 860)
+
+
+class AdsScanScheduler:
+    """Pemilik tunggal bus ADS1115 yang membaca P0-P3 secara bergiliran.
+
+    Hanya thread scheduler yang menyentuh I2C. Setiap putaran scan
+    menghasilkan satu frame 4-channel bertimestamp yang bisa diambil lewat
+    latest_frame()/wait_frame() atau diterima lewat subscribe(). Pembacaan
+    yang gagal tidak di-retry dengan sleep: channel tersebut dicatat error-nya
+    dan dicoba lagi pada putaran berikutnya, sehingga channel lain tidak ikut
+    tertahan.
+
+    Yang dibaca dari bus hanya hitungan mentah `AnalogIn.value` (int16);
+    tegangan satu frame dihitung sekaligus dengan counts_to_volts dari rentang
+    PGA `gain`, sehingga frame membawa hitungan dan volt tanpa baca ganda.
+
+    Dengan `decimator` (Decimator), setiap channel dikonversi K kali per scan
+    dan frame berisi hasil filter median/rata-rata setelah outlier dan dropout
+    dibuang.
+    """
+
+    def __init__(self, channels: dict, ads=None, data_rate=128, continuous=True, scan_interval=0.1, gain=1,
+                 decimator=None):
+        self.channels = channels
+        self.names = list(channels)
+        self.ads = ads
+        self.decimator = decimator if decimator is not None and decimator.k > 1 else None
+        # Mode kontinu: konversi berulang pada channel yang sama harus berjarak satu periode konversi,
+        # kalau tidak register yang sama terbaca dua kali
+        self._conversion_period = 1.0 / data_rate if ads is not None and continuous else 0.0
+        self.gain = gain
+        self.fsr_mv = gain_range_mv(gain)
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self._subscribers = []
+        self._frame = None
+        self._seq = 0
+        # Nilai valid terakhir per channel: (volt, hitungan, waktu monotonic)
+        self._last_good = {name: (None, None, 0.0) for name in channels}
+        self.channel_stats = {name: {"reads": 0, "errors": 0, "invalid": 0, "consecutive_errors": 0}
+                              for name in channels}
+        # Seri metrik per channel diambil sekali, bukan per pembacaan
+        self._read_latency = {name: I2C_READ_SECONDS.labels(channel=name) for name in channels}
+        self._read_failures = {name: (I2C_READ_FAILURES.labels(channel=name, reason="error"),
+                                      I2C_READ_FAILURES.labels(channel=name, reason="invalid"))
+                               for name in channels}
+        if ads is not None:
+            self._configure(data_rate, continuous)
+
+    def _configure(self, data_rate, continuous):
+        if data_rate not in ADS1115_DATA_RATES:
+            raise ValueError(f"Data rate ADS1115 tidak valid: {data_rate} (pilihan: {ADS1115_DATA_RATES})")
+        self.ads.data_rate = data_rate
+        self.ads.gain = self.gain
+        if continuous:
+            # Mode kontinu: ADC terus mengonversi sehingga tidak ada jeda
+            # single-shot per pembacaan; pustaka menunggu satu konversi saat mux pindah.
+            from adafruit_ads1x15.ads1x15 import Mode
+            self.ads.mode = Mode.CONTINUOUS
+        logger.info(f"✅ ADS1115 dikonfigurasi: {data_rate} SPS, gain {self.gain} (±{self.fsr_mv} mV), "
+                    f"mode {'kontinu' if continuous else 'single-shot'}")
+
+    # --- siklus hidup ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ads-scan", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    # --- publikasi frame ---
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def latest_frame(self):
+        with self._lock:
+            return self._frame
+
+    def wait_frame(self, after_seq=0, timeout=1.0):
+        # Menunggu frame dengan nomor urut lebih besar dari after_seq
+        with self._frame_ready:
+            self._frame_ready.wait_for(lambda: self._seq > after_seq, timeout=timeout)
+            return self._frame
+
+    def latest_values(self, max_age=2.0) -> dict:
+        # Nilai terakhir yang valid per channel, None bila lebih tua dari max_age
+        now = time.monotonic()
+        with self._lock:
+            return {name: value if value is not None and now - at <= max_age else None
+                    for name, (value, _, at) in self._last_good.items()}
+
+    def latest_counts(self, max_age=2.0) -> dict:
+        # Sama dengan latest_values, tetapi hitungan ADC mentah (int16)
+        now = time.monotonic()
+        with self._lock:
+            return {name: count if count is not None and now - at <= max_age else None
+                    for name, (_, count, at) in self._last_good.items()}
+
+    # --- thread scan ---
+
+    def _read_channel(self, name, channel):
+        stats = self.channel_stats[name]
+        stats["reads"] += 1
+        started = time.perf_counter()
+        try:
+            count = channel.value
+        except (OSError, ValueError) as e:
+            self._read_latency[name].observe(time.perf_counter() - started)
+            self._read_failures[name][0].inc()
+            stats["errors"] += 1
+            stats["consecutive_errors"] += 1
+            if stats["consecutive_errors"] in (1, 10, 100):
+                logger.error("❌ Gagal membaca %s (%dx berturut-turut): %s", name, stats["consecutive_errors"], e)
+            return None
+        self._read_latency[name].observe(time.perf_counter() - started)
+        if count <= 0:
+            self._read_failures[name][1].inc()
+            stats["invalid"] += 1
+            stats["consecutive_errors"] += 1
+            return None
+        stats["consecutive_errors"] = 0
+        return count
+
+    def _scan(self) -> np.ndarray:
+        # Satu putaran P0-P3 -> hitungan per channel (float, NaN = tidak ada konversi valid)
+        if self.decimator is None:
+            counts = [self._read_channel(name, channel) for name, channel in self.channels.items()]
+            return np.array([np.nan if c is None else c for c in counts], dtype=np.float64)
+        buffer = self.decimator.buffer
+        for c, (name, channel) in enumerate(self.channels.items()):
+            for k in range(self.decimator.k):
+                if k and self._conversion_period:
+                    time.sleep(self._conversion_period)
+                count = self._read_channel(name, channel)
+                buffer[k, c] = np.nan if count is None else count
+        return self.decimator.decimate()
+
+    def _run(self):
+        next_scan = time.monotonic()
+        while not self._stop.is_set():
+            filtered = self._scan()
+            volts = counts_to_volts(filtered, self.fsr_mv)
+            counts = {name: None if np.isnan(c) else int(round(c)) for name, c in zip(self.names, filtered)}
+            values = {name: None if counts[name] is None else float(v) for name, v in zip(self.names, volts)}
+            now = time.monotonic()
+            frame = {
+                "seq": self._seq + 1,
+                "timestamp": datetime.now(),
+                "monotonic": now,
+                "values": values,
+                "counts": counts,
+                "fsr_mv": self.fsr_mv,
+            }
+            with self._frame_ready:
+                for name, value in values.items():
+                    if value is not None:
+                        self._last_good[name] = (value, counts[name], now)
+                self._seq += 1
+                self._frame = frame
+                self._frame_ready.notify_all()
+            for callback in list(self._subscribers):
+                try:
+                    callback(frame)
+                except Exception as e:
+                    logger.error(f"❌ Subscriber frame ADS gagal: {e}")
+            next_scan += self.scan_interval
+            delay = next_scan - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_scan = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.is_running(),
+                "frames": self._seq,
+                "scan_interval": self.scan_interval,
+                "gain": self.gain,
+                "fsr_mv": self.fsr_mv,
+                "oversampling": None if self.decimator is None else {
+                    "k": self.decimator.k, "filter": self.decimator.method, **self.decimator.stats,
+                },
+                "channels": {name: dict(s) for name, s in self.channel_stats.items()},
+            }
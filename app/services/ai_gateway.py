@@ -0,0 +1,190 @@
+import asyncio
+import random
+import time
+from collections import deque
+import logging
+import httpx
+from app.config import (
+    AI_SERVER_URL, AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT, AI_RETRIES, AI_BACKOFF,
+    AI_BREAKER_THRESHOLD, AI_BREAKER_RESET, AI_MAX_CONNECTIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Kegagalan yang pasti terjadi sebelum request terkirim: aman di-retry untuk POST apa pun
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AIGatewayError(Exception):
+    """Permintaan ke AI server gagal setelah semua percobaan."""
+
+
+class CircuitOpenError(AIGatewayError):
+    """Circuit breaker terbuka: AI server dianggap mati, permintaan ditolak tanpa dikirim."""
+
+
+class CircuitBreaker:
+    """Breaker tiga keadaan: closed -> open setelah `threshold` kegagalan berturut-turut,
+    open -> half-open setelah `reset_timeout` detik (satu permintaan percobaan),
+    half-open -> closed bila berhasil atau kembali open bila gagal."""
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half-open"
+            self._probing = False
+        if self.state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.threshold:
+            if self.state != "open":
+                logger.warning(f"⚠️ Circuit breaker AI terbuka setelah {self.failures} kegagalan")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        # Permintaan selesai tanpa hasil (mis. dibatalkan): slot percobaan half-open dibebaskan
+        self._probing = False
+
+
+class AIGateway:
+    """Klien bersama ke AI server eksternal, dibuat sekali saat startup aplikasi.
+
+    Satu httpx.AsyncClient dengan pool koneksi keep-alive dan timeout connect/
+    read eksplisit. Kegagalan koneksi sebelum request terkirim di-retry paling
+    banyak `retries` kali dengan backoff eksponensial + jitter; read timeout,
+    putus di tengah jalan dan status 5xx hanya di-retry untuk permintaan
+    `idempotent` karena AI server mungkin sudah menjalankannya. Status 4xx
+    langsung dikembalikan sebagai error. Circuit breaker menolak permintaan
+    secara instan selama AI server mati sehingga request dashboard tidak ikut
+    menggantung.
+    """
+
+    def __init__(self, base_url: str, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.2,
+                 breaker_threshold=5, breaker_reset=30.0, max_connections=10, history=1000):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.client = None
+        self._latency = deque(maxlen=history)
+        self.counters = {"requests": 0, "success": 0, "errors": 0, "retries": 0, "timeouts": 0,
+                         "rejected": 0}
+
+    # --- siklus hidup ---
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    # --- permintaan ---
+
+    async def post(self, path: str, idempotent: bool = False, **kwargs) -> dict:
+        """POST ke AI server dan kembalikan body JSON; AIGatewayError bila gagal."""
+        if self.client is None:
+            await self.start()
+        if not self.breaker.allow():
+            self.counters["rejected"] += 1
+            raise CircuitOpenError("AI server tidak tersedia (circuit breaker terbuka)")
+        self.counters["requests"] += 1
+        try:
+            return await self._post(path, idempotent, **kwargs)
+        finally:
+            self.breaker.release()
+
+    async def _post(self, path: str, idempotent: bool, **kwargs) -> dict:
+        error = None
+        attempts = 0
+        for attempt in range(self.retries + 1):
+            attempts = attempt + 1
+            if attempt:
+                self.counters["retries"] += 1
+                delay = self.backoff * (2 ** (attempt - 1))
+                await asyncio.sleep(delay + random.uniform(0, delay))
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(path, **kwargs)
+            except httpx.TransportError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    self.counters["timeouts"] += 1
+                error = e
+                if idempotent or isinstance(e, _NOT_SENT):
+                    continue
+                break
+            finally:
+                self._latency.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                error = httpx.HTTPStatusError(f"AI server {response.status_code}", request=response.request,
+                                              response=response)
+                if idempotent:
+                    continue
+                break
+            try:
+                response.raise_for_status()
+                result = response.json()
+            except (httpx.HTTPStatusError, ValueError) as e:
+                # 4xx/body rusak bukan masalah ketersediaan: tidak di-retry, breaker tidak dihitung
+                self.breaker.record_success()
+                self.counters["errors"] += 1
+                raise AIGatewayError(f"Respons AI server tidak valid: {e}") from e
+            self.breaker.record_success()
+            self.counters["success"] += 1
+            return result
+        self.breaker.record_failure()
+        self.counters["errors"] += 1
+        raise AIGatewayError(f"AI server gagal setelah {attempts} percobaan: {error!r}") from error
+
+    # --- statistik ---
+
+    def stats(self) -> dict:
+        ordered = sorted(self._latency)
+
+        def pick(q):
+            return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))] * 1000 if ordered else 0.0
+
+        return {
+            "base_url": self.base_url,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            **self.counters,
+            "latency": {"p50_ms": pick(0.50), "p99_ms": pick(0.99), "max_ms": pick(1.0)},
+        }
+
+
+ai_gateway = AIGateway(
+    AI_SERVER_URL,
+    connect_timeout=AI_CONNECT_TIMEOUT,
+    read_timeout=AI_READ_TIMEOUT,
+    retries=AI_RETRIES,
+    backoff=AI_BACKOFF,
+    breaker_threshold=AI_BREAKER_THRESHOLD,
+    breaker_reset=AI_BREAKER_RESET,
+    max_connections=AI_MAX_CONNECTIONS,
+)
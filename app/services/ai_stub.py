@@ -0,0 +1,112 @@
+"""Stub AI server lokal dengan API yang sama seperti skrip AI di AI_SERVER_URL.
+
+Dipakai untuk menguji mode AI_MODE=remote tanpa mesin AI terpisah:
+POST /start-ai menjalankan loop yang membaca /sensor/latest dari backend,
+mengklasifikasikannya dengan model kNN lokal lalu mengirim hasilnya ke
+/sensor/classification; POST /stop-ai menghentikannya.
+
+Untuk menguji klien AI (timeout, retry, circuit breaker) stub bisa dibuat
+lambat atau gagal: POST /faults?delay=3&fail_rate=0.5&status=503, atau lewat
+AI_STUB_DELAY / AI_STUB_FAIL_RATE saat start.
+
+    AI_STUB_BACKEND_URL=http://localhost:8000 uvicorn app.services.ai_stub:app --port 8001
+    AI_SERVER_URL=http://localhost:8001 uvicorn app.main:app --port 8000
+"""
+import os
+import random
+import threading
+import time
+import logging
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from app.config import DEVICE_ID
+from app.services.classifier import CHANNELS, get_model
+from app.services.inference import to_classifications
+
+logger = logging.getLogger(__name__)
+
+BACKEND_URL = os.getenv("AI_STUB_BACKEND_URL", "http://localhost:8000")
+INTERVAL = float(os.getenv("AI_STUB_INTERVAL", "1.0"))
+
+app = FastAPI(title="E-Nose AI stub")
+_stop = threading.Event()
+_thread = None
+stats = {"classified": 0, "errors": 0, "requests": 0, "injected_failures": 0}
+faults = {
+    "delay": float(os.getenv("AI_STUB_DELAY", "0")),
+    "fail_rate": float(os.getenv("AI_STUB_FAIL_RATE", "0")),
+    "status": 503,
+}
+
+
+def _inject_faults():
+    # Dipanggil di awal setiap endpoint kontrol: latensi buatan lalu kegagalan acak
+    stats["requests"] += 1
+    if faults["delay"]:
+        time.sleep(faults["delay"])
+    if random.random() < faults["fail_rate"]:
+        stats["injected_failures"] += 1
+        raise HTTPException(status_code=faults["status"], detail="Kegagalan buatan stub AI")
+
+
+def _loop():
+    model = get_model()
+    last_ts = None
+    with httpx.Client(base_url=BACKEND_URL, timeout=5.0) as client:
+        while not _stop.wait(INTERVAL):
+            try:
+                latest = client.get("/sensor/latest").json()
+                if "error" in latest or latest.get("timestamp") == last_ts or model is None:
+                    continue
+                X = np.array([[np.nan if latest.get(ch) is None else latest[ch] for ch in CHANNELS]])
+                classification = to_classifications(model.classes.tolist(), model.predict_proba(X))[0]
+                # Kunci sampel dikirim balik agar hasil menempel ke sampel yang benar:
+                # id bila sudah ter-commit, selain itu timestamp + device_id
+                if latest.get("id") is not None:
+                    classification["sample_id"] = latest["id"]
+                else:
+                    classification["timestamp"] = latest.get("timestamp")
+                    classification["device_id"] = latest.get("device_id") or DEVICE_ID
+                client.post("/sensor/classification", json=classification).raise_for_status()
+                last_ts = latest.get("timestamp")
+                stats["classified"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                logger.error(f"❌ Stub AI gagal: {e}")
+
+
+@app.post("/start-ai")
+def start_ai():
+    global _thread
+    _inject_faults()
+    if _thread and _thread.is_alive():
+        # Start ulang (mis. retry setelah respons hilang) bukan error: keadaan akhirnya sama
+        return {"status": "success", "message": "AI stub sudah berjalan"}
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="ai-stub", daemon=True)
+    _thread.start()
+    return {"status": "success", "message": "AI stub dijalankan"}
+
+
+@app.post("/stop-ai")
+def stop_ai():
+    global _thread
+    _inject_faults()
+    if not (_thread and _thread.is_alive()):
+        return {"status": "success", "message": "AI stub sudah berhenti"}
+    _stop.set()
+    _thread.join(timeout=5.0)
+    _thread = None
+    return {"status": "success", "message": "AI stub dihentikan"}
+
+
+@app.post("/faults")
+def set_faults(delay: float = 0.0, fail_rate: float = 0.0, status: int = 503):
+    faults.update(delay=delay, fail_rate=fail_rate, status=status)
+    return faults
+
+
+@app.get("/status")
+def status():
+    return {"running": bool(_thread and _thread.is_alive()), **stats, "faults": faults}
@@ -0,0 +1,240 @@
+import argparse
+import glob
+import os
+from datetime import datetime, timedelta, timezone
+import logging
+from sqlalchemy.orm import Session
+from app.models import SensorData
+from app.services.adc import CHANNELS, volt_columns
+from app.services.replay_reader import label_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow opsional, hanya dibutuhkan untuk arsip
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow belum terpasang, arsip Parquet tidak tersedia (pip install pyarrow)")
+
+
+def archive_schema():
+    _require_pyarrow()
+    return pa.schema(
+        [("id", pa.int64()), ("timestamp", pa.timestamp("us", tz="UTC"))]
+        + [(ch, pa.float32()) for ch in CHANNELS]
+        + [("label", pa.string()), ("source", pa.string()), ("date", pa.string())]
+    )
+
+
+def _partitioning():
+    # Partisi hive: <root>/date=YYYY-MM-DD/label=<jenis>/...parquet
+    return ds.partitioning(pa.schema([("date", pa.string()), ("label", pa.string())]), flavor="hive")
+
+
+def _with_date(table):
+    # Kolom partisi tanggal (UTC) dihitung vektor dari timestamp
+    date = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+    table = table.set_column(table.schema.get_field_index("date"), "date", date)
+    label = pc.fill_null(table["label"], "unknown")
+    return table.set_column(table.schema.get_field_index("label"), "label", label)
+
+
+def write_table(table, root: str, basename: str) -> int:
+    """Menulis tabel arsip ke root, dipartisi per tanggal dan label (Parquet + zstd).
+
+    Nama file berasal dari basename, sehingga menulis ulang sumber yang sama
+    menimpa file lama alih-alih menggandakan baris.
+    """
+    _require_pyarrow()
+    if not table.num_rows:
+        return 0
+    table = _with_date(table.cast(archive_schema()))
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=_partitioning(),
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+    return table.num_rows
+
+
+def rows_to_table(rows, source: str = "db"):
+    """Mengubah baris SensorData (objek ORM atau Row hasil query) menjadi tabel Arrow."""
+    _require_pyarrow()
+    columns = {
+        "id": [r.id for r in rows],
+        "timestamp": [
+            r.timestamp if r.timestamp.tzinfo else r.timestamp.astimezone() for r in rows
+        ],
+    }
+    for ch in CHANNELS:
+        columns[ch] = [getattr(r, ch) for r in rows]
+    columns["label"] = [r.jenis for r in rows]
+    columns["source"] = [source] * len(rows)
+    columns["date"] = [None] * len(rows)
+    return pa.table(columns, schema=archive_schema())
+
+
+def _remove_day(root: str, day: str, prefix: str):
+    # File arsip hari tersebut dari sumber yang sama, di partisi label mana pun
+    for path in glob.glob(os.path.join(root, f"date={day}", "*", f"{prefix}-{day}-*.parquet")):
+        os.remove(path)
+
+
+def archive_sensor_data(db: Session, root: str, since: datetime, until: datetime = None,
+                        batch_size: int = 50000) -> int:
+    """Mengarsipkan sensor_data per hari UTC (sama dengan partisi harian).
+
+    Rentang dibulatkan ke hari penuh; setiap hari dibaca bertahap per id
+    (keyset) lalu ditulis sebagai db-YYYY-MM-DD, menggantikan file hari itu
+    dari arsip sebelumnya walau id barisnya sudah berubah (mis. dipadatkan).
+    """
+    _require_pyarrow()
+    until = until or datetime.now(timezone.utc)
+    since = since if since.tzinfo else since.astimezone()
+    until = until if until.tzinfo else until.astimezone()
+    day = since.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    total = 0
+    while day < until:
+        next_day = day + timedelta(days=1)
+        tables = []
+        last_id = 0
+        while True:
+            batch = db.query(
+                SensorData.id, SensorData.timestamp, *volt_columns(), SensorData.jenis
+            ).filter(
+                SensorData.timestamp >= day, SensorData.timestamp < next_day, SensorData.id > last_id
+            ).order_by(SensorData.id).limit(batch_size).all()
+            if not batch:
+                break
+            tables.append(rows_to_table(batch))
+            last_id = batch[-1].id
+        name = day.strftime("%Y-%m-%d")
+        _remove_day(root, name, "db")
+        if tables:
+            total += write_table(pa.concat_tables(tables), root, f"db-{name}")
+        day = next_day
+    logger.info(f"✅ {total} baris sensor_data diarsipkan ke {root}")
+    return total
+
+
+def read_csv_table(path: str):
+    """Membaca satu file data/*.csv (kolom label jenis/kualitas) ke skema arsip."""
+    _require_pyarrow()
+    raw = pa_csv.read_csv(path)
+    n = raw.num_rows
+    label_col = label_column(raw.column_names)
+    # Timestamp CSV tanpa zona waktu = waktu lokal perangkat
+    local_tz = datetime.now().astimezone().tzinfo
+    ts = pc.assume_timezone(raw["timestamp"].cast(pa.timestamp("us")), timezone=_tz_name(local_tz))
+    columns = {
+        "id": raw["id"] if "id" in raw.column_names else pa.nulls(n, pa.int64()),
+        "timestamp": ts,
+    }
+    for ch in CHANNELS:
+        columns[ch] = raw[ch] if ch in raw.column_names else pa.nulls(n, pa.float32())
+    columns["label"] = raw[label_col].cast(pa.string()) if label_col else pa.nulls(n, pa.string())
+    columns["source"] = pa.array([os.path.basename(path)] * n, pa.string())
+    columns["date"] = pa.nulls(n, pa.string())
+    return pa.table(columns).cast(archive_schema())
+
+
+def _tz_name(tz) -> str:
+    # assume_timezone butuh nama zona atau offset "+HH:MM"
+    offset = datetime.now(tz).utcoffset() or timedelta(0)
+    minutes = int(offset.total_seconds() // 60)
+    sign = "+" if minutes >= 0 else "-"
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def import_csv(paths, root: str) -> int:
+    """Mengimpor file CSV lama ke arsip; file yang gagal dibaca dilewati."""
+    total = 0
+    for path in paths:
+        try:
+            table = read_csv_table(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Lewati {path}: {e}")
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_").replace("%", "pct")
+        total += write_table(table, root, f"csv-{stem}")
+    logger.info(f"✅ {total} baris CSV diimpor ke {root}")
+    return total
+
+
+def read_archive(root: str, columns=None, start: datetime = None, end: datetime = None, labels=None):
+    """Membaca arsip sebagai tabel Arrow dengan proyeksi kolom dan filter pushdown.
+
+    Filter tanggal dan label memangkas direktori partisi sebelum file dibuka;
+    filter timestamp diteruskan ke statistik row group Parquet. Hanya kolom
+    pada `columns` yang didekode.
+    """
+    _require_pyarrow()
+    if not os.path.isdir(root):
+        return archive_schema().empty_table().select(columns or archive_schema().names)
+    dataset = ds.dataset(root, format="parquet", partitioning=_partitioning())
+    expr = None
+
+    def add(cond):
+        nonlocal expr
+        expr = cond if expr is None else expr & cond
+
+    if start is not None:
+        start = start if start.tzinfo else start.astimezone()
+        add(ds.field("date") >= start.astimezone(timezone.utc).strftime("%Y-%m-%d"))
+        add(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us", tz="UTC")))
+    if end is not None:
+        end = end if end.tzinfo else end.astimezone()
+        add(ds.field("date") <= end.astimezone(timezone.utc).strftime("%Y-%m-%d"))
+        add(ds.field("timestamp") < pa.scalar(end, pa.timestamp("us", tz="UTC")))
+    if labels:
+        add(ds.field("label").isin(list(labels)))
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+def read_channels(root: str, start: datetime = None, end: datetime = None, labels=None):
+    """Shortcut analisis: (timestamp epoch detik, matriks N x 4 float32) dari arsip."""
+    import numpy as np
+
+    table = read_archive(root, columns=["timestamp"] + CHANNELS, start=start, end=end, labels=labels)
+    table = table.sort_by("timestamp")
+    ts = table["timestamp"].cast(pa.int64()).to_numpy() / 1e6
+    values = np.column_stack(
+        [table[ch].to_numpy(zero_copy_only=False) for ch in CHANNELS]
+    ) if table.num_rows else np.empty((0, len(CHANNELS)), dtype=np.float32)
+    return ts, values
+
+
+if __name__ == "__main__":
+    from app.config import ARCHIVE_DIR
+
+    parser = argparse.ArgumentParser(description="Arsip Parquet data sensor")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_csv = sub.add_parser("import-csv", help="Impor file CSV lama (default data/*.csv)")
+    p_csv.add_argument("files", nargs="*")
+    p_db = sub.add_parser("db", help="Arsipkan sensor_data dari database")
+    p_db.add_argument("--hours", type=float, default=24, help="Rentang ke belakang (jam)")
+    parser.add_argument("--root", default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "import-csv":
+        files = args.files or sorted(f for f in glob.glob("data/*") if os.path.isfile(f))
+        import_csv(files, args.root)
+    else:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            archive_sensor_data(db, args.root, datetime.now(timezone.utc) - timedelta(hours=args.hours))
+        finally:
+            db.close()
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import time
+import logging
+from app.config import WS_QUEUE_SIZE
+from app.services.metrics import WS_FANOUT_SECONDS, WS_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+
+class Broadcaster:
+    """Pub/sub dalam proses untuk /sensor/ws.
+
+    Jalur ingest mempublikasikan setiap sampel baru satu kali; frame
+    diserialisasi sekali menjadi teks JSON lalu dibagikan ke antrian setiap
+    subscriber. Antrian subscriber kecil: bila klien lambat dan antriannya
+    penuh, frame lama dibuang dan diganti frame terbaru (coalesce), sehingga
+    publisher tidak pernah menunggu klien.
+    """
+
+    def __init__(self, queue_size=1):
+        self.queue_size = queue_size
+        self.loop = None
+        self.latest = None
+        self._subscribers = set()
+        self.stats = {"published": 0, "delivered": 0, "coalesced": 0, "dropped_clients": 0}
+
+    def bind(self, loop):
+        # Event loop aplikasi; publish() dari thread lain dijadwalkan ke loop ini
+        self.loop = loop
+
+    def subscribe(self) -> asyncio.Queue:
+        q = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        self._subscribers.discard(q)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, payload: dict):
+        # Aman dipanggil dari thread akuisisi
+        if self.loop is None:
+            return
+        text = json.dumps(payload)
+        self.loop.call_soon_threadsafe(self._fanout, text)
+
+    def _fanout(self, text: str):
+        started = time.perf_counter()
+        self.latest = text
+        self.stats["published"] += 1
+        for q in self._subscribers:
+            if q.full():
+                q.get_nowait()
+                self.stats["coalesced"] += 1
+            q.put_nowait(text)
+            self.stats["delivered"] += 1
+        WS_FANOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+broadcaster = Broadcaster(queue_size=WS_QUEUE_SIZE)
+WS_SUBSCRIBERS.set_function(broadcaster.subscriber_count)
@@ -0,0 +1,246 @@
+"""Kalibrasi sensor MQ: tegangan -> Rs/R0 -> ppm, vektor untuk banyak sampel sekaligus.
+
+Rangkaian modul MQ adalah pembagi tegangan: Rs = RL * (Vc - Vout) / Vout.
+R0 adalah Rs pada udara bersih, disimpan per perangkat per sensor di
+CALIBRATION_PATH. Konsentrasi dibaca dari kurva datasheet log-log
+(ppm = a * (Rs/R0)^b) yang ditabelkan sekali saat import menjadi lookup
+table log10(Rs/R0) -> log10(ppm), sehingga konversi N x 4 sampel hanya satu
+np.interp per channel.
+
+    python -m app.services.calibration show
+    python -m app.services.calibration capture --device local --start 2025-06-01T08:00 --end 2025-06-01T08:05
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone
+import logging
+import numpy as np
+from app.config import CALIBRATION_PATH, MQ_LOAD_KOHM, MQ_SUPPLY_VOLTAGE, CALIBRATION_MIN_SAMPLES
+from app.services.adc import CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# Titik per lookup table; interpolasi linear di ruang log cukup karena kurvanya garis lurus
+LUT_SIZE = 512
+
+
+class GasCurve:
+    """Kurva datasheet satu sensor: ppm = a * (Rs/R0)^b, rentang datasheet [ppm_min, ppm_max].
+
+    Grid lookup diperpanjang sampai titik udara bersih (clean_air_ratio) agar
+    baseline tetap punya nilai; di luar grid nilai dijepit ke ujungnya (di atas
+    ppm_max sensor dianggap jenuh, lebih bersih dari udara bersih = baseline).
+    """
+
+    def __init__(self, gas, a, b, clean_air_ratio, ppm_min, ppm_max, size=LUT_SIZE):
+        self.gas = gas
+        self.a = a
+        self.b = b
+        self.clean_air_ratio = clean_air_ratio
+        self.ppm_min = ppm_min
+        self.ppm_max = ppm_max
+        # b negatif: rasio kecil = ppm besar; grid harus naik untuk np.interp
+        floor = min(ppm_min, a * clean_air_ratio ** b)
+        log_ppm = np.linspace(np.log10(ppm_max), np.log10(floor), size)
+        self.log_ratio = (log_ppm - np.log10(a)) / b
+        self.log_ppm = log_ppm
+
+    def ppm(self, ratio) -> np.ndarray:
+        # Rasio NaN (dropout, belum dikalibrasi) tetap NaN
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_ratio = np.log10(ratio)
+        return 10.0 ** np.interp(log_ratio, self.log_ratio, self.log_ppm)
+
+    def to_dict(self) -> dict:
+        return {"gas": self.gas, "a": self.a, "b": self.b, "clean_air_ratio": self.clean_air_ratio,
+                "ppm_min": self.ppm_min, "ppm_max": self.ppm_max}
+
+
+# Kurva gas target per sensor (pendekatan power-law dari grafik sensitivitas datasheet)
+CURVES = {
+    "mq135": GasCurve("CO2", 116.6020682, -2.769034857, 3.6, 10, 10000),
+    "mq2": GasCurve("LPG", 574.25, -2.222, 9.83, 200, 10000),
+    "mq4": GasCurve("CH4", 1012.7, -2.786, 4.4, 200, 10000),
+    "mq7": GasCurve("CO", 99.042, -1.518, 27.5, 20, 2000),
+}
+
+
+def sensor_resistance(volts, load_kohm=MQ_LOAD_KOHM, supply_v=MQ_SUPPLY_VOLTAGE) -> np.ndarray:
+    """Rs (kΩ) dari tegangan keluaran; tegangan <= 0 atau >= Vc (dropout/saturasi) -> NaN."""
+    volts = np.asarray(volts, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = load_kohm * (supply_v - volts) / volts
+    rs[~((volts > 0) & (volts < supply_v))] = np.nan
+    return rs
+
+
+class DeviceCalibration:
+    """R0 dan rangkaian satu perangkat; semua metode menerima array N x 4 (urutan CHANNELS)."""
+
+    def __init__(self, r0: dict, load_kohm=MQ_LOAD_KOHM, supply_v=MQ_SUPPLY_VOLTAGE, curves=CURVES):
+        self.r0 = np.array([np.nan if r0.get(ch) is None else r0[ch] for ch in CHANNELS], dtype=np.float64)
+        self.load_kohm = load_kohm
+        self.supply_v = supply_v
+        self.curves = [curves[ch] for ch in CHANNELS]
+
+    def ratio(self, volts) -> np.ndarray:
+        return sensor_resistance(volts, self.load_kohm, self.supply_v) / self.r0
+
+    def ppm(self, ratio) -> np.ndarray:
+        ratio = np.atleast_2d(ratio)
+        out = np.empty(ratio.shape, dtype=np.float64)
+        for c, curve in enumerate(self.curves):
+            out[:, c] = curve.ppm(ratio[:, c])
+        return out
+
+    def convert(self, volts):
+        """Tegangan N x 4 -> (Rs/R0, ppm), keduanya N x 4."""
+        ratio = self.ratio(np.atleast_2d(volts))
+        return ratio, self.ppm(ratio)
+
+
+def calibrate_r0(volts, load_kohm=MQ_LOAD_KOHM, supply_v=MQ_SUPPLY_VOLTAGE, curves=CURVES,
+                 min_samples=CALIBRATION_MIN_SAMPLES) -> dict:
+    """R0 per sensor dari rekaman udara bersih: median Rs dibagi rasio udara bersih datasheet.
+
+    Median dipakai agar dropout dan lonjakan sesaat tidak menggeser baseline.
+    Sensor dengan sampel valid kurang dari min_samples diberi None.
+    """
+    rs = sensor_resistance(np.atleast_2d(volts), load_kohm, supply_v)
+    valid = np.count_nonzero(~np.isnan(rs), axis=0)
+    r0 = {}
+    for c, ch in enumerate(CHANNELS):
+        if valid[c] < min_samples:
+            r0[ch] = None
+            continue
+        r0[ch] = float(np.nanmedian(rs[:, c]) / curves[ch].clean_air_ratio)
+    return r0
+
+
+def json_safe(values: np.ndarray) -> list:
+    # NaN tidak valid di JSON: diganti None
+    out = np.asarray(values, dtype=object)
+    out[np.isnan(np.asarray(values, dtype=np.float64))] = None
+    return out.tolist()
+
+
+class CalibrationStore:
+    """Kalibrasi per perangkat di file JSON, dimuat sekali dan disimpan atomik (tmp + rename)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._devices = None
+        self._cache = {}
+
+    def devices(self) -> dict:
+        with self._lock:
+            if self._devices is None:
+                try:
+                    with open(self.path) as f:
+                        self._devices = json.load(f).get("devices", {})
+                except FileNotFoundError:
+                    self._devices = {}
+            return self._devices
+
+    def get(self, device_id: str):
+        """DeviceCalibration untuk perangkat, None bila belum pernah dikalibrasi."""
+        cached = self._cache.get(device_id)
+        if cached is not None:
+            return cached
+        entry = self.devices().get(device_id)
+        if entry is None:
+            return None
+        calibration = DeviceCalibration(
+            entry["r0"],
+            load_kohm=entry.get("load_kohm", MQ_LOAD_KOHM),
+            supply_v=entry.get("supply_v", MQ_SUPPLY_VOLTAGE),
+        )
+        self._cache[device_id] = calibration
+        return calibration
+
+    def set_r0(self, device_id: str, r0: dict, samples: int = 0,
+               load_kohm=MQ_LOAD_KOHM, supply_v=MQ_SUPPLY_VOLTAGE) -> dict:
+        devices = self.devices()
+        with self._lock:
+            previous = devices.get(device_id, {}).get("r0", {})
+            entry = {
+                # Sensor yang gagal dikalibrasi mempertahankan R0 lama
+                "r0": {ch: r0.get(ch) if r0.get(ch) is not None else previous.get(ch) for ch in CHANNELS},
+                "load_kohm": load_kohm,
+                "supply_v": supply_v,
+                "samples": samples,
+                "calibrated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            devices[device_id] = entry
+            self._cache.pop(device_id, None)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"devices": devices}, f, indent=2)
+            os.replace(tmp, self.path)
+        logger.info(f"✅ R0 perangkat {device_id} disimpan: {entry['r0']}")
+        return entry
+
+
+calibration_store = CalibrationStore(CALIBRATION_PATH)
+
+
+def save_capture(device_id: str, r0: dict, samples: int, store: CalibrationStore = None) -> dict:
+    """Menyimpan hasil calibrate_r0 beserta status per sensor.
+
+    ValueError tanpa menulis apa pun bila tidak ada sensor yang mendapat R0.
+    Status: "calibrated" (R0 baru), "previous" (gagal, R0 lama dipertahankan)
+    atau "missing" (gagal, belum pernah dikalibrasi); `complete` hanya True
+    bila semua sensor mendapat R0 baru.
+    """
+    store = store or calibration_store
+    if all(r0.get(ch) is None for ch in CHANNELS):
+        raise ValueError(f"Not enough clean-air samples ({samples})")
+    previous = store.devices().get(device_id, {}).get("r0", {})
+    channels = {
+        ch: "calibrated" if r0.get(ch) is not None else "previous" if previous.get(ch) is not None else "missing"
+        for ch in CHANNELS
+    }
+    entry = store.set_r0(device_id, r0, samples=samples)
+    return {**entry, "channels": channels, "complete": all(s == "calibrated" for s in channels.values())}
+
+
+def capture_from_db(db, device_id: str, start: datetime, end: datetime) -> dict:
+    """Kalibrasi R0 dari rentang rekaman udara bersih di sensor_data lalu disimpan (lihat save_capture)."""
+    from app.models import SensorData
+    from app.services.adc import volt_columns
+
+    rows = db.query(*volt_columns()).filter(
+        SensorData.device_id == device_id, SensorData.timestamp >= start, SensorData.timestamp < end
+    ).all()
+    volts = np.array(rows, dtype=np.float64).reshape(-1, len(CHANNELS))
+    return save_capture(device_id, calibrate_r0(volts), len(rows))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Kalibrasi R0 sensor MQ per perangkat")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="Tampilkan R0 tersimpan dan kurva gas")
+    capture = sub.add_parser("capture", help="Hitung R0 dari rekaman udara bersih di database")
+    capture.add_argument("--device", default="local")
+    capture.add_argument("--start", required=True, type=datetime.fromisoformat)
+    capture.add_argument("--end", required=True, type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(json.dumps({"devices": calibration_store.devices(),
+                          "curves": {ch: c.to_dict() for ch, c in CURVES.items()}}, indent=2))
+    else:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            print(json.dumps(capture_from_db(db, args.device, args.start, args.end), indent=2))
+        except ValueError as e:
+            logger.error(f"❌ Kalibrasi {args.device} gagal, R0 tidak diubah: {e}")
+        finally:
+            db.close()
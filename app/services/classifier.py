@@ -0,0 +1,221 @@
+import argparse
+import os
+import re
+import threading
+import logging
+import numpy as np
+from app.services.replay_reader import parse_recording, resolve_files
+from app.services.adc import CHANNELS
+
+logger = logging.getLogger(__name__)
+
+_BLEND_RE = re.compile(r"([\d.]+)%\s*(arabika|robusta)\s*\+\s*([\d.]+)%\s*(arabika|robusta)", re.IGNORECASE)
+
+
+def _pct(value: float) -> str:
+    return f"{value:g}"
+
+
+def parse_blend(label: str):
+    """Persentase campuran dari teks label/nama file, mis. '33.33%Robusta+66.67%Arabika'
+    -> {'robusta': 33.33, 'arabika': 66.67}. None bila bukan label campuran."""
+    m = _BLEND_RE.search(label)
+    if not m:
+        return None
+    return {m.group(2).lower(): float(m.group(1)), m.group(4).lower(): float(m.group(3))}
+
+
+def label_from_filename(path: str):
+    """Label kelas dari nama file rekaman, mis. '33.33%Robusta+66.67%Arabika.csv'
+    -> '66.67%arabika+33.33%robusta'; 'arabika2.csv' -> 'arabika'. None bila tidak dikenal."""
+    name = os.path.splitext(os.path.basename(path))[0].lower()
+    parts = parse_blend(name)
+    if parts:
+        return f"{_pct(parts.get('arabika', 0))}%arabika+{_pct(parts.get('robusta', 0))}%robusta"
+    for kind in ("arabika", "robusta"):
+        if name.startswith(kind):
+            return kind
+    return None
+
+
+def usable_rows(X) -> np.ndarray:
+    """Mask baris yang boleh dilatih/diklasifikasi, aturan yang sama untuk keduanya.
+
+    NaN berarti channel tidak aktif (di luar mask akuisisi) dan boleh kosong;
+    channel aktif bernilai <= 0 V adalah pembacaan gagal, sehingga barisnya
+    dibuang. Baris tanpa satu pun channel aktif juga dibuang.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    active = ~np.isnan(X)
+    return active.any(axis=1) & ~np.any(active & (X <= 0), axis=1)
+
+
+class AromaClassifier:
+    """k-nearest-neighbour atas prototipe terstandarisasi, sepenuhnya NumPy.
+
+    Model (.npz) hanya berisi prototipe per kelas (diambil merata dari data
+    latih, paling banyak `per_class`), mean/skala standarisasi dan k. Inferensi
+    batch: jarak kuadrat lewat satu perkalian matriks, argpartition k tetangga
+    lalu voting dengan bincount. Nilai channel yang tidak aktif (None/NaN)
+    diganti mean data latih.
+    """
+
+    def __init__(self, classes, prototypes, proto_labels, mean, scale, k=5):
+        self.classes = np.asarray(classes)
+        self.prototypes = np.asarray(prototypes, dtype=np.float32)
+        self.proto_labels = np.asarray(proto_labels, dtype=np.int64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.k = int(min(k, len(self.prototypes)))
+        self._proto_sq = np.einsum("ij,ij->i", self.prototypes, self.prototypes)
+
+    @classmethod
+    def fit(cls, X, y, k: int = 5, per_class: int = 400):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = (X - mean) / scale
+        classes, inverse = np.unique(y, return_inverse=True)
+        keep = []
+        for c in range(len(classes)):
+            members = np.flatnonzero(inverse == c)
+            n = min(per_class, len(members))
+            keep.append(members[np.linspace(0, len(members) - 1, n).astype(np.int64)])
+        keep = np.concatenate(keep)
+        return cls(classes, Z[keep], inverse[keep], mean, scale, k)
+
+    def _prepare(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        X = np.where(np.isnan(X), self.mean, X)
+        return ((X - self.mean) / self.scale).astype(np.float32)
+
+    def _neighbours(self, X):
+        Z = self._prepare(X)
+        dist = self._proto_sq[None, :] - 2.0 * (Z @ self.prototypes.T)
+        return np.argpartition(dist, self.k - 1, axis=1)[:, :self.k]
+
+    def _votes(self, X):
+        labels = self.proto_labels[self._neighbours(X)]
+        n, k = labels.shape
+        flat = labels + (np.arange(n) * len(self.classes))[:, None]
+        return np.bincount(flat.ravel(), minlength=n * len(self.classes)).reshape(n, -1)
+
+    def predict(self, X):
+        return self.classes[np.argmax(self._votes(X), axis=1)]
+
+    def predict_proba(self, X):
+        return self._votes(X) / float(self.k)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, classes=self.classes.astype(str), prototypes=self.prototypes,
+                            proto_labels=self.proto_labels, mean=self.mean, scale=self.scale,
+                            k=np.array(self.k))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as f:
+            return cls(f["classes"], f["prototypes"], f["proto_labels"], f["mean"], f["scale"], int(f["k"]))
+
+
+def load_training_data(patterns):
+    """Mengambil (X, y) file rekaman berlabel dari store dataset terkompilasi.
+
+    Baris disaring dengan usable_rows (sama dengan inferensi) dan harus
+    lengkap 4 channel; file di luar store (DATASET_SOURCES) dibaca langsung
+    dari CSV.
+    """
+    from app.services.dataset import load_dataset
+
+    dataset = load_dataset()
+    stored = {s["path"] for s in dataset.sources}
+    files = []
+    X, y = [], []
+    for path in resolve_files(patterns):
+        label = label_from_filename(path)
+        if label is None:
+            logger.warning(f"⚠️ Label tidak dikenali dari nama file, dilewati: {path}")
+            continue
+        if path in stored:
+            files.append(path)
+            continue
+        rows = parse_recording(path)[1]
+        if not len(rows):
+            continue
+        rows = rows[usable_rows(rows) & ~np.any(np.isnan(rows), axis=1)]
+        X.append(rows)
+        y.extend([label] * len(rows))
+    idx = dataset.rows(files=files)
+    if len(idx):
+        rows = np.asarray(dataset.values[idx], dtype=np.float64)
+        keep = usable_rows(rows) & ~np.any(np.isnan(rows), axis=1)
+        X.append(rows[keep])
+        y.extend(dataset.label_names(dataset.label[idx][keep]))
+    if not X:
+        raise ValueError(f"Tidak ada data latih yang cocok: {patterns}")
+    return np.vstack(X), np.array(y)
+
+
+def train(patterns, model_path: str, k: int = 5, per_class: int = 400) -> AromaClassifier:
+    X, y = load_training_data(patterns)
+    model = AromaClassifier.fit(X, y, k, per_class)
+    accuracy = float(np.mean(model.predict(X) == y))
+    model.save(model_path)
+    logger.info(f"✅ Model {len(model.classes)} kelas dilatih dari {len(X)} sampel "
+                f"(akurasi latih {accuracy:.3f}), disimpan ke {model_path}")
+    return model
+
+
+_model = None
+_model_lock = threading.Lock()
+_model_missing = False
+
+
+def get_model():
+    """Model dimuat sekali (lazy). None bila file model belum ada."""
+    global _model, _model_missing
+    if _model is None and not _model_missing:
+        from app.config import CLASSIFIER_MODEL_PATH
+
+        with _model_lock:
+            if _model is None and not _model_missing:
+                if os.path.exists(CLASSIFIER_MODEL_PATH):
+                    _model = AromaClassifier.load(CLASSIFIER_MODEL_PATH)
+                    logger.info(f"✅ Model klasifikasi dimuat: {CLASSIFIER_MODEL_PATH}")
+                else:
+                    _model_missing = True
+                    logger.warning(f"⚠️ Model klasifikasi tidak ditemukan: {CLASSIFIER_MODEL_PATH}")
+    return _model
+
+
+def classify_batch(samples) -> list:
+    """Klasifikasi batch dict sampel (kolom channel, None = channel tidak aktif).
+
+    Baris yang tidak lolos usable_rows (channel aktif mati) mendapat None.
+    """
+    model = get_model()
+    if model is None or not samples:
+        return [None] * len(samples)
+    X = np.array([[np.nan if s.get(ch) is None else float(s[ch]) for ch in CHANNELS] for s in samples],
+                 dtype=np.float64)
+    result = [None] * len(samples)
+    usable = np.flatnonzero(usable_rows(X))
+    if len(usable):
+        for i, jenis in zip(usable, model.predict(X[usable]).tolist()):
+            result[i] = jenis
+    return result
+
+
+if __name__ == "__main__":
+    from app.config import CLASSIFIER_MODEL_PATH, CLASSIFIER_TRAIN_FILES
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Latih model klasifikasi aroma dari data/*.csv")
+    parser.add_argument("--files", default=CLASSIFIER_TRAIN_FILES, help="Pola file latih, dipisah koma")
+    parser.add_argument("--out", default=CLASSIFIER_MODEL_PATH)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--per-class", type=int, default=400, help="Jumlah prototipe maksimum per kelas")
+    args = parser.parse_args()
+    train(args.files, args.out, args.k, args.per_class)
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import logging
+import numpy as np
+from app.services.classifier import label_from_filename, parse_blend
+from app.services.replay_reader import parse_recording, resolve_files
+from app.services.adc import CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# Naikkan bila format store berubah agar store lama dibangun ulang
+STORE_VERSION = 1
+INDEX_FILE = "index.json"
+ARRAYS = ("timestamp", "values", "source", "label", "tag", "arabika")
+
+
+def label_fraction(label) -> float:
+    """Fraksi arabika (0..1) dari label kelas: 'arabika' -> 1, 'robusta' -> 0,
+    '66.67%arabika+33.33%robusta' -> 0.6667. NaN bila label tidak dikenal."""
+    if not label:
+        return float("nan")
+    parts = parse_blend(label.lower())
+    if parts:
+        total = parts.get("arabika", 0.0) + parts.get("robusta", 0.0)
+        return parts.get("arabika", 0.0) / total if total else float("nan")
+    return {"arabika": 1.0, "robusta": 0.0}.get(label.lower(), float("nan"))
+
+
+def arabika_fraction(path: str) -> float:
+    """Fraksi arabika dari nama file rekaman, mis. '33.33%Robusta+66.67%Arabika.csv' -> 0.6667."""
+    return label_fraction(label_from_filename(path))
+
+
+def _fingerprint(paths) -> list:
+    # Ukuran + mtime cukup untuk mendeteksi file yang berubah tanpa membacanya
+    result = []
+    for path in paths:
+        st = os.stat(path)
+        result.append([path, st.st_size, st.st_mtime_ns])
+    return result
+
+
+def _codes(names, vocabulary: dict) -> np.ndarray:
+    # Label string -> kode int16 (-1 = tidak berlabel); vocabulary diperluas di tempat
+    out = np.empty(len(names), dtype=np.int16)
+    for i, name in enumerate(names):
+        if not name:
+            out[i] = -1
+            continue
+        out[i] = vocabulary.setdefault(name, len(vocabulary))
+    return out
+
+
+def compile_dataset(patterns, root: str) -> dict:
+    """Mem-parse semua file sekali dan menulis store biner ke root.
+
+    Isi store (satu .npy per kolom, bisa di-mmap):
+      timestamp float64, values float32 N x 4, source int16 (indeks file),
+      label int16 (kelas dari nama file), tag int16 (kolom jenis/kualitas),
+      arabika float32 (fraksi arabika dari nama file, NaN bila tidak diketahui).
+    Baris sensor mati (semua channel 0/kosong) dibuang. index.json memuat
+    fingerprint sumber, kosakata label dan indeks label -> rentang baris.
+    Store ditulis ke direktori sementara lalu di-rename, sehingga pembaca
+    tidak pernah melihat store setengah jadi.
+    """
+    files = resolve_files(patterns)
+    if not files:
+        raise ValueError(f"Tidak ada file dataset yang cocok: {patterns}")
+    started = time.perf_counter()
+    columns = {name: [] for name in ARRAYS}
+    labels, tags = {}, {}
+    sources = []
+    offset = 0
+    for i, path in enumerate(files):
+        ts, values, tag = parse_recording(path)
+        values = values.astype(np.float32)
+        alive = ~np.all((values == 0) | np.isnan(values), axis=1)
+        label = label_from_filename(path)
+        n = int(alive.sum())
+        columns["timestamp"].append(ts[alive])
+        columns["values"].append(values[alive])
+        columns["source"].append(np.full(n, i, dtype=np.int16))
+        columns["label"].append(np.full(n, labels.setdefault(label, len(labels)) if label else -1,
+                                        dtype=np.int16))
+        columns["tag"].append(_codes([t for t, keep in zip(tag, alive) if keep], tags))
+        columns["arabika"].append(np.full(n, arabika_fraction(path), dtype=np.float32))
+        sources.append({"path": path, "label": label, "start": offset, "stop": offset + n,
+                        "dropped": int(len(alive) - n)})
+        offset += n
+
+    label_index = {}
+    for s in sources:
+        if s["label"] is not None and s["stop"] > s["start"]:
+            label_index.setdefault(s["label"], []).append([s["start"], s["stop"]])
+    index = {
+        "version": STORE_VERSION,
+        "patterns": patterns if isinstance(patterns, str) else ",".join(patterns),
+        "fingerprint": _fingerprint(files),
+        "rows": offset,
+        "channels": CHANNELS,
+        "labels": list(labels),
+        "tags": list(tags),
+        "sources": sources,
+        "label_index": label_index,
+    }
+
+    tmp = root.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name in ARRAYS:
+        np.save(os.path.join(tmp, f"{name}.npy"), np.concatenate(columns[name]))
+    with open(os.path.join(tmp, INDEX_FILE), "w") as f:
+        json.dump(index, f)
+    old = root.rstrip("/") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(root):
+        os.replace(root, old)
+    os.replace(tmp, root)
+    shutil.rmtree(old, ignore_errors=True)
+    dropped = sum(s["dropped"] for s in sources)
+    logger.info(f"✅ Dataset {offset} baris dari {len(files)} file ({dropped} baris sensor mati dibuang) "
+                f"dikompilasi ke {root} dalam {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def _read_index(root: str):
+    try:
+        with open(os.path.join(root, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(index, patterns) -> bool:
+    if index is None or index.get("version") != STORE_VERSION:
+        return True
+    try:
+        return index["fingerprint"] != _fingerprint(resolve_files(patterns))
+    except OSError:
+        return True
+
+
+class TrainingDataset:
+    """Store dataset yang sudah dikompilasi, kolom dibuka sebagai memmap (read-only).
+
+    Baris satu file selalu bersebelahan, jadi seleksi per file atau per label
+    cukup memotong rentang dari index tanpa memindai kolom.
+    """
+
+    def __init__(self, root: str, index: dict):
+        self.root = root
+        self.index = index
+        self.labels = index["labels"]
+        self.tags = index["tags"]
+        self.sources = index["sources"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(root, f"{name}.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return self.index["rows"]
+
+    def label_names(self, codes) -> np.ndarray:
+        # Kode label -> nama kelas (None untuk -1)
+        names = np.array(self.labels + [None], dtype=object)
+        return names[np.asarray(codes)]
+
+    def rows(self, files=None, labels=None) -> np.ndarray:
+        """Indeks baris untuk file (path persis) dan/atau label tertentu, urut."""
+        files = set(files) if files is not None else None
+        labels = set(labels) if labels is not None else None
+        parts = [np.arange(s["start"], s["stop"]) for s in self.sources
+                 if (files is None or s["path"] in files) and (labels is None or s["label"] in labels)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def load_dataset(patterns=None, root: str = None, rebuild: bool = False) -> TrainingDataset:
+    """Membuka store dataset; dikompilasi ulang hanya bila file sumber berubah."""
+    from app.config import DATASET_SOURCES, DATASET_DIR
+
+    patterns = patterns or DATASET_SOURCES
+    root = root or DATASET_DIR
+    index = _read_index(root)
+    if rebuild or is_stale(index, patterns):
+        index = compile_dataset(patterns, root)
+    return TrainingDataset(root, index)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Kompilasi data/*.csv menjadi store dataset biner")
+    parser.add_argument("--files", default=None, help="Pola file sumber, dipisah koma (default DATASET_SOURCES)")
+    parser.add_argument("--root", default=None, help="Direktori store (default DATASET_DIR)")
+    parser.add_argument("--force", action="store_true", help="Kompilasi ulang walau sumber tidak berubah")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    dataset = load_dataset(args.files, args.root, rebuild=args.force)
+    print(f"{len(dataset)} baris, {len(dataset.sources)} file, dibuka dalam "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+    for label, ranges in sorted(dataset.index["label_index"].items()):
+        print(f"  {label:<28} {sum(b - a for a, b in ranges):>6} baris")
@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+import math
+import time
+from datetime import datetime, timezone
+import logging
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.config import DEVICE_ID
+from app.models import SensorData
+from app.services.metrics import DB_SECONDS
+from app.services.rollup import apply_rollups
+from app.services.adc import CHANNELS
+
+try:
+    import msgpack
+except ImportError:  # msgpack opsional, hanya untuk body application/msgpack
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["device_id", "timestamp"] + CHANNELS + ["jenis", "exported"]
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+# Rentang tegangan valid ADS1115 (gain terkecil ±6.144 V)
+MAX_VOLTAGE = 6.144
+MAX_DEVICE_ID = 64
+MAX_JENIS = 128
+# Baris per INSERT multi-baris: 9 kolom x 5000 di bawah batas 65535 parameter
+INSERT_CHUNK_ROWS = 5000
+
+
+def parse_payload(body: bytes, content_type: str) -> list:
+    """Body NDJSON (satu objek per baris) atau MessagePack (array objek atau stream objek) -> list dict."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise RuntimeError("msgpack belum terpasang, body MessagePack tidak didukung (pip install msgpack)")
+        records = []
+        for obj in msgpack.Unpacker(io.BytesIO(body), raw=False):
+            records.extend(obj if isinstance(obj, list) else [obj])
+        return records
+    if content_type in NDJSON_TYPES or content_type == "application/json":
+        text = body.decode("utf-8")
+        if content_type == "application/json":
+            data = json.loads(text)
+            return data if isinstance(data, list) else [data]
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    raise ValueError(f"Content-Type tidak didukung: {content_type or '-'}")
+
+
+def _parse_timestamp(value):
+    # ISO 8601 atau detik epoch; None bila tidak valid
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, tz=timezone.utc) if math.isfinite(value) else None
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def validate_batch(records: list, default_device: str = None):
+    """Validasi kolumnar satu batch sampel; mengembalikan (rows, rejected).
+
+    Channel dikumpulkan ke satu matriks float N x 4 dan diperiksa sekaligus
+    (numerik, hingga, 0..MAX_VOLTAGE) alih-alih membuat model pydantic per
+    baris. Sampel dengan semua channel kosong, timestamp tidak valid,
+    device_id kosong atau jenis bukan teks ditolak dengan indeks dan alasannya.
+    """
+    n = len(records)
+    errors = {}
+    values = np.full((n, len(CHANNELS)), np.nan)
+    numeric = np.ones(n, dtype=bool)
+    for i, r in enumerate(records):
+        if not isinstance(r, dict):
+            errors[i] = "sample must be an object"
+            numeric[i] = False
+            continue
+        try:
+            values[i] = [np.nan if r.get(ch) is None else float(r[ch]) for ch in CHANNELS]
+        except (TypeError, ValueError):
+            numeric[i] = False
+    present = ~np.isnan(values)
+    in_range = np.where(present, (values >= 0) & (values <= MAX_VOLTAGE), True).all(axis=1)
+    has_value = present.any(axis=1)
+    for i in np.flatnonzero(~numeric).tolist():
+        errors.setdefault(i, "channel values must be numbers")
+    for i in np.flatnonzero(numeric & ~in_range).tolist():
+        errors.setdefault(i, f"channel values must be within 0..{MAX_VOLTAGE} V")
+    for i in np.flatnonzero(numeric & ~has_value).tolist():
+        errors.setdefault(i, "at least one channel value is required")
+
+    rows = []
+    for i, r in enumerate(records):
+        if i in errors:
+            continue
+        ts = _parse_timestamp(r.get("timestamp"))
+        device = r.get("device_id") or default_device
+        jenis = r.get("jenis")
+        if ts is None:
+            errors[i] = "invalid timestamp"
+        elif not isinstance(device, str) or len(device) > MAX_DEVICE_ID:
+            errors[i] = f"device_id must be a string of at most {MAX_DEVICE_ID} characters"
+        elif jenis is not None and (not isinstance(jenis, str) or len(jenis) > MAX_JENIS):
+            errors[i] = f"jenis must be a string of at most {MAX_JENIS} characters"
+        else:
+            row = {"device_id": device, "timestamp": ts}
+            for c, ch in enumerate(CHANNELS):
+                row[ch] = float(values[i, c]) if present[i, c] else None
+            row["jenis"] = jenis
+            row["exported"] = False
+            rows.append(row)
+    rejected = [{"index": i, "error": errors[i]} for i in sorted(errors)]
+    return rows, rejected
+
+
+def _copy_rows(db: Session, rows) -> bool:
+    """COPY ... FROM STDIN lewat koneksi DBAPI sesi; False bila driver tidak mendukung."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    sql = f"COPY sensor_data ({', '.join(COLUMNS)}) FROM STDIN"
+    try:
+        if hasattr(cursor, "copy"):
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row([row[c] for c in COLUMNS])
+            return True
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2: CSV di memori, NULL = field kosong tanpa kutip
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                writer.writerow([
+                    "" if row[c] is None else row[c].isoformat() if c == "timestamp" else row[c]
+                    for c in COLUMNS
+                ])
+            buf.seek(0)
+            cursor.copy_expert(f"{sql} WITH (FORMAT csv)", buf)
+            return True
+        return False
+    finally:
+        cursor.close()
+
+
+def insert_rows(db: Session, rows) -> dict:
+    """Menyimpan batch sampel perangkat dalam satu transaksi: COPY bila tersedia,
+    selain itu INSERT multi-baris per INSERT_CHUNK_ROWS baris.
+
+    Baris ber-DEVICE_ID lokal (mis. backfill) ikut diupsert ke rollup di
+    transaksi yang sama, seperti jalur writer; perangkat lain tidak masuk
+    rollup dashboard.
+    """
+    if not rows:
+        return {"inserted": 0, "method": None, "ms": 0.0}
+    started = time.perf_counter()
+    try:
+        method = "copy" if _copy_rows(db, rows) else None
+        if method is None:
+            for i in range(0, len(rows), INSERT_CHUNK_ROWS):
+                db.execute(insert(SensorData).values(rows[i:i + INSERT_CHUNK_ROWS]))
+            method = "insert"
+        apply_rollups(db, [r for r in rows if r["device_id"] == DEVICE_ID])
+        DB_SECONDS.labels(op=f"device_{method}").observe(time.perf_counter() - started)
+        commit_started = time.perf_counter()
+        db.commit()
+        DB_SECONDS.labels(op="device_commit").observe(time.perf_counter() - commit_started)
+    except Exception:
+        db.rollback()
+        raise
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"✅ {len(rows)} sampel perangkat disimpan ({method}, {elapsed:.1f} ms)")
+    return {"inserted": len(rows), "method": method, "ms": round(elapsed, 2)}
@@ -0,0 +1,86 @@
+from datetime import datetime
+import numpy as np
+from app.services.adc import CHANNELS
+
+METHODS = ("lttb", "minmax")
+
+
+def _fill_nan(y):
+    # NaN (sensor tidak aktif/gagal) diisi rata-rata hanya untuk keperluan pemilihan titik
+    mask = np.isnan(y)
+    if not mask.any():
+        return y
+    fill = np.nanmean(y) if not mask.all() else 0.0
+    return np.where(mask, fill, y)
+
+
+def lttb_indices(x, y, n_out: int):
+    """Largest-Triangle-Three-Buckets: indeks n_out titik yang menjaga bentuk kurva.
+
+    Loop hanya per bucket keluaran; pemilihan titik di dalam bucket dihitung
+    vektor dengan NumPy.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = _fill_nan(np.asarray(y, dtype=np.float64))
+    x = np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo = hi
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(x, y, n_out: int):
+    """Min/max per bucket: setiap bucket menyumbang titik minimum dan maksimumnya."""
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = _fill_nan(np.asarray(y, dtype=np.float64))
+    buckets = max(1, (n_out - 2) // 2)
+    bucket_id = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket_id))
+    starts = np.searchsorted(bucket_id[order], np.arange(buckets), side="left")
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+def downsample_indices(x, values, max_points: int, method: str = "lttb"):
+    """Indeks baris yang dipertahankan untuk data multi-channel (maksimal max_points).
+
+    Anggaran titik dibagi rata ke channel yang berisi data; indeks terpilih
+    dari semua channel digabung sehingga puncak di channel mana pun tetap ada.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    if not max_points or n <= max_points:
+        return np.arange(n)
+    if method not in METHODS:
+        raise ValueError(f"Metode downsampling tidak dikenal: {method}")
+    active = [c for c in range(values.shape[1]) if not np.isnan(values[:, c]).all()] or [0]
+    budget = max(4, max_points // len(active))
+    pick = lttb_indices if method == "lttb" else minmax_indices
+    idx = np.unique(np.concatenate([pick(x, values[:, c], budget) for c in active]))
+    if len(idx) > max_points:
+        idx = idx[np.linspace(0, len(idx) - 1, max_points).astype(np.int64)]
+    return idx
+
+
+def downsample_rows(rows: list, max_points: int, method: str = "lttb") -> list:
+    """Downsampling untuk list dict hasil endpoint (timestamp ISO + kolom channel)."""
+    if not max_points or len(rows) <= max_points:
+        return rows
+    x = np.array([datetime.fromisoformat(r["timestamp"]).timestamp() for r in rows], dtype=np.float64)
+    values = np.array([[np.nan if r.get(ch) is None else r[ch] for ch in CHANNELS] for r in rows],
+                      dtype=np.float64)
+    return [rows[i] for i in downsample_indices(x, values, max_points, method)]
@@ -0,0 +1,164 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+from app.config import FEATURE_WINDOWS, ACQ_PERIOD
+from app.services.adc import CHANNELS
+
+# Rasio antar channel dihitung dari rata-rata jendela, terhadap mq4
+RATIOS = [("mq135", "mq4"), ("mq2", "mq4"), ("mq7", "mq4")]
+STATS = ("mean", "std", "slope", "min", "max", "rise")
+
+
+class _Window:
+    """Statistik bergulir satu panjang jendela untuk semua channel, O(1) per sampel.
+
+    Jumlah, jumlah kuadrat dan jumlah berbobot indeks (untuk slope regresi
+    linear) diperbarui secara inkremental: tambah sampel baru, kurangi sampel
+    yang keluar dari ring. Min/max memakai deque monoton (amortized O(1)).
+    Jumlah dihitung ulang dari ring setiap `size` sampel agar galat pembulatan
+    float tidak menumpuk.
+    """
+
+    def __init__(self, size: int, n_channels: int):
+        self.size = size
+        self.ring = np.zeros((size, n_channels))
+        self.count = 0
+        self.head = 0
+        self.sum = np.zeros(n_channels)
+        self.sumsq = np.zeros(n_channels)
+        self.sum_ix = np.zeros(n_channels)  # sum(j * x_j), j = 0 untuk sampel tertua
+        self.min_q = [deque() for _ in range(n_channels)]
+        self.max_q = [deque() for _ in range(n_channels)]
+        self._since_resync = 0
+
+    def push(self, x, seq: int):
+        n = self.count
+        if n == self.size:
+            old = self.ring[self.head]
+            # Sampel tertua keluar: indeks semua sampel tersisa turun satu
+            self.sum_ix += old - self.sum
+            self.sum -= old
+            self.sumsq -= old * old
+            n -= 1
+        self.sum_ix += n * x
+        self.sum += x
+        self.sumsq += x * x
+        self.ring[self.head] = x
+        self.head = (self.head + 1) % self.size
+        self.count = n + 1
+
+        expire = seq - self.size
+        for c, v in enumerate(x.tolist()):
+            q = self.min_q[c]
+            while q and q[-1][1] >= v:
+                q.pop()
+            q.append((seq, v))
+            if q[0][0] <= expire:
+                q.popleft()
+            q = self.max_q[c]
+            while q and q[-1][1] <= v:
+                q.pop()
+            q.append((seq, v))
+            if q[0][0] <= expire:
+                q.popleft()
+
+        self._since_resync += 1
+        if self._since_resync >= self.size and self.count == self.size:
+            self._resync()
+
+    def _resync(self):
+        ordered = np.roll(self.ring, -self.head, axis=0)
+        self.sum = ordered.sum(axis=0)
+        self.sumsq = (ordered * ordered).sum(axis=0)
+        self.sum_ix = np.arange(self.size) @ ordered
+        self._since_resync = 0
+
+    def features(self, period: float):
+        n = self.count
+        mean = self.sum / n
+        var = np.maximum(self.sumsq / n - mean * mean, 0.0)
+        if n > 1:
+            # Slope regresi x terhadap indeks 0..n-1, dikonversi ke satuan per detik
+            sum_i = n * (n - 1) / 2
+            sum_ii = (n - 1) * n * (2 * n - 1) / 6
+            slope = (n * self.sum_ix - sum_i * self.sum) / (n * sum_ii - sum_i * sum_i) / period
+        else:
+            slope = np.zeros_like(mean)
+        lo = np.array([q[0][1] for q in self.min_q])
+        hi = np.array([q[0][1] for q in self.max_q])
+        # Waktu naik: jarak dari minimum ke maksimum jendela bila maksimum datang setelahnya
+        rise = np.array([max(0, mx[0][0] - mn[0][0]) for mn, mx in zip(self.min_q, self.max_q)]) * period
+        return mean, np.sqrt(var), slope, lo, hi, rise
+
+
+class RollingFeatures:
+    """Tahap fitur streaming antara akuisisi dan penyimpanan/klasifikasi.
+
+    update() menerima satu sampel 4 channel per tick dan mengembalikan vektor
+    fitur untuk semua panjang jendela (dalam detik, dikonversi ke jumlah sampel
+    lewat period). Nilai None/NaN diisi nilai valid terakhir channel tersebut.
+    extract_batch() menjalankan kode streaming yang sama atas array historis,
+    sehingga fitur latih identik dengan fitur saat produksi.
+    """
+
+    def __init__(self, windows=(10, 60), period: float = 1.0):
+        self.period = period
+        self.window_seconds = tuple(windows)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            sizes = [max(2, int(round(w / self.period))) for w in self.window_seconds]
+            self._windows = [_Window(size, len(CHANNELS)) for size in sizes]
+            self._last = np.zeros(len(CHANNELS))
+            self._seq = 0
+            self.latest = None
+
+    def feature_names(self) -> list:
+        names = []
+        for w in self.window_seconds:
+            for stat in STATS:
+                names += [f"{ch}_{stat}_{w:g}s" for ch in CHANNELS]
+            names += [f"{a}/{b}_{w:g}s" for a, b in RATIOS]
+        return names
+
+    def update(self, values) -> np.ndarray:
+        x = np.asarray([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+        with self._lock:
+            x = np.where(np.isnan(x), self._last, x)
+            self._last = x
+            parts = []
+            for window in self._windows:
+                window.push(x, self._seq)
+                stats = window.features(self.period)
+                parts.extend(stats)
+                mean = stats[0]
+                parts.append(np.array([
+                    mean[CHANNELS.index(a)] / mean[CHANNELS.index(b)] if mean[CHANNELS.index(b)] else math.nan
+                    for a, b in RATIOS
+                ]))
+            self._seq += 1
+            self.latest = np.concatenate(parts)
+            return self.latest
+
+    def latest_dict(self):
+        latest = self.latest
+        if latest is None:
+            return None
+        return {name: (None if math.isnan(v) else v) for name, v in zip(self.feature_names(), latest.tolist())}
+
+
+def extract_batch(values, windows=(10, 60), period: float = 1.0) -> np.ndarray:
+    """Mode batch: matriks fitur (N x F) dari array historis N x 4, baris per baris
+    lewat RollingFeatures yang sama dengan jalur streaming."""
+    extractor = RollingFeatures(windows, period)
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty((len(values), len(extractor.feature_names())))
+    for i, row in enumerate(values):
+        out[i] = extractor.update(row)
+    return out
+
+
+feature_stage = RollingFeatures(FEATURE_WINDOWS, ACQ_PERIOD)
@@ -0,0 +1,259 @@
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import numpy as np
+from app.config import (
+    CLASSIFIER_MODEL_PATH, INFER_BATCH_SIZE, INFER_MAX_WAIT, INFER_WORKERS, INFER_QUEUE_SIZE,
+)
+from app.database import SessionLocal
+from app.services.broadcaster import broadcaster
+from app.services.classifier import AromaClassifier, CHANNELS
+from app.services.dataset import label_fraction
+from app.services.ring_buffer import ring_buffer
+from app.services.sensor_service import apply_classifications
+
+logger = logging.getLogger(__name__)
+
+# --- sisi proses worker ---
+
+_worker_model = None
+
+
+def _init_worker(model_path: str):
+    # Model dimuat sekali per proses worker, bukan per batch
+    global _worker_model
+    _worker_model = AromaClassifier.load(model_path) if os.path.exists(model_path) else None
+
+
+def predict_batch(X):
+    """Fungsi worker default: probabilitas kelas untuk batch vektor 4 channel.
+
+    Mengembalikan (nama kelas, matriks proba N x K) atau None bila model tidak ada.
+    """
+    if _worker_model is None:
+        return None
+    return _worker_model.classes.tolist(), _worker_model.predict_proba(X)
+
+
+def to_classifications(classes, proba) -> list:
+    """Proba kNN -> payload ai_classification {type, confidence, composition}.
+
+    Komposisi adalah fraksi arabika yang diharapkan (rata-rata fraksi kelas
+    berbobot proba), dalam format yang sama dengan hasil AI server.
+    """
+    fractions = np.array([label_fraction(c) for c in classes])
+    known = ~np.isnan(fractions)
+    weight = proba[:, known].sum(axis=1)
+    expected = (proba[:, known] @ fractions[known]) / np.where(weight > 0, weight, 1.0)
+    best = np.argmax(proba, axis=1)
+    return [
+        {
+            "type": classes[b],
+            "confidence": round(float(proba[i, b]), 4),
+            "composition": (
+                {"Arabika": round(float(expected[i]), 4), "Robusta": round(1.0 - float(expected[i]), 4)}
+                if weight[i] > 0 else None
+            ),
+        }
+        for i, b in enumerate(best.tolist())
+    ]
+
+
+# --- sisi aplikasi ---
+
+class InferenceService:
+    """Inferensi lokal dalam micro-batch di process pool, pengganti AI server remote.
+
+    submit() hanya memasukkan (key, vektor) ke antrian terbatas tanpa menunggu.
+    Thread dispatcher mengumpulkan antrian menjadi batch sampai `batch_size`
+    item atau `max_wait` detik sejak item pertama, lalu mengirim batch ke
+    ProcessPoolExecutor (paling banyak 2 batch per worker yang sedang berjalan).
+    Hasil yang selesai dikumpulkan dan ditulis balik sekaligus: satu UPDATE
+    ... FROM (VALUES ...) ke sensor_data per putaran, plus ring buffer dan WebSocket.
+
+    Key adalah id sampel yang diisi IngestWriter saat commit; karena antrian
+    diisi dari commit_hook, baris yang di-UPDATE selalu sudah ada di database. Vektor
+    boleh berupa jendela fitur bila predict_fn dilatih atas fitur.
+    """
+
+    def __init__(self, session_factory, model_path: str, batch_size=64, max_wait=0.5, workers=1,
+                 queue_size=10000, predict_fn=predict_batch):
+        self.session_factory = session_factory
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.workers = workers
+        self.predict_fn = predict_fn
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._in_flight = threading.Semaphore(2 * workers)
+        self.stats = {"submitted": 0, "dropped": 0, "batches": 0, "classified": 0,
+                      "written": 0, "errors": 0, "last_batch_ms": 0.0}
+
+    # --- sisi produsen ---
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def submit(self, key, vector) -> bool:
+        if not self.is_running():
+            return False
+        self.stats["submitted"] += 1
+        try:
+            self.queue.put_nowait((key, vector))
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def submit_samples(self, samples):
+        # Dipasang sebagai commit_hook IngestWriter
+        if not self.is_running():
+            return
+        for s in samples:
+            if s.get("id") is not None:
+                self.submit(s["id"], [math.nan if s.get(ch) is None else float(s[ch]) for ch in CHANNELS])
+
+    # --- siklus hidup ---
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        # spawn: worker tidak mewarisi thread/koneksi DB proses utama
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_path,),
+        )
+        self._thread = threading.Thread(target=self._run, name="inference", daemon=True)
+        self._thread.start()
+        logger.info(f"✅ Inferensi lokal berjalan (batch={self.batch_size}, max_wait={self.max_wait}s, "
+                    f"workers={self.workers})")
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        # Hasil batch terakhir yang selesai saat shutdown tetap disimpan
+        self._write_pending()
+        # Item yang belum sempat dibatch dibuang; sampel tetap ada di DB tanpa klasifikasi
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    # --- thread dispatcher ---
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._dispatch(batch)
+            self._write_pending()
+        batch = []
+        while not self.queue.empty() and len(batch) < self.batch_size:
+            batch.append(self.queue.get_nowait())
+        if batch:
+            self._dispatch(batch)
+
+    def _collect(self):
+        try:
+            batch = [self.queue.get(timeout=self.max_wait)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self, batch):
+        keys = [key for key, _ in batch]
+        X = np.array([vector for _, vector in batch], dtype=np.float64)
+        # Backpressure: dispatcher menunggu bila pool sudah penuh
+        while not self._in_flight.acquire(timeout=0.1):
+            self._write_pending()
+        started = time.perf_counter()
+        try:
+            future = self._executor.submit(self.predict_fn, X)
+        except Exception as e:
+            self._in_flight.release()
+            self.stats["errors"] += 1
+            logger.error(f"❌ Gagal mengirim batch inferensi: {e}")
+            return
+        future.add_done_callback(lambda f: self._done(keys, f, started))
+        self.stats["batches"] += 1
+
+    def _done(self, keys, future, started):
+        self._in_flight.release()
+        self.stats["last_batch_ms"] = (time.perf_counter() - started) * 1000
+        try:
+            result = future.result()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"❌ Batch inferensi gagal: {e}")
+            return
+        if result is None:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ Model klasifikasi tidak ditemukan di worker: {self.model_path}")
+            return
+        classes, proba = result
+        self._results.put(list(zip(keys, to_classifications(classes, proba))))
+
+    # --- tulis balik ---
+
+    def _write_pending(self):
+        results = []
+        while True:
+            try:
+                results.extend(self._results.get_nowait())
+            except queue.Empty:
+                break
+        if results:
+            self._write_results(results)
+
+    def _write_results(self, results):
+        self.stats["classified"] += len(results)
+        items = [(("id", key), c) for key, c in results]
+        db = self.session_factory()
+        try:
+            self.stats["written"] += len(apply_classifications(db, items))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats["errors"] += 1
+            logger.error(f"❌ Gagal menulis {len(items)} hasil klasifikasi: {e}")
+        finally:
+            db.close()
+        for (_, sample_id), c in items:
+            ring_buffer.attach_classification(c, sample_id=sample_id)
+        latest = ring_buffer.latest()
+        if latest:
+            broadcaster.publish(latest)
+
+
+inference_service = InferenceService(
+    SessionLocal,
+    CLASSIFIER_MODEL_PATH,
+    batch_size=INFER_BATCH_SIZE,
+    max_wait=INFER_MAX_WAIT,
+    workers=INFER_WORKERS,
+    queue_size=INFER_QUEUE_SIZE,
+)
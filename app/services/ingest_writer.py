@@ -0,0 +1,315 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import logging
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.config import DEVICE_ID
+from app.models import SensorData
+from app.services.rollup import apply_rollups
+from app.services.metrics import DB_SECONDS
+from app.services.adc import CHANNELS, RAW_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DB_INSERT_SECONDS = DB_SECONDS.labels(op="insert")
+DB_COMMIT_SECONDS = DB_SECONDS.labels(op="commit")
+
+SENSOR_FIELDS = ["timestamp"] + CHANNELS + ["jenis", "session_id"]
+
+
+def _to_row(sample: dict) -> dict:
+    row = {field: sample.get(field) for field in SENSOR_FIELDS}
+    if isinstance(row["timestamp"], str):
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    row["device_id"] = sample.get("device_id") or DEVICE_ID
+    row["exported"] = False
+    # Semua baris batch harus punya kunci yang sama (executemany), termasuk sampel jurnal lama
+    raw = sample.get("raw")
+    row.update(zip(RAW_COLUMNS, raw or [None] * len(RAW_COLUMNS)))
+    row["adc_fsr_mv"] = sample.get("adc_fsr_mv") if raw else None
+    return row
+
+
+def _is_transient(e: Exception) -> bool:
+    # Database tidak tersedia (koneksi putus, pool habis, server mati): jurnal lalu coba lagi.
+    # Selain itu (constraint, tipe data, sampel rusak) kesalahan ada di data, bukan di database.
+    if isinstance(e, DBAPIError) and e.connection_invalidated:
+        return True
+    return isinstance(e, (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError))
+
+
+def _stored(row: dict) -> dict:
+    # Sampel dengan hitungan mentah disimpan tanpa kolom volt; volt dihitung ulang saat dibaca
+    if row["adc_fsr_mv"] is None:
+        return row
+    return {**row, **dict.fromkeys(CHANNELS)}
+
+
+class IngestWriter:
+    """Writer tunggal yang menyimpan sampel sensor ke database secara batch.
+
+    Akuisisi cukup memanggil submit() yang tidak pernah menunggu database.
+    Sampel dikumpulkan dari antrian terbatas lalu di-insert sekaligus setiap
+    `batch_size` sampel atau setiap `flush_interval` detik (satu commit per
+    batch). Jika database lambat/mati atau antrian penuh, sampel ditulis ke
+    jurnal append-only di disk dan diputar ulang ketika database pulih.
+    Hanya error koneksi yang dianggap "database mati"; batch yang ditolak
+    karena datanya dibelah dua berulang kali sampai baris penyebabnya
+    ketemu, lalu baris itu dipindah ke file dead-letter dan sisanya disimpan.
+    Log API per sampel tidak ikut di transaksi ini: setelah commit diserahkan
+    ke `log_sink` (ApiLogSink) yang menyampel dan menyimpannya secara batch.
+    """
+
+    def __init__(self, session_factory, batch_size=200, flush_interval=1.0,
+                 queue_size=10000, journal_path="spool/ingest_journal.ndjson", retry_interval=5.0,
+                 log_sink=None, dead_letter_path="spool/ingest_dead_letter.ndjson"):
+        self.session_factory = session_factory
+        self.log_sink = log_sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.journal_path = journal_path
+        self.dead_letter_path = dead_letter_path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.latency_hook = None
+        # Dipanggil dengan list sampel setelah batch ter-commit, masing-masing sudah berisi "id"
+        # (mis. ring buffer dan antrian inferensi lokal)
+        self.commit_hook = None
+        self._journal_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._db_down_until = 0.0
+        self.stats = {"submitted": 0, "committed": 0, "batches": 0, "spilled": 0, "replayed": 0, "db_errors": 0,
+                      "dead_lettered": 0}
+
+    # --- sisi akuisisi ---
+
+    def submit(self, sample: dict) -> bool:
+        self.stats["submitted"] += 1
+        try:
+            self.queue.put_nowait((time.monotonic(), sample))
+            return True
+        except queue.Full:
+            # Antrian penuh: jangan menahan akuisisi, langsung ke jurnal
+            self._spill([sample])
+            return False
+
+    # --- siklus hidup ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"✅ Ingest writer berjalan (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        try:
+            # Membangunkan writer yang sedang menunggu antrian (flush_interval bisa lebih lama dari timeout)
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def dead_letter_size(self) -> int:
+        try:
+            return os.path.getsize(self.dead_letter_path)
+        except OSError:
+            return 0
+
+    def has_journal(self) -> bool:
+        return bool(self.journal_size()) or os.path.exists(self.journal_path + ".replay")
+
+    # --- sisi writer ---
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop.is_set() and self.queue.empty()):
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+                if item is not None:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                elif self.has_journal() and not self._db_is_down():
+                    self._replay_journal()
+                deadline = time.monotonic() + self.flush_interval
+        if batch:
+            self._flush(batch)
+        if self.has_journal() and not self._db_is_down():
+            self._replay_journal()
+
+    def _db_is_down(self) -> bool:
+        return time.monotonic() < self._db_down_until
+
+    def _insert(self, samples) -> list:
+        # Mengembalikan id baris baru sesuai urutan sampel
+        db = self.session_factory()
+        try:
+            rows = [_to_row(s) for s in samples]
+            start = time.perf_counter()
+            result = db.execute(insert(SensorData).returning(SensorData.id, sort_by_parameter_order=True),
+                                [_stored(r) for r in rows])
+            ids = result.scalars().all()
+            # Rollup diperbarui di transaksi yang sama dengan data mentah (dari volt di memori)
+            apply_rollups(db, rows)
+            DB_INSERT_SECONDS.observe(time.perf_counter() - start)
+            start = time.perf_counter()
+            db.commit()
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write(self, samples):
+        """Menyimpan sampel, memisahkan baris yang ditolak database ke dead-letter.
+
+        Mengembalikan (committed, remaining, error): sampel yang ter-commit
+        (sudah berisi "id"), dan bila database tidak tersedia di tengah jalan,
+        sisa sampel yang belum tersimpan beserta error-nya. Sub-batch diproses
+        berurutan, jadi `remaining` selalu akhiran dari `samples`.
+        """
+        committed = []
+        pending = [samples]
+        while pending:
+            chunk = pending.pop()
+            try:
+                ids = self._insert(chunk)
+            except Exception as e:
+                if _is_transient(e):
+                    return committed, chunk + [s for c in reversed(pending) for s in c], e
+                if len(chunk) == 1:
+                    self._dead_letter(chunk[0], e)
+                    continue
+                # Belah dua; bagian kiri diproses lebih dulu agar urutan tetap
+                mid = len(chunk) // 2
+                pending.append(chunk[mid:])
+                pending.append(chunk[:mid])
+                continue
+            for sample, sample_id in zip(chunk, ids):
+                sample["id"] = sample_id
+            committed.extend(chunk)
+        return committed, [], None
+
+    def _flush(self, batch):
+        samples = [sample for _, sample in batch]
+        if self._db_is_down():
+            self._spill(samples)
+            return
+        committed, remaining, error = self._write(samples)
+        if remaining:
+            self.stats["db_errors"] += 1
+            self._db_down_until = time.monotonic() + self.retry_interval
+            logger.error(f"❌ Gagal menyimpan batch {len(remaining)} sampel, dialihkan ke jurnal: {error}")
+            self._spill(remaining)
+        if committed:
+            self.stats["committed"] += len(committed)
+            self.stats["batches"] += 1
+            self._committed(committed)
+            if self.latency_hook:
+                now = time.monotonic()
+                self.latency_hook([now - enqueued for enqueued, sample in batch if "id" in sample])
+        if not remaining and self.has_journal():
+            self._replay_journal()
+
+    def _committed(self, samples):
+        if self.log_sink:
+            for sample in samples:
+                self.log_sink.log("/sensor/create", "POST", 200,
+                                  lambda s=sample: f"Data aroma kopi disimpan: {s}", sampled=True)
+        if self.commit_hook:
+            try:
+                self.commit_hook(samples)
+            except Exception as e:
+                logger.error(f"❌ Commit hook gagal: {e}")
+
+    def _spill(self, samples):
+        with self._journal_lock:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(self.journal_path, "a") as f:
+                for sample in samples:
+                    f.write(json.dumps(sample) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.stats["spilled"] += len(samples)
+
+    def _dead_letter(self, sample, error):
+        # Satu baris per sampel yang ditolak, beserta alasannya, untuk diperiksa/diperbaiki manual
+        entry = {"failed_at": datetime.now().isoformat(), "error": str(error).splitlines()[0], "sample": sample}
+        with self._journal_lock:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.stats["dead_lettered"] += 1
+        logger.error(f"❌ Sampel ditolak database, dipindah ke {self.dead_letter_path}: {entry['error']}")
+
+    def _replay_journal(self):
+        replaying_path = self.journal_path + ".replay"
+        with self._journal_lock:
+            # Sisa replay sebelumnya (mis. crash) diproses lebih dulu
+            if not os.path.exists(replaying_path):
+                if not self.journal_size():
+                    return
+                os.replace(self.journal_path, replaying_path)
+        with open(replaying_path) as f:
+            lines = [line for line in f if line.strip()]
+        # Baris yang sudah tersimpan dilewati bila replay terputus di tengah
+        progress_path = replaying_path + ".offset"
+        done = 0
+        if os.path.exists(progress_path):
+            with open(progress_path) as f:
+                done = int(f.read() or 0)
+        for i in range(done, len(lines), self.batch_size):
+            lines_chunk = lines[i:i + self.batch_size]
+            parsed = []  # (nomor baris, sampel)
+            for j, line in enumerate(lines_chunk, start=i):
+                try:
+                    parsed.append((j, json.loads(line)))
+                except ValueError as e:
+                    # Baris jurnal rusak (mis. terpotong saat crash) tidak bisa diputar ulang
+                    self._dead_letter(line.rstrip("\n"), e)
+            committed, remaining, error = self._write([sample for _, sample in parsed])
+            # Offset maju sampai sampel terakhir yang tersimpan atau dipindah ke dead-letter
+            offset = i + len(lines_chunk)
+            if remaining:
+                offset = next(j for j, sample in parsed if sample is remaining[0])
+            with open(progress_path, "w") as f:
+                f.write(str(offset))
+            self.stats["replayed"] += len(committed)
+            if committed:
+                self._committed(committed)
+            if remaining:
+                self.stats["db_errors"] += 1
+                self._db_down_until = time.monotonic() + self.retry_interval
+                logger.error(f"❌ Replay jurnal tertunda, database belum siap: {error}")
+                return
+        os.remove(replaying_path)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        logger.info(f"✅ Jurnal ingest diputar ulang: {len(lines) - done} sampel")
@@ -0,0 +1,150 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import logging
+from sqlalchemy import insert
+from app.config import (
+    API_LOG_BATCH_SIZE, API_LOG_FLUSH_INTERVAL, API_LOG_QUEUE_SIZE, API_LOG_RECENT, API_LOG_SAMPLE_EVERY,
+)
+from app.database import SessionLocal
+from app.models import ApiLogs
+
+logger = logging.getLogger(__name__)
+
+
+class ApiLogSink:
+    """Sink asinkron untuk tabel api_logs.
+
+    log() hanya menambah entri ke deque `recent` (N entri terakhir, dibaca
+    dashboard tanpa query) dan ke antrian terbatas; thread sink menyimpannya
+    dengan satu INSERT multi-baris per `batch_size` entri atau setiap
+    `flush_interval` detik. Event per sampel (sampled=True) hanya dicatat
+    satu dari setiap `sample_every` kejadian (0 = tidak dicatat), dan pesannya
+    baru diformat bila lolos sampling. Bila antrian penuh, entri dibuang dan
+    dihitung, jalur ingest tidak pernah menunggu.
+    """
+
+    def __init__(self, session_factory, batch_size=500, flush_interval=2.0, queue_size=10000,
+                 recent_size=50, sample_every=60):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_every = sample_every
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.recent = deque(maxlen=recent_size)
+        self._sampled = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"logged": 0, "sampled_out": 0, "dropped": 0, "written": 0, "batches": 0, "db_errors": 0}
+
+    # --- sisi pemanggil ---
+
+    def log(self, endpoint: str, method: str, status_code: int, response, sampled: bool = False) -> bool:
+        """Mencatat satu entri. `response` boleh callable agar formatting ditunda sampai lolos sampling."""
+        if sampled:
+            n = next(self._sampled)
+            if not self.sample_every or n % self.sample_every:
+                self.stats["sampled_out"] += 1
+                return False
+        entry = {
+            "endpoint": endpoint,
+            "method": method,
+            "status_code": status_code,
+            "response": response() if callable(response) else response,
+            "timestamp": datetime.now().astimezone(),
+        }
+        self.recent.append(entry)
+        self.stats["logged"] += 1
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def recent_logs(self, limit: int = 10) -> list:
+        # Format sama dengan sensor_service.get_logs_api, terbaru lebih dulu
+        entries = list(self.recent)[-limit:][::-1]
+        return [{"id": None, **e, "timestamp": e["timestamp"].isoformat()} for e in entries]
+
+    # --- siklus hidup ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._preload()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="api-log-sink", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _preload(self):
+        # Sekali saat startup: entri terakhir dari DB agar dashboard tidak kosong setelah restart
+        if self.recent:
+            return
+        db = self.session_factory()
+        try:
+            logs = db.query(ApiLogs).order_by(ApiLogs.timestamp.desc()).limit(self.recent.maxlen).all()
+            for log in reversed(logs):
+                self.recent.append({
+                    "endpoint": log.endpoint,
+                    "method": log.method,
+                    "status_code": log.status_code,
+                    "response": log.response,
+                    "timestamp": log.timestamp,
+                })
+        except Exception as e:
+            logger.warning(f"⚠️ Log API terakhir tidak bisa dimuat: {e}")
+        finally:
+            db.close()
+
+    # --- thread sink ---
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        db = self.session_factory()
+        try:
+            db.execute(insert(ApiLogs).values(batch))
+            db.commit()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            db.rollback()
+            # Log audit tidak di-retry: jangan menahan sink ketika database bermasalah
+            self.stats["db_errors"] += 1
+            logger.error(f"❌ Gagal menyimpan {len(batch)} log API: {e}")
+        finally:
+            db.close()
+
+
+api_log_sink = ApiLogSink(
+    SessionLocal,
+    batch_size=API_LOG_BATCH_SIZE,
+    flush_interval=API_LOG_FLUSH_INTERVAL,
+    queue_size=API_LOG_QUEUE_SIZE,
+    recent_size=API_LOG_RECENT,
+    sample_every=API_LOG_SAMPLE_EVERY,
+)
@@ -0,0 +1,231 @@
+import bisect
+import math
+import threading
+import time
+
+# Bucket latensi (detik): 0.1 ms .. 5 s, cukup untuk I2C (ms) sampai commit DB lambat
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # Metrik tanpa label dipakai langsung (counter.inc(), histogram.observe())
+        return self.labels()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        # Nilai dibaca saat scrape (mis. qsize antrian), tanpa biaya di jalur panas
+        self.fn = fn
+
+    def render(self, name, labelnames, key):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                value = math.nan
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(float(value))}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, fn):
+        self._default().set_function(fn)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = (("le", _format_value(float(bound))),)
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class MetricsRegistry:
+    """Registry metrik dalam proses dengan keluaran format teks Prometheus.
+
+    Jalur panas hanya menambah angka (bisect bucket + increment di bawah lock
+    per seri), tanpa formatting string; teks exposition baru dibangun saat
+    GET /metrics di-scrape. Gauge boleh berupa fungsi yang dievaluasi saat
+    scrape, sehingga kedalaman antrian tidak perlu di-update per sampel.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metrik {metric.name} sudah terdaftar dengan tipe lain")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- metrik jalur panas ---
+
+I2C_READ_SECONDS = registry.histogram(
+    "enose_i2c_read_seconds", "Latensi satu pembacaan channel ADS1115 lewat I2C", ["channel"])
+I2C_READ_FAILURES = registry.counter(
+    "enose_i2c_read_failures_total",
+    "Pembacaan channel yang gagal dan dicoba ulang pada putaran scan berikutnya", ["channel", "reason"])
+ACQ_JITTER_SECONDS = registry.histogram(
+    "enose_acquisition_jitter_seconds", "Keterlambatan tick akuisisi terhadap jadwal monotonic")
+ACQ_TICK_SECONDS = registry.histogram(
+    "enose_acquisition_tick_seconds", "Durasi satu tick akuisisi (baca, fitur, antrian, publish)")
+DB_SECONDS = registry.histogram(
+    "enose_db_seconds", "Latensi operasi database ingest", ["op"])
+QUEUE_DEPTH = registry.gauge(
+    "enose_queue_depth", "Jumlah item yang menunggu di antrian internal", ["queue"])
+WS_FANOUT_SECONDS = registry.histogram(
+    "enose_ws_fanout_seconds", "Waktu membagikan satu frame ke semua subscriber WebSocket")
+WS_SUBSCRIBERS = registry.gauge(
+    "enose_ws_subscribers", "Jumlah klien WebSocket yang terhubung")
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "enose_http_request_seconds", "Latensi request HTTP per route", ["method", "route", "status"])
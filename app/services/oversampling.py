@@ -0,0 +1,81 @@
+import numpy as np
+
+FILTERS = ("median", "mean")
+# Faktor MAD -> simpangan baku untuk derau normal
+MAD_SCALE = 1.4826
+
+
+def _sorted_median(ordered: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Median per kolom dari array yang sudah diurutkan (NaN di akhir) dengan n nilai valid."""
+    lo = np.maximum((n - 1) // 2, 0)
+    hi = n // 2
+    a = np.take_along_axis(ordered, lo[None, :], axis=0)[0]
+    b = np.take_along_axis(ordered, hi[None, :], axis=0)[0]
+    median = (a + b) / 2.0
+    median[n == 0] = np.nan
+    return median
+
+
+def decimate(buffer, method="median", reject=3.5, min_valid=1, floor=1.0):
+    """K x C konversi -> C nilai keluaran, plus jumlah konversi yang dipakai per channel.
+
+    Konversi <= 0 atau NaN dianggap dropout. Bila `reject` > 0, konversi yang
+    menyimpang lebih dari reject x MAD (minimal `floor`, 1 LSB untuk hitungan
+    ADC) dari median dibuang. Sisanya digabung dengan median atau rata-rata
+    (moving average sepanjang K). Channel dengan konversi valid kurang dari
+    `min_valid` menghasilkan NaN. Semua operasi per kolom, tanpa loop Python.
+    """
+    if method not in FILTERS:
+        raise ValueError(f"Filter oversampling tidak valid: {method} (pilihan: {FILTERS})")
+    values = np.where(np.asarray(buffer, dtype=np.float64) > 0, buffer, np.nan)
+    keep = ~np.isnan(values)
+    n = keep.sum(axis=0)
+    median = _sorted_median(np.sort(values, axis=0), n)
+    if reject:
+        deviation = np.abs(values - median)
+        mad = _sorted_median(np.sort(deviation, axis=0), n) * MAD_SCALE
+        # NaN <= x selalu False, jadi dropout ikut tersaring
+        keep = deviation <= reject * np.maximum(mad, floor)
+        values = np.where(keep, values, np.nan)
+        n = keep.sum(axis=0)
+        if method == "median":
+            median = _sorted_median(np.sort(values, axis=0), n)
+    if method == "median":
+        out = median
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = np.where(keep, values, 0.0).sum(axis=0) / n
+    out[n < min_valid] = np.nan
+    return out, n
+
+
+class Decimator:
+    """Tahap oversample-and-decimate untuk scheduler ADS1115.
+
+    Scheduler mengisi `buffer` (K x C, dialokasikan sekali) dengan K konversi
+    per channel dalam satu putaran scan, lalu decimate() mengembalikan satu
+    hitungan terfilter per channel. Keluaran tetap satu frame per scan, jadi
+    volume data ke database tidak bertambah.
+    """
+
+    def __init__(self, k: int, channels: int, method="median", reject=3.5, min_valid=1):
+        if k < 1:
+            raise ValueError("Jumlah konversi oversampling minimal 1")
+        if method not in FILTERS:
+            raise ValueError(f"Filter oversampling tidak valid: {method} (pilihan: {FILTERS})")
+        self.k = k
+        self.method = method
+        self.reject = reject
+        self.min_valid = min(max(1, min_valid), k)
+        self.buffer = np.full((k, channels), np.nan, dtype=np.float64)
+        self.stats = {"outputs": 0, "conversions": 0, "discarded": 0, "empty": 0}
+
+    def decimate(self) -> np.ndarray:
+        out, used = decimate(self.buffer, self.method, self.reject, self.min_valid)
+        channels = self.buffer.shape[1]
+        self.stats["outputs"] += 1
+        self.stats["conversions"] += self.k * channels
+        self.stats["discarded"] += int(self.k * channels - used.sum())
+        self.stats["empty"] += int(np.isnan(out).sum())
+        self.buffer.fill(np.nan)
+        return out
@@ -0,0 +1,338 @@
+import argparse
+import re
+import threading
+from datetime import datetime, date, timedelta, timezone
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.services.adc import CHANNELS, volt_sql
+
+logger = logging.getLogger(__name__)
+
+PARENT = "sensor_data"
+DEFAULT_PARTITION = "sensor_data_default"
+_NAME_RE = re.compile(r"^sensor_data_p(\d{8})$")
+# Penanda partisi yang sudah dipadatkan (disimpan sebagai COMMENT tabel partisi)
+_COMPACTED = "compacted:"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT}_p{day:%Y%m%d}"
+
+
+def _bound(day: date) -> str:
+    # Batas partisi harian selalu tengah malam UTC
+    return f"{day:%Y-%m-%d} 00:00:00+00"
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"
+    ), {"t": PARENT}).scalar()
+
+
+def list_partitions(db: Session) -> list:
+    """Partisi harian sensor_data sebagai list (tanggal, nama, sudah dipadatkan), urut tanggal."""
+    rows = db.execute(text("""
+        SELECT c.relname, obj_description(c.oid, 'pg_class')
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:t)
+    """), {"t": PARENT}).all()
+    result = []
+    for name, comment in rows:
+        m = _NAME_RE.match(name)
+        if m:
+            day = datetime.strptime(m.group(1), "%Y%m%d").date()
+            result.append((day, name, bool(comment and comment.startswith(_COMPACTED))))
+    return sorted(result)
+
+
+def create_partition(db: Session, day: date, commit: bool = True) -> bool:
+    """Membuat partisi harian untuk `day` (UTC); False bila sudah ada.
+
+    Partisi dibuat sebagai tabel biasa, baris hari itu yang terlanjur masuk
+    partisi default dipindahkan, lalu tabel di-ATTACH. Index parent dibuat
+    otomatis oleh PostgreSQL saat ATTACH. commit=False membiarkan transaksi
+    terbuka untuk pemanggil (migrasi).
+    """
+    name = partition_name(day)
+    if db.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar():
+        return False
+    lo, hi = _bound(day), _bound(day + timedelta(days=1))
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :lo AND timestamp < :hi RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"lo": lo, "hi": hi})
+    db.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"))
+    if commit:
+        db.commit()
+    logger.info(f"✅ Partisi {name} dibuat")
+    return True
+
+
+def ensure_partitions(db: Session, ahead_days: int = 7, today: date = None, commit: bool = True) -> list:
+    """Memastikan partisi hari ini sampai `ahead_days` hari ke depan sudah ada."""
+    today = today or datetime.now(timezone.utc).date()
+    return [partition_name(today + timedelta(days=i)) for i in range(ahead_days + 1)
+            if create_partition(db, today + timedelta(days=i), commit=commit)]
+
+
+def drop_partitions_before(db: Session, cutoff: date) -> list:
+    """Retensi: DROP seluruh partisi harian sebelum `cutoff`, tanpa DELETE per baris.
+
+    Rollup tidak ikut dihapus, sehingga riwayat agregat tetap tersedia.
+    """
+    dropped = []
+    for day, name, _ in list_partitions(db):
+        if day < cutoff:
+            db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            dropped.append(name)
+    if dropped:
+        logger.info(f"🗑️ Retensi: {len(dropped)} partisi sebelum {cutoff} dihapus")
+    return dropped
+
+
+def compact_partition(db: Session, day: date, name: str, bucket_seconds: int) -> int:
+    """Mengganti baris mentah satu partisi dengan rata-rata per bucket_seconds per perangkat.
+
+    Tabel pengganti diisi lebih dulu lalu ditukar (DETACH lama, ATTACH baru,
+    DROP lama) dalam satu transaksi. Label dan klasifikasi AI diambil dari
+    sampel terakhir di bucket. Rata-rata disimpan sebagai volt, baik sumbernya
+    kolom volt maupun hitungan ADC mentah. Bucket tidak melintasi batas sesi
+    pengukuran, sehingga session_id tetap berlaku setelah pemadatan.
+
+    Baris padat memakai id terkecil di bucket-nya (bukan nilai sequence baru),
+    jadi konsumen berbasis id (klasifikasi per sample_id) tidak melihatnya
+    sebagai baris baru. Status exported hanya true bila seluruh baris bucket
+    sudah diekspor; bucket yang belum ikut ekspor CSV sebagai rata-rata.
+    """
+    averages = ", ".join(f"AVG({volt_sql(ch)})" for ch in CHANNELS)
+    compacted = f"{name}_c"
+    lo, hi = _bound(day), _bound(day + timedelta(days=1))
+    db.execute(text(f"DROP TABLE IF EXISTS {compacted}"))
+    db.execute(text(f"CREATE TABLE {compacted} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    result = db.execute(text(f"""
+        INSERT INTO {compacted} (id, timestamp, device_id, session_id, mq135, mq2, mq4, mq7, jenis,
+                                 ai_classification, exported)
+        SELECT MIN(id), to_timestamp(floor(extract(epoch FROM timestamp) / :b) * :b) AS bucket, device_id,
+               session_id,
+               {averages},
+               (array_agg(jenis ORDER BY timestamp DESC))[1],
+               (array_agg(ai_classification ORDER BY timestamp DESC)
+                    FILTER (WHERE ai_classification IS NOT NULL))[1],
+               bool_and(exported)
+        FROM {name}
+        GROUP BY bucket, device_id, session_id
+    """), {"b": bucket_seconds})
+    db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.execute(text(f"ALTER TABLE {compacted} RENAME TO {name}"))
+    db.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"))
+    db.execute(text(f"COMMENT ON TABLE {name} IS '{_COMPACTED}{int(bucket_seconds)}'"))
+    db.commit()
+    rows = result.rowcount or 0
+    logger.info(f"✅ Partisi {name} dipadatkan menjadi {rows} baris ({bucket_seconds}s)")
+    return rows
+
+
+def compact_before(db: Session, cutoff: date, bucket_seconds: int = 10) -> list:
+    done = []
+    for day, name, compacted in list_partitions(db):
+        if day < cutoff and not compacted:
+            compact_partition(db, day, name, bucket_seconds)
+            done.append(name)
+    return done
+
+
+def delete_range(db: Session, start: datetime = None, end: datetime = None) -> dict:
+    """Menghapus sensor_data pada [start, end) dengan biaya sebanding jumlah partisi.
+
+    Partisi harian yang tercakup penuh di-TRUNCATE (tanpa dead tuple/bloat);
+    hanya hari di tepi rentang dan partisi default yang memakai DELETE, dan
+    partition pruning membatasinya ke partisi tersebut. Tanpa rentang, seluruh
+    tabel di-TRUNCATE. Pada tabel tanpa partisi hanya DELETE biasa.
+
+    sensor_rollup mengikuti: bucket di rentang (diperlebar ke jam penuh)
+    dihitung ulang dari sisa data, jadi riwayat tidak lagi menampilkan data
+    yang sudah dihapus.
+    """
+    postgres = db.get_bind().dialect.name == "postgresql"
+    if start is None and end is None:
+        if postgres:
+            db.execute(text(f"TRUNCATE {PARENT}, sensor_rollup"))
+            db.commit()
+            return {"truncated_partitions": "all", "deleted_rows": None}
+        deleted = db.execute(text(f"DELETE FROM {PARENT}")).rowcount
+        db.commit()
+        return {"truncated_partitions": [], "deleted_rows": deleted}
+    start = start if start is None or start.tzinfo else start.astimezone()
+    end = end if end is None or end.tzinfo else end.astimezone()
+    full = []
+    for day, name, _ in list_partitions(db) if is_partitioned(db) else []:
+        day_start = datetime.combine(day, datetime.min.time(), timezone.utc)
+        if (start is None or start <= day_start) and (end is None or day_start + timedelta(days=1) <= end):
+            full.append(name)
+    if full:
+        db.execute(text(f"TRUNCATE {', '.join(full)}"))
+    where, params = [], {}
+    if start is not None:
+        where.append("timestamp >= :start")
+        params["start"] = start
+    if end is not None:
+        where.append("timestamp < :end")
+        params["end"] = end
+    deleted = db.execute(text(f"DELETE FROM {PARENT} WHERE {' AND '.join(where)}"), params).rowcount
+    db.commit()
+    if postgres:
+        from app.services.rollup import rebuild_rollups
+
+        # Tanpa batas bawah: sejak epoch; tanpa batas atas: sampai sekarang (+1 jam untuk bucket berjalan)
+        rebuild_rollups(db, start or datetime.fromtimestamp(0, timezone.utc),
+                        end or datetime.now(timezone.utc) + timedelta(hours=1))
+    return {"truncated_partitions": full, "deleted_rows": deleted}
+
+
+def run_maintenance(db: Session, ahead_days: int = 7, retention_days: int = 0,
+                    compact_after_days: int = 0, compact_bucket: int = 10) -> dict:
+    """Satu putaran maintenance: buat partisi ke depan, retensi, lalu pemadatan.
+
+    retention_days / compact_after_days 0 berarti nonaktif.
+    """
+    if not is_partitioned(db):
+        return {"partitioned": False}
+    today = datetime.now(timezone.utc).date()
+    summary = {"partitioned": True, "created": ensure_partitions(db, ahead_days, today)}
+    if retention_days > 0:
+        summary["dropped"] = drop_partitions_before(db, today - timedelta(days=retention_days))
+    if compact_after_days > 0:
+        summary["compacted"] = compact_before(db, today - timedelta(days=compact_after_days), compact_bucket)
+    return summary
+
+
+def migrate_to_partitioned(db: Session, ahead_days: int = 7) -> int:
+    """Memindahkan sensor_data lama (tidak berpartisi) ke tabel berpartisi baru.
+
+    Tabel lama di-rename, tabel baru dibuat dari model, partisi dibuat untuk
+    setiap hari yang ada datanya, lalu baris disalin dengan id yang sama.
+    Semua langkah berjalan dalam satu transaksi (DDL PostgreSQL transaksional):
+    bila ada yang gagal, tabel lama kembali utuh. Migrasi ditolak (ValueError)
+    bila ada baris tanpa timestamp, karena baris itu tidak punya partisi.
+    """
+    if is_partitioned(db):
+        return 0
+    missing = db.execute(text(f"SELECT count(*) FROM {PARENT} WHERE timestamp IS NULL")).scalar()
+    if missing:
+        db.rollback()
+        raise ValueError(f"{missing} baris sensor_data tanpa timestamp; perbaiki atau hapus dulu sebelum migrasi")
+    try:
+        moved, days = _migrate(db, ahead_days)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(f"✅ {moved} baris dipindahkan ke sensor_data berpartisi ({len(days)} partisi harian)")
+    return moved
+
+
+def _migrate(db: Session, ahead_days: int):
+    from app.models import SensorData
+
+    legacy = f"{PARENT}_unpartitioned"
+    db.execute(text(f"ALTER TABLE {PARENT} RENAME TO {legacy}"))
+    # Nama index/primary key lama dibebaskan agar tabel baru bisa membuatnya
+    for index in [f"{PARENT}_pkey"] + [i.name for i in SensorData.__table__.indexes]:
+        db.execute(text(f"ALTER INDEX IF EXISTS {index} RENAME TO {index}_old"))
+    db.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT"))
+    db.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT}_id_seq RENAME TO {legacy}_id_seq"))
+    # Koneksi sesi, bukan engine: CREATE TABLE ikut transaksi migrasi
+    SensorData.__table__.create(bind=db.connection())
+    days = db.execute(text(
+        f"SELECT DISTINCT (timestamp AT TIME ZONE 'UTC')::date FROM {legacy}"
+    )).scalars().all()
+    for day in days:
+        create_partition(db, day, commit=False)
+    ensure_partitions(db, ahead_days, commit=False)
+    # Hanya kolom yang ada di tabel lama; kolom baru memakai default server
+    existing = set(db.execute(text(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = :t"
+    ), {"t": legacy}).scalars())
+    columns = ", ".join(c.name for c in SensorData.__table__.columns if c.name in existing)
+    moved = db.execute(text(f"INSERT INTO {PARENT} ({columns}) SELECT {columns} FROM {legacy}")).rowcount
+    db.execute(text(f"SELECT setval('{PARENT}_id_seq', (SELECT COALESCE(MAX(id), 1) FROM {PARENT}))"))
+    db.execute(text(f"DROP TABLE {legacy}"))
+    return moved, days
+
+
+class PartitionMaintainer:
+    """Thread latar yang menjalankan run_maintenance setiap `interval` detik."""
+
+    def __init__(self, session_factory, interval=3600.0, **options):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.options = options
+        self.last = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="partition-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                self.last = {"at": datetime.now(timezone.utc).isoformat(), **run_maintenance(db, **self.options)}
+            except Exception as e:
+                db.rollback()
+                self.last = {"at": datetime.now(timezone.utc).isoformat(), "error": str(e)}
+                logger.error(f"❌ Maintenance partisi gagal: {e}")
+            finally:
+                db.close()
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    from app.config import (
+        PARTITION_AHEAD_DAYS, RETENTION_DAYS, COMPACT_AFTER_DAYS, COMPACT_BUCKET_SECONDS,
+    )
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Partisi harian sensor_data: maintenance dan migrasi")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("maintain", help="Buat partisi ke depan, terapkan retensi dan pemadatan")
+    sub.add_parser("migrate", help="Ubah sensor_data lama menjadi tabel berpartisi")
+    sub.add_parser("list", help="Tampilkan partisi harian")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.command == "maintain":
+            print(run_maintenance(db, PARTITION_AHEAD_DAYS, RETENTION_DAYS, COMPACT_AFTER_DAYS,
+                                  COMPACT_BUCKET_SECONDS))
+        elif args.command == "migrate":
+            try:
+                print(f"{migrate_to_partitioned(db, PARTITION_AHEAD_DAYS)} baris dipindahkan")
+            except ValueError as e:
+                logger.error(f"❌ Migrasi dibatalkan: {e}")
+        else:
+            for day, name, compacted in list_partitions(db):
+                print(f"{day}  {name}{'  (dipadatkan)' if compacted else ''}")
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+import bisect
+import csv
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+import logging
+import numpy as np
+from app.services.adc import CHANNELS, PGA_RANGE_MV, volts_to_counts
+
+logger = logging.getLogger(__name__)
+
+
+# Kolom label di CSV lama ("kualitas") dan baru ("jenis")
+LABEL_COLUMNS = ("jenis", "kualitas")
+
+
+def label_column(columns):
+    """Nama kolom label yang dipakai file rekaman, atau None bila tidak ada."""
+    return next((c for c in LABEL_COLUMNS if c in (columns or ())), None)
+
+
+def _parse_float(value) -> float:
+    try:
+        return float(value) if value not in (None, "") else np.nan
+    except ValueError:
+        return np.nan
+
+
+def parse_recording(path: str):
+    """Membaca satu CSV rekaman menjadi (timestamp epoch, matriks N x 4, tag label kolom).
+
+    Skema jenis/kualitas dinormalisasi menjadi satu kolom tag; nilai kosong
+    atau rusak menjadi NaN dan baris tanpa timestamp valid dilewati.
+    """
+    ts, values, tags = [], [], []
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        label_col = label_column(reader.fieldnames)
+        for row in reader:
+            try:
+                t = datetime.fromisoformat(row["timestamp"]).timestamp()
+            except (KeyError, ValueError, TypeError):
+                # Baris rusak/terpotong dilewati
+                continue
+            ts.append(t)
+            values.append([_parse_float(row.get(ch)) for ch in CHANNELS])
+            tags.append((row.get(label_col) or "").strip() if label_col else "")
+    return (np.array(ts, dtype=np.float64),
+            np.array(values, dtype=np.float64).reshape(-1, len(CHANNELS)),
+            tags)
+
+
+def load_recording(path):
+    """Membaca satu file rekaman data/*.csv menjadi list (detik_relatif, {channel: volt}).
+
+    Nilai kosong/rusak diputar sebagai 0 V, sama seperti pembacaan sensor yang gagal.
+    """
+    ts, values, _ = parse_recording(path)
+    if not len(ts):
+        return []
+    offsets = (ts - ts[0]).tolist()
+    return [(t, dict(zip(CHANNELS, v))) for t, v in zip(offsets, np.nan_to_num(values, nan=0.0).tolist())]
+
+
+def resolve_files(patterns):
+    """Mengubah daftar pola (dipisah koma, boleh glob) menjadi daftar file yang ada."""
+    if isinstance(patterns, str):
+        patterns = [p.strip() for p in patterns.split(",") if p.strip()]
+    files = []
+    for pattern in patterns:
+        # glob.escape dipakai agar nama seperti "10%arabika+90%robusta.csv" tetap cocok
+        matches = sorted(glob.glob(pattern)) or sorted(glob.glob(glob.escape(pattern)))
+        files.extend(m for m in matches if os.path.isfile(m))
+    return files
+
+
+class ReplaySource:
+    """Sumber data rekaman yang menggantikan ADS1115.
+
+    speed > 0  : diputar mengikuti timestamp rekaman, dipercepat `speed` kali.
+    speed == 0 : mode langkah, satu baris per frame (setiap kali channel yang
+                 sama dibaca lagi, kursor maju satu baris). Dipakai benchmark.
+    fsr_mv     : rentang skala penuh PGA (mV) untuk meniru AnalogIn.value,
+                 harus sama dengan scheduler.fsr_mv (dari ADS_GAIN).
+    """
+
+    def __init__(self, rows, speed=1.0, loop=True, fsr_mv=PGA_RANGE_MV[1]):
+        if not rows:
+            raise ValueError("Rekaman replay kosong")
+        self.rows = rows
+        self.offsets = [r[0] for r in rows]
+        self.duration = self.offsets[-1] + 1.0
+        self.speed = speed
+        self.loop = loop
+        self.fsr_mv = fsr_mv
+        self._lock = threading.Lock()
+        self._start = None
+        self._cursor = 0
+        self._read_in_frame = set()
+
+    @classmethod
+    def from_files(cls, patterns, speed=1.0, loop=True, fsr_mv=PGA_RANGE_MV[1]):
+        files = resolve_files(patterns)
+        if not files:
+            raise FileNotFoundError(f"Tidak ada file replay yang cocok: {patterns}")
+        rows = []
+        offset = 0.0
+        for path in files:
+            recording = load_recording(path)
+            # File berikutnya disambung 1 detik setelah file sebelumnya selesai
+            rows.extend((t + offset, values) for t, values in recording)
+            if recording:
+                offset += recording[-1][0] + 1.0
+        logger.info(f"📼 Replay {len(rows)} baris dari {len(files)} file (speed={speed})")
+        return cls(rows, speed=speed, loop=loop, fsr_mv=fsr_mv)
+
+    def _index_realtime(self):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        position = (now - self._start) * self.speed
+        if self.loop:
+            position %= self.duration
+        return max(0, min(bisect.bisect_right(self.offsets, position) - 1, len(self.rows) - 1))
+
+    def _index_step(self, channel):
+        if channel in self._read_in_frame:
+            self._read_in_frame.clear()
+            self._cursor += 1
+            if self._cursor >= len(self.rows):
+                self._cursor = 0 if self.loop else len(self.rows) - 1
+        self._read_in_frame.add(channel)
+        return self._cursor
+
+    def read(self, channel):
+        with self._lock:
+            index = self._index_step(channel) if self.speed <= 0 else self._index_realtime()
+            return self.rows[index][1][channel]
+
+    def channel(self, name):
+        return ReplayChannel(self, name)
+
+
+class ReplayChannel:
+    """Pengganti AnalogIn: atribut `voltage` dan `value` dibaca dari rekaman."""
+
+    def __init__(self, source, name):
+        self.source = source
+        self.name = name
+
+    @property
+    def voltage(self):
+        return self.source.read(self.name)
+
+    @property
+    def value(self):
+        # Hitungan int16 pada rentang PGA sumber, dijepit seperti ADC yang jenuh
+        return int(volts_to_counts(self.voltage, self.source.fsr_mv))
@@ -0,0 +1,201 @@
+import math
+import threading
+from datetime import datetime
+import numpy as np
+from app.config import RING_BUFFER_SECONDS, ACQ_PERIOD
+from app.services.downsample import downsample_indices
+from app.services.adc import CHANNELS
+
+
+class SampleRingBuffer:
+    """Ring buffer berbasis array NumPy untuk sampel 4-channel terbaru.
+
+    Kapasitas tetap (dialokasikan sekali), sehingga memori terbatas:
+    kira-kira 48 byte per sampel + referensi label. Timestamp disimpan
+    sebagai detik epoch dan selalu naik, jadi pencarian jendela waktu cukup
+    searchsorted pada dua segmen ring. Nilai None disimpan sebagai NaN.
+
+    append() mengembalikan nomor urut sampel (slot = seq % kapasitas); id
+    database ditempelkan lewat attach_ids() setelah writer meng-commit batch.
+
+    Buffer hanya cermin sampel lokal yang lewat ingest_sample. Sampel yang
+    dihapus dari database dibuang lewat clear(); baris yang masuk ke database
+    tanpa lewat buffer (replay jurnal proses lama, ingest perangkat dengan
+    DEVICE_ID lokal) dicatat lewat note_external() sehingga covers() menolak
+    jendela yang memuatnya dan pembaca kembali ke database.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, len(CHANNELS)), np.nan, dtype=np.float64)
+        self.jenis = np.empty(capacity, dtype=object)
+        self.classification = np.empty(capacity, dtype=object)
+        self.seq = np.full(capacity, -1, dtype=np.int64)
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self._external_latest = -math.inf
+        self._next_seq = 0
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, sample: dict) -> int:
+        ts = sample["timestamp"]
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        with self._lock:
+            i = self._head
+            seq = self._next_seq
+            self.ts[i] = ts.timestamp()
+            self.values[i] = [np.nan if sample.get(ch) is None else sample[ch] for ch in CHANNELS]
+            self.jenis[i] = sample.get("jenis")
+            self.classification[i] = None
+            self.seq[i] = seq
+            self.ids[i] = -1
+            self.valid[i] = True
+            self._next_seq += 1
+            self._head = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            return seq
+
+    def attach_ids(self, samples) -> int:
+        """Id hasil commit writer ditempelkan ke slot sampelnya.
+
+        Sampel yang tidak ada di buffer (jurnal dari proses lama: seq/timestamp
+        tidak cocok) dicatat sebagai baris eksternal.
+        """
+        attached = 0
+        external = []
+        with self._lock:
+            for sample in samples:
+                seq, sample_id = sample.get("buffer_seq"), sample.get("id")
+                ts = sample["timestamp"]
+                if isinstance(ts, str):
+                    ts = datetime.fromisoformat(ts)
+                i = None if seq is None else seq % self.capacity
+                if i is not None and self.seq[i] == seq and self.ts[i] == ts.timestamp():
+                    if sample_id is not None:
+                        self.ids[i] = sample_id
+                    attached += 1
+                else:
+                    external.append(ts.timestamp())
+        self.note_external(external)
+        return attached
+
+    def note_external(self, ts_epochs):
+        # Baris lokal di database yang tidak ada di buffer: jendela yang memuatnya dibaca dari DB
+        if len(ts_epochs):
+            with self._lock:
+                self._external_latest = max(self._external_latest, float(np.max(ts_epochs)))
+
+    def clear(self, start_epoch: float = None, end_epoch: float = None) -> int:
+        """Membuang sampel pada [start, end) (tanpa batas = semua), mengikuti DELETE di database."""
+        with self._lock:
+            hit = self.valid.copy()
+            if start_epoch is not None:
+                hit &= self.ts >= start_epoch
+            if end_epoch is not None:
+                hit &= self.ts < end_epoch
+            self.valid[hit] = False
+            self.classification[hit] = None
+            return int(hit.sum())
+
+    def attach_classification(self, classification: dict, ts_epoch: float = None, sample_id: int = None) -> bool:
+        # Hasil AI ditempelkan ke sampel dengan id sample_id, timestamp ts_epoch, atau ke sampel terbaru
+        with self._lock:
+            if not self._count:
+                return False
+            if sample_id is not None:
+                hits = np.flatnonzero((self.ids == sample_id) & self.valid)
+                if not len(hits):
+                    return False
+                self.classification[hits[0]] = classification
+                return True
+            if ts_epoch is None:
+                i = self._latest_index()
+                if i is None:
+                    return False
+                self.classification[i] = classification
+                return True
+            for start, end in self._segments():
+                i = start + int(np.searchsorted(self.ts[start:end], ts_epoch, side="left"))
+                if i < end and self.ts[i] == ts_epoch and self.valid[i]:
+                    self.classification[i] = classification
+                    return True
+            return False
+
+    def oldest_ts(self):
+        with self._lock:
+            if not self._count:
+                return None
+            return float(self.ts[self._head if self._count == self.capacity else 0])
+
+    def covers(self, since_epoch: float) -> bool:
+        # True bila seluruh jendela [since, sekarang] ada di buffer dan tidak ada baris lokal
+        # yang ditulis ke database di luar buffer sejak since
+        oldest = self.oldest_ts()
+        return oldest is not None and oldest <= since_epoch and self._external_latest < since_epoch
+
+    def _segments(self):
+        if self._count < self.capacity:
+            return [(0, self._count)]
+        return [(self._head, self.capacity), (0, self._head)]
+
+    def window(self, since_epoch: float):
+        """Mengembalikan (ts, values, jenis, classification) kronologis sejak since_epoch."""
+        with self._lock:
+            parts = []
+            for start, end in self._segments():
+                i = start + int(np.searchsorted(self.ts[start:end], since_epoch, side="left"))
+                if i < end:
+                    parts.append(slice(i, end))
+            if not parts:
+                empty = np.empty(0, dtype=object)
+                return np.empty(0), np.empty((0, len(CHANNELS))), empty, empty
+            keep = np.concatenate([self.valid[p] for p in parts])
+            return (
+                np.concatenate([self.ts[p] for p in parts])[keep],
+                np.concatenate([self.values[p] for p in parts])[keep],
+                np.concatenate([self.jenis[p] for p in parts])[keep],
+                np.concatenate([self.classification[p] for p in parts])[keep],
+            )
+
+    def _latest_index(self):
+        # Slot sampel valid terbaru (dipanggil dengan lock), None bila semuanya sudah dibuang
+        for start, end in reversed(self._segments()):
+            hits = np.flatnonzero(self.valid[start:end])
+            if len(hits):
+                return start + int(hits[-1])
+        return None
+
+    def latest(self):
+        """Sampel terbaru; "id" berisi id database setelah writer meng-commit-nya, sebelumnya None."""
+        with self._lock:
+            if not self._count:
+                return None
+            i = self._latest_index()
+            if i is None:
+                return None
+            sample_id = int(self.ids[i]) if self.ids[i] >= 0 else None
+            return {"id": sample_id, **self._row(self.ts[i], self.values[i], self.jenis[i], self.classification[i])}
+
+    def rows(self, since_epoch: float, max_points: int = None, method: str = "lttb"):
+        ts, values, jenis, classification = self.window(since_epoch)
+        idx = downsample_indices(ts, values, max_points, method)
+        return [self._row(ts[i], values[i], jenis[i], classification[i]) for i in idx]
+
+    @staticmethod
+    def _row(ts, values, jenis, classification):
+        row = {"timestamp": datetime.fromtimestamp(ts).astimezone().isoformat()}
+        for ch, v in zip(CHANNELS, values.tolist()):
+            row[ch] = None if math.isnan(v) else v
+        row["jenis"] = jenis
+        row["ai_classification"] = classification or {}
+        return row
+
+
+ring_buffer = SampleRingBuffer(capacity=int(math.ceil(RING_BUFFER_SECONDS / ACQ_PERIOD)) + 1)
@@ -0,0 +1,203 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+import logging
+import numpy as np
+from sqlalchemy import ARRAY, String, func, text, type_coerce
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models import SensorRollup
+from app.services.adc import CHANNELS, volt_sql
+
+logger = logging.getLogger(__name__)
+
+# Resolusi tabel rollup (detik)
+RESOLUTIONS = (10, 60, 300, 3600)
+
+
+def _epoch(ts) -> float:
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return ts.timestamp()
+
+
+def aggregate_rows(rows) -> list:
+    """Menghitung agregat parsial per (resolusi, bucket) dari satu batch sampel.
+
+    Tegangan <= 0 (pembacaan gagal disimpan sebagai 0 V) dihitung kosong seperti NaN.
+    """
+    if not rows:
+        return []
+    ts = np.array([_epoch(r["timestamp"]) for r in rows], dtype=np.float64)
+    values = np.array([[np.nan if r.get(ch) is None else r[ch] for ch in CHANNELS] for r in rows],
+                      dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        valid = values > 0
+    filled = np.where(valid, values, 0.0)
+    jenis = [r.get("jenis") for r in rows]
+    order = np.arange(len(rows))
+
+    partials = []
+    for resolution in RESOLUTIONS:
+        buckets, inverse = np.unique(np.floor(ts / resolution) * resolution, return_inverse=True)
+        n = len(buckets)
+        samples = np.bincount(inverse, minlength=n)
+        last = np.zeros(n, dtype=np.int64)
+        np.maximum.at(last, inverse, order)
+        per_channel = {}
+        for c, ch in enumerate(CHANNELS):
+            count = np.bincount(inverse, weights=valid[:, c], minlength=n).astype(np.int64)
+            total = np.bincount(inverse, weights=filled[:, c], minlength=n)
+            lo = np.full(n, np.inf)
+            hi = np.full(n, -np.inf)
+            np.minimum.at(lo, inverse[valid[:, c]], values[valid[:, c], c])
+            np.maximum.at(hi, inverse[valid[:, c]], values[valid[:, c], c])
+            per_channel[ch] = (count, total, lo, hi)
+        for b in range(n):
+            row = {
+                "resolution": resolution,
+                "bucket": datetime.fromtimestamp(buckets[b], tz=timezone.utc),
+                "samples": int(samples[b]),
+                "jenis": jenis[last[b]],
+            }
+            for ch, (count, total, lo, hi) in per_channel.items():
+                has = count[b] > 0
+                row[f"{ch}_count"] = int(count[b])
+                row[f"{ch}_sum"] = float(total[b]) if has else None
+                row[f"{ch}_min"] = float(lo[b]) if has else None
+                row[f"{ch}_max"] = float(hi[b]) if has else None
+            partials.append(row)
+    return partials
+
+
+def apply_rollups(db: Session, rows):
+    """Menggabungkan batch sampel ke tabel rollup (upsert inkremental, tanpa commit).
+
+    Dipanggil di transaksi yang sama dengan INSERT sensor_data sehingga data
+    mentah dan rollup selalu konsisten.
+    """
+    partials = aggregate_rows(rows)
+    if not partials:
+        return
+    stmt = pg_insert(SensorRollup)
+    table = SensorRollup.__table__.c
+    excluded = stmt.excluded
+    update = {"samples": table.samples + excluded.samples, "jenis": excluded.jenis}
+    for ch in CHANNELS:
+        update[f"{ch}_count"] = table[f"{ch}_count"] + excluded[f"{ch}_count"]
+        update[f"{ch}_sum"] = func.coalesce(table[f"{ch}_sum"], 0) + func.coalesce(excluded[f"{ch}_sum"], 0)
+        # LEAST/GREATEST di PostgreSQL mengabaikan NULL
+        update[f"{ch}_min"] = func.least(table[f"{ch}_min"], excluded[f"{ch}_min"])
+        update[f"{ch}_max"] = func.greatest(table[f"{ch}_max"], excluded[f"{ch}_max"])
+    stmt = stmt.on_conflict_do_update(index_elements=["resolution", "bucket"], set_=update)
+    db.execute(stmt, partials)
+
+
+def rebuild_rollups(db: Session, since: datetime, until: datetime = None) -> int:
+    """Job catch-up: menghitung ulang rollup dari sensor_data untuk rentang waktu.
+
+    Rentang diperlebar ke batas jam penuh agar bucket 1 jam tidak terpotong.
+    Hanya sampel perangkat lokal (DEVICE_ID) yang masuk rollup dashboard.
+
+    sensor_rollup dikunci (SHARE ROW EXCLUSIVE) selama transaksi: upsert
+    writer menunggu sampai rebuild selesai dan batch yang sudah berjalan
+    di-commit lebih dulu, sehingga hasil SELECT tidak terlewat atau terhitung
+    dua kali. ON CONFLICT menimpa bucket dengan hasil hitung ulang.
+    """
+    from app.config import DEVICE_ID
+
+    until = until or datetime.now(timezone.utc)
+    start = datetime.fromtimestamp(int(since.timestamp()) // 3600 * 3600, tz=timezone.utc)
+    end = datetime.fromtimestamp(-(-int(until.timestamp()) // 3600) * 3600, tz=timezone.utc)
+    db.execute(text("LOCK TABLE sensor_rollup IN SHARE ROW EXCLUSIVE MODE"))
+    db.query(SensorRollup).filter(SensorRollup.bucket >= start, SensorRollup.bucket < end)\
+        .delete(synchronize_session=False)
+    # Sama dengan aggregate_rows: tegangan <= 0 (pembacaan gagal) tidak dihitung
+    select_channels = ",\n".join(
+        f"SUM({v}) AS {ch}_sum, COUNT({v}) AS {ch}_count, MIN({v}) AS {ch}_min, MAX({v}) AS {ch}_max"
+        for ch, v in ((ch, f"(CASE WHEN {volt_sql(ch)} > 0 THEN {volt_sql(ch)} END)") for ch in CHANNELS)
+    )
+    columns = ", ".join(f"{ch}_sum, {ch}_count, {ch}_min, {ch}_max" for ch in CHANNELS)
+    overwrite = ", ".join(f"{c} = EXCLUDED.{c}" for c in ["samples", *columns.split(", "), "jenis"])
+    inserted = 0
+    for resolution in RESOLUTIONS:
+        result = db.execute(text(f"""
+            INSERT INTO sensor_rollup (resolution, bucket, samples, {columns}, jenis)
+            SELECT :resolution,
+                   to_timestamp(floor(extract(epoch FROM timestamp) / :resolution) * :resolution) AS b,
+                   COUNT(*),
+                   {select_channels},
+                   (array_agg(jenis ORDER BY timestamp DESC))[1]
+            FROM sensor_data
+            WHERE timestamp >= :start AND timestamp < :end AND device_id = :device_id
+            GROUP BY b
+            ON CONFLICT (resolution, bucket) DO UPDATE SET {overwrite}
+        """), {"resolution": resolution, "start": start, "end": end, "device_id": DEVICE_ID})
+        inserted += result.rowcount or 0
+    db.commit()
+    logger.info(f"✅ Rollup dibangun ulang {start.isoformat()} - {end.isoformat()}: {inserted} bucket")
+    return inserted
+
+
+def pick_bucket(range_seconds: float, max_points: int = 1500) -> int:
+    """Resolusi rollup terkecil yang menghasilkan paling banyak max_points titik."""
+    for resolution in RESOLUTIONS:
+        if range_seconds / resolution <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def query_rollups(db: Session, start: datetime, end: datetime, bucket_seconds: int) -> list:
+    """Membaca agregat per bucket_seconds dari rollup (index range scan pada PK).
+
+    Bila bucket_seconds bukan salah satu RESOLUTIONS (mis. 30 detik), rollup
+    resolusi terbesar yang habis membaginya digabung ulang di SQL.
+    """
+    resolution = max((r for r in RESOLUTIONS if bucket_seconds % r == 0), default=None)
+    if resolution is None:
+        raise ValueError(f"Bucket {bucket_seconds}s tidak bisa disusun dari rollup {RESOLUTIONS}")
+    bucket = func.to_timestamp(
+        func.floor(func.extract("epoch", SensorRollup.bucket) / bucket_seconds) * bucket_seconds
+    ).label("bucket")
+    # Label bucket gabungan = label bucket rollup terakhir yang punya label
+    jenis = func.array_agg(aggregate_order_by(SensorRollup.jenis, SensorRollup.bucket.desc()))\
+        .filter(SensorRollup.jenis.isnot(None))
+    columns = [bucket, func.sum(SensorRollup.samples).label("samples"),
+               type_coerce(jenis, ARRAY(String))[1].label("jenis")]
+    for ch in CHANNELS:
+        columns += [
+            func.sum(getattr(SensorRollup, f"{ch}_sum")).label(f"{ch}_sum"),
+            func.sum(getattr(SensorRollup, f"{ch}_count")).label(f"{ch}_count"),
+            func.min(getattr(SensorRollup, f"{ch}_min")).label(f"{ch}_min"),
+            func.max(getattr(SensorRollup, f"{ch}_max")).label(f"{ch}_max"),
+        ]
+    data = db.query(*columns).filter(
+        SensorRollup.resolution == resolution,
+        SensorRollup.bucket >= start,
+        SensorRollup.bucket < end,
+    ).group_by(bucket).order_by(bucket).all()
+
+    result = []
+    for d in data:
+        row = {"timestamp": d.bucket.isoformat(), "samples": int(d.samples)}
+        for ch in CHANNELS:
+            count = getattr(d, f"{ch}_count") or 0
+            row[ch] = float(getattr(d, f"{ch}_sum")) / count if count else None
+            row[f"{ch}_min"] = getattr(d, f"{ch}_min")
+            row[f"{ch}_max"] = getattr(d, f"{ch}_max")
+        row["jenis"] = d.jenis
+        row["ai_classification"] = {}
+        result.append(row)
+    return result
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bangun ulang tabel rollup dari sensor_data")
+    parser.add_argument("--hours", type=float, default=24, help="Rentang ke belakang (jam)")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db, datetime.now(timezone.utc) - timedelta(hours=args.hours))
+    finally:
+        db.close()
@@ -1,10 +1,14 @@
 import time
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
 from datetime import datetime
 import logging
+from app.config import (
+    SENSOR_BACKEND, REPLAY_FILES, REPLAY_SPEED,
+    ADS_DATA_RATE, ADS_CONTINUOUS, ADS_SCAN_INTERVAL, ADS_MAX_AGE, ADS_GAIN, SENSOR_STORAGE,
+    OVERSAMPLE_K, OVERSAMPLE_FILTER, OVERSAMPLE_REJECT, OVERSAMPLE_MIN_VALID,
+)
+from app.services.ads_scheduler import AdsScanScheduler
+from app.services.adc import counts_to_volts, gain_range_mv, parse_gain
+from app.services.oversampling import Decimator
 
 # Setup logging dengan format yang lebih jelas
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,19 +17,37 @@ logger = logging.getLogger(__name__)
 # Inisialisasi I2C dan ADS1115
 i2c = None
 ads = None
-try:
-    i2c = busio.I2C(board.SCL, board.SDA)
-    ads = ADS.ADS1115(i2c, address=0x48)
-    logger.info("✅ I2C dan ADS1115 berhasil diinisialisasi")
-except Exception as e:
-    logger.error(f"❌ Gagal menghubungkan ke I2C: {e}")
-    raise
+replay_source = None
 
-# Sensor Channels
-channel_mq135 = AnalogIn(ads, ADS.P0)
-channel_mq2 = AnalogIn(ads, ADS.P1)
-channel_mq4 = AnalogIn(ads, ADS.P2)
-channel_mq7 = AnalogIn(ads, ADS.P3)
+if SENSOR_BACKEND == "replay":
+    # Tanpa hardware: tegangan diambil dari rekaman data/*.csv
+    from app.services.replay_reader import ReplaySource
+    # Hitungan replay memakai rentang PGA yang sama dengan scheduler agar volt kembali utuh
+    replay_source = ReplaySource.from_files(REPLAY_FILES, speed=REPLAY_SPEED,
+                                            fsr_mv=gain_range_mv(parse_gain(ADS_GAIN)))
+    channel_mq135 = replay_source.channel("mq135")
+    channel_mq2 = replay_source.channel("mq2")
+    channel_mq4 = replay_source.channel("mq4")
+    channel_mq7 = replay_source.channel("mq7")
+else:
+    import board
+    import busio
+    import adafruit_ads1x15.ads1115 as ADS
+    from adafruit_ads1x15.analog_in import AnalogIn
+
+    try:
+        i2c = busio.I2C(board.SCL, board.SDA)
+        ads = ADS.ADS1115(i2c, address=0x48)
+        logger.info("✅ I2C dan ADS1115 berhasil diinisialisasi")
+    except Exception as e:
+        logger.error(f"❌ Gagal menghubungkan ke I2C: {e}")
+        raise
+
+    # Sensor Channels
+    channel_mq135 = AnalogIn(ads, ADS.P0)
+    channel_mq2 = AnalogIn(ads, ADS.P1)
+    channel_mq4 = AnalogIn(ads, ADS.P2)
+    channel_mq7 = AnalogIn(ads, ADS.P3)
 
 # Definisi sensor dengan channel
 SENSORS = {
@@ -35,27 +57,22 @@ SENSORS = {
     "mq7": {"channel": channel_mq7}
 }
 
-# Sensor aktif
-active_sensors = set()
+# Scheduler pemilik bus ADS1115: satu-satunya yang membaca channel
+scheduler = AdsScanScheduler(
+    {name: sensor["channel"] for name, sensor in SENSORS.items()},
+    ads=ads,
+    data_rate=ADS_DATA_RATE,
+    continuous=ADS_CONTINUOUS,
+    scan_interval=ADS_SCAN_INTERVAL,
+    gain=parse_gain(ADS_GAIN),
+    decimator=Decimator(OVERSAMPLE_K, len(SENSORS), OVERSAMPLE_FILTER, OVERSAMPLE_REJECT, OVERSAMPLE_MIN_VALID),
+)
 
-# Fungsi untuk membaca voltage dengan retry
-def read_voltage_with_retry(channel, retries=5, delay=0.5):
-    for attempt in range(retries):
-        try:
-            voltage = channel.voltage
-            logger.info(f"📏 Percobaan {attempt+1}/{retries}: Voltage = {voltage:.3f}V")
-            if voltage <= 0:
-                logger.warning(f"⚠️ Voltage <= 0 ({voltage:.3f}V), mencoba lagi")
-                continue
-            return voltage
-        except (OSError, ValueError) as e:
-            logger.error(f"❌ Gagal membaca voltage (percobaan {attempt+1}/{retries}): {e}")
-            time.sleep(delay)
-    logger.error(f"❌ Gagal membaca voltage setelah {retries} percobaan")
-    return None
+# Jumlah pembacaan gagal berturut-turut per channel (untuk membatasi log)
+_dead_reads = {name: 0 for name in SENSORS}
 
-# Fungsi membaca sensor dengan nilai tegangan langsung
-def baca_sensor(sensor_name=None):
+# Fungsi membaca sekumpulan channel sekaligus dari frame scheduler terbaru
+def baca_channels(names):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     sensor_data = {
         "timestamp": timestamp,
@@ -64,71 +81,44 @@ def baca_sensor(sensor_name=None):
         "mq4": None,
         "mq7": None
     }
-    try:
-        if not active_sensors:
-            logger.warning("⚠️ Tidak ada sensor aktif!")
-        if sensor_name is None:
-            for s_name in active_sensors:
-                voltage = read_voltage_with_retry(SENSORS[s_name]["channel"])
-                if voltage is not None:
-                    sensor_data[s_name] = format(voltage, ".3f")
-                    logger.info(f"Sensor {s_name}: Tegangan disimpan = {sensor_data[s_name]}V")
-                else:
-                    sensor_data[s_name] = "0.000"
-                    logger.warning(f"Sensor {s_name}: Gagal membaca tegangan, diset ke 0.000V")
-        elif sensor_name in SENSORS:
-            if sensor_name in active_sensors:
-                voltage = read_voltage_with_retry(SENSORS[sensor_name]["channel"])
-                if voltage is not None:
-                    sensor_data[sensor_name] = format(voltage, ".3f")
-                    logger.info(f"Sensor {sensor_name}: Tegangan disimpan = {sensor_data[sensor_name]}V")
-                else:
-                    sensor_data[sensor_name] = "0.000"
-                    logger.warning(f"Sensor {sensor_name}: Gagal membaca tegangan, diset ke 0.000V")
-            else:
-                logger.warning(f"Sensor {sensor_name} tidak aktif")
-        else:
-            logger.error(f"Sensor {sensor_name} tidak valid")
-        return sensor_data
-    except Exception as e:
-        logger.error(f"Gagal membaca sensor {sensor_name}: {e}")
+    if not names:
         return sensor_data
-
-# Fungsi mengaktifkan sensor
-def start_sensor(sensor_name: str):
-    try:
-        if sensor_name in SENSORS or sensor_name == "all":
-            if sensor_name == "all":
-                active_sensors.update(SENSORS.keys())
-            else:
-                active_sensors.add(sensor_name)
-            logger.info(f"Sensor {sensor_name} diaktifkan. Active sensors: {active_sensors}")
-    except Exception as e:
-        logger.error(f"Error starting sensor {sensor_name}: {str(e)}")
-
-# Fungsi menghentikan sensor
-def stop_sensor(sensor_name: str):
-    try:
-        if sensor_name in active_sensors:
-            active_sensors.remove(sensor_name)
-            logger.info(f"Sensor {sensor_name} dihentikan. Active sensors: {active_sensors}")
-    except Exception as e:
-        logger.error(f"Error stopping sensor {sensor_name}: {str(e)}")
-
-def stop_all_sensors():
-    try:
-        active_sensors.clear()
-        logger.info("Semua sensor dihentikan. Active sensors: {active_sensors}")
-    except Exception as e:
-        logger.error(f"Error stopping all sensors: {str(e)}")
+    if scheduler.latest_frame() is None:
+        # Scheduler baru dimulai: tunggu frame pertama
+        scheduler.wait_frame(0, timeout=1.0)
+    if SENSOR_STORAGE == "raw":
+        # Satu snapshot hitungan mentah; volt dihitung sekaligus dari snapshot yang sama
+        counts = scheduler.latest_counts(max_age=ADS_MAX_AGE)
+        volts = counts_to_volts([counts[s] for s in SENSORS], scheduler.fsr_mv)
+        voltages = {s: None if counts[s] is None else float(v) for s, v in zip(SENSORS, volts)}
+        sensor_data["raw"] = [(counts[s] or 0) if s in names else None for s in SENSORS]
+        sensor_data["adc_fsr_mv"] = scheduler.fsr_mv
+    else:
+        voltages = scheduler.latest_values(max_age=ADS_MAX_AGE)
+    for s_name in names:
+        voltage = voltages[s_name]
+        if voltage is not None:
+            sensor_data[s_name] = voltage
+            _dead_reads[s_name] = 0
+            logger.debug("Sensor %s: Tegangan disimpan = %.3fV", s_name, voltage)
+        else:
+            sensor_data[s_name] = 0.0
+            _dead_reads[s_name] += 1
+            # Channel mati tidak membanjiri log setiap tick: hanya pada kegagalan ke-1, 10 dan 100
+            if _dead_reads[s_name] in (1, 10, 100):
+                logger.warning("Sensor %s: Gagal membaca tegangan (%dx berturut-turut), diset ke 0.000V",
+                               s_name, _dead_reads[s_name])
+    return sensor_data
 
 # Jalankan jika file ini dieksekusi langsung
 if __name__ == "__main__":
     try:
-        start_sensor("all")  # Aktifkan semua sensor tanpa kalibrasi
+        scheduler.start()  # Baca semua sensor tanpa kalibrasi
         while True:
-            data = baca_sensor()
+            data = baca_channels(list(SENSORS))
             print(f"[{data['timestamp']}] MQ135: {data['mq135']}V | MQ2: {data['mq2']}V | MQ4: {data['mq4']}V | MQ7: {data['mq7']}V")
             time.sleep(3)
     except KeyboardInterrupt:
-        print("\n⏹️ Pembacaan dihentikan oleh pengguna.")
\ No newline at end of file
+        print("\n⏹️ Pembacaan dihentikan oleh pengguna.")
+    finally:
+        scheduler.stop()
@@ -2,10 +2,18 @@ from sqlalchemy.orm import Session
 from app.schemas.sensor import SensorCreate
 from app.models import SensorData, ApiLogs
 from fastapi import HTTPException
-from datetime import datetime, timedelta
-from sqlalchemy.sql import func
+from datetime import datetime, timedelta, timezone
+from app.services.rollup import query_rollups
+from app.services.classifier import classify_batch
+from app.services.log_sink import api_log_sink
+from app.services.adc import CHANNELS, volt_columns
+from app.config import DEVICE_ID
+from sqlalchemy import select, update, values, column, Integer, DateTime, Text, String
 import csv
+import io
+import json
 import os
+import zlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,17 +37,10 @@ def create_sensor_data(db: Session, sensor_data: SensorCreate):
         db.commit()
         db.refresh(db_sensor)
 
-        log_message = f"Data aroma kopi disimpan: {sensor_data.dict()}"
-        db_log = ApiLogs(
-            endpoint="/sensor/create",
-            method="POST",
-            status_code=200,
-            response=log_message,
-            timestamp=datetime.now()
-        )
-        db.add(db_log)
-        db.commit()
-        logger.info(log_message)
+        # Log per sampel lewat sink asinkron (disampel, disimpan batch)
+        api_log_sink.log("/sensor/create", "POST", 200,
+                         lambda: f"Data aroma kopi disimpan: {sensor_data.dict()}", sampled=True)
+        logger.debug("Data aroma kopi disimpan: %s", sensor_data)
 
         return db_sensor
 
@@ -84,85 +85,190 @@ def get_logs_api(db: Session, limit: int = 10):
     ]
 
 def create_log(db: Session, endpoint: str, method: str, status_code: int, response: str):
-    log = ApiLogs(
-        endpoint=endpoint,
-        method=method,
-        status_code=status_code,
-        response=response,
-        timestamp=datetime.now()
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
+    # Disimpan asinkron oleh api_log_sink; db dipertahankan untuk kompatibilitas pemanggil
+    api_log_sink.log(endpoint, method, status_code, response)
+    return api_log_sink.recent_logs(1)[0]
+
+CLASSIFICATION_KEYS = ("type", "confidence", "composition")
+# Baris per statement UPDATE ... FROM (VALUES ...), di bawah batas 65535 parameter PostgreSQL
+CLASSIFICATION_CHUNK_ROWS = 10000
+
+def parse_classification(item: dict):
+    """Memvalidasi satu hasil AI menjadi (kunci, payload).
+
+    Kunci ("id", sample_id) atau ("timestamp", (device_id, datetime)) menunjuk
+    sampel yang diklasifikasikan; None bila klien tidak mengirim keduanya.
+    Timestamp hanya beresolusi satu detik dan bisa sama antar perangkat, jadi
+    wajib disertai device_id. ValueError bila key wajib hilang atau kunci tidak
+    bisa di-parse.
+    """
+    missing = [key for key in CLASSIFICATION_KEYS if key not in item]
+    if missing:
+        raise ValueError(f"Missing required keys: {', '.join(missing)}")
+    payload = {key: item[key] for key in CLASSIFICATION_KEYS}
+    if item.get("sample_id") is not None:
+        return ("id", int(item["sample_id"])), payload
+    if item.get("timestamp") is not None:
+        if not item.get("device_id"):
+            raise ValueError("device_id is required with timestamp")
+        ts = item["timestamp"]
+        ts = ts if isinstance(ts, datetime) else datetime.fromisoformat(ts)
+        return ("timestamp", (str(item["device_id"]), ts)), payload
+    return None, payload
+
+def apply_classifications(db: Session, items) -> set:
+    """Menulis banyak (kunci, payload) sekaligus, tanpa commit; mengembalikan kunci yang menemukan sampelnya.
+
+    Satu statement per jenis kunci: UPDATE sensor_data SET ai_classification =
+    v.payload FROM (VALUES ...) AS v WHERE sensor_data.id = v.k (atau device_id
+    dan timestamp) RETURNING v.i, sehingga ribuan hasil cukup satu round trip
+    tanpa ORDER BY atau refresh, dan kunci yang tidak cocok bisa dilaporkan.
+    """
+    table = SensorData.__table__
+    payloads = [json.dumps(payload) for _, payload in items]
+    by_id = [(i, key[1], payloads[i]) for i, (key, _) in enumerate(items) if key[0] == "id"]
+    by_ts = [(i, key[1][0], key[1][1], payloads[i]) for i, (key, _) in enumerate(items) if key[0] == "timestamp"]
+    matched = set()
+    for start in range(0, len(by_id), CLASSIFICATION_CHUNK_ROWS):
+        v = values(column("i", Integer()), column("k", Integer()), column("payload", Text()), name="v")\
+            .data(by_id[start:start + CLASSIFICATION_CHUNK_ROWS])
+        stmt = update(table).where(table.c.id == v.c.k)\
+            .values(ai_classification=v.c.payload).returning(v.c.i)
+        matched.update(db.execute(stmt).scalars())
+    for start in range(0, len(by_ts), CLASSIFICATION_CHUNK_ROWS):
+        v = values(column("i", Integer()), column("d", String()), column("k", DateTime(timezone=True)),
+                   column("payload", Text()), name="v").data(by_ts[start:start + CLASSIFICATION_CHUNK_ROWS])
+        stmt = update(table).where(table.c.device_id == v.c.d, table.c.timestamp == v.c.k)\
+            .values(ai_classification=v.c.payload).returning(v.c.i)
+        matched.update(db.execute(stmt).scalars())
+    return {items[i][0] for i in matched}
 
 def tentukan_jenis(data: dict) -> str:
-    # values = [float(data[key]) for key in ["mq135", "mq2", "mq4", "mq7"] if data.get(key) is not None]
-    # if not values:
-    #     return "Tidak Terdeteksi"
-    
-    # avg_value = sum(values) / len(values)
-    # if avg_value < 1.0:
-    #     return "Arabika"
-    # elif avg_value < 2.5:
-    #     return "Campuran"
-    # else:
-    #     return "Robusta"
-    
-    # Override hasil agar selalu Arabika
-    return f"90%arabika+10%robusta"
-
-
-def export_sensor_data_to_csv(db: Session, output_dir: str):
+    # Klasifikasi lokal (kNN NumPy, models/aroma_knn.npz) tanpa panggilan jaringan.
+    # Channel di luar mask (None) diisi model; channel aktif yang mati -> Tidak Terdeteksi
+    jenis = classify_batch([data])[0]
+    return jenis if jenis is not None else "Tidak Terdeteksi"
+
+
+EXPORT_FIELDS = ["id", "device_id", "timestamp"] + CHANNELS + ["jenis"]
+EXPORT_PENDING_FILE = ".export_pending.json"
+
+def _recover_export(db: Session, output_dir: str):
+    # Batch yang terputus sebelum commit dibatalkan dengan memotong file ke ukuran semula
+    pending_path = os.path.join(output_dir, EXPORT_PENDING_FILE)
+    if not os.path.exists(pending_path):
+        return
+    with open(pending_path) as f:
+        pending = json.load(f)
+    committed = db.query(SensorData.id).filter(
+        SensorData.id.in_(pending["ids"]), SensorData.exported == False
+    ).first() is None
+    if not committed:
+        for path, offset in pending["files"].items():
+            if os.path.exists(path):
+                with open(path, "r+") as f:
+                    f.truncate(offset)
+        logger.warning(f"Export batch tidak selesai, {len(pending['ids'])} baris akan diekspor ulang")
+    os.remove(pending_path)
+
+def export_sensor_data_to_csv(db: Session, output_dir: str, batch_size: int = 1000):
+    """Ekspor baris exported == False secara bertahap (keyset per id) ke file CSV harian.
+
+    Setiap batch ditulis (append + fsync) lalu ditandai exported di transaksi
+    sendiri, sehingga memori tetap kecil dan lock singkat. Posisi file sebelum
+    batch dicatat di file pending agar ekspor yang terputus bisa dilanjutkan
+    tanpa baris ganda.
+    """
     try:
-        data = db.query(SensorData).filter(SensorData.exported == False).all()
-        if not data:
-            return {"message": "No new data to export"}
+        _recover_export(db, output_dir)
+        pending_path = os.path.join(output_dir, EXPORT_PENDING_FILE)
+        last_id = 0
+        total = 0
+        files = set()
+        while True:
+            batch = db.query(
+                SensorData.id, SensorData.device_id, SensorData.timestamp, *volt_columns(), SensorData.jenis
+            ).filter(
+                SensorData.exported == False, SensorData.id > last_id
+            ).order_by(SensorData.id).limit(batch_size).all()
+            if not batch:
+                break
 
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        csv_file = os.path.join(output_dir, f"90%arabika+10%robusta.csv")
-        
-        with open(csv_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=["id", "timestamp", "mq135", "mq2", "mq4", "mq7", "jenis"])
-            writer.writeheader()
-            for d in data:
-                writer.writerow({
-                    "id": d.id,
-                    "timestamp": d.timestamp.isoformat(),
-                    "mq135": d.mq135,
-                    "mq2": d.mq2,
-                    "mq4": d.mq4,
-                    "mq7": d.mq7,
-                    "jenis": d.jenis
-                })
+            # File dirotasi per tanggal data
+            by_file = {}
+            for d in batch:
+                csv_file = os.path.join(output_dir, f"sensor_data_{d.timestamp.strftime('%Y-%m-%d')}.csv")
+                by_file.setdefault(csv_file, []).append(d)
+            ids = [d.id for d in batch]
+            offsets = {path: os.path.getsize(path) if os.path.exists(path) else 0 for path in by_file}
+            with open(pending_path + ".tmp", "w") as f:
+                json.dump({"ids": ids, "files": offsets}, f)
+            os.replace(pending_path + ".tmp", pending_path)
 
-        db.query(SensorData).filter(SensorData.exported == False).update({"exported": True})
-        db.commit()
+            for csv_file, rows in by_file.items():
+                with open(csv_file, 'a+', newline='') as f:
+                    # File lama (sebelum kolom device_id) tetap memakai header aslinya
+                    fieldnames = EXPORT_FIELDS
+                    if offsets[csv_file]:
+                        f.seek(0)
+                        fieldnames = next(csv.reader(f), None) or EXPORT_FIELDS
+                        f.seek(0, os.SEEK_END)
+                    writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+                    if offsets[csv_file] == 0:
+                        writer.writeheader()
+                    for d in rows:
+                        writer.writerow({
+                            "id": d.id,
+                            "device_id": d.device_id,
+                            "timestamp": d.timestamp.isoformat(),
+                            "mq135": d.mq135,
+                            "mq2": d.mq2,
+                            "mq4": d.mq4,
+                            "mq7": d.mq7,
+                            "jenis": d.jenis
+                        })
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            db.query(SensorData).filter(SensorData.id.in_(ids))\
+                .update({"exported": True}, synchronize_session=False)
+            db.commit()
+            os.remove(pending_path)
+
+            last_id = ids[-1]
+            total += len(batch)
+            files.update(by_file)
+
+        if not total:
+            return {"message": "No new data to export"}
 
-        logger.info(f"Exported {len(data)} rows to {csv_file}")
-        return {"message": f"Exported {len(data)} rows to {csv_file}"}
+        logger.info(f"Exported {total} rows to {sorted(files)}")
+        return {"message": f"Exported {total} rows to {', '.join(sorted(files))}"}
 
     except Exception as e:
         db.rollback()
         logger.error(f"Export error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
 
-def get_db_data_for_interval(db: Session, interval: str):
+def get_db_data_for_interval(db: Session, interval: str, hours: float = 1):
     try:
-        time_threshold = datetime.utcnow() - timedelta(hours=1)
+        now = datetime.now(timezone.utc)
+        time_threshold = now - timedelta(hours=hours)
+        # Lebar bucket (detik); selain "3s" dibaca dari tabel rollup
         interval_map = {
-            "3s": "3 seconds",
-            "30s": "30 seconds",
-            "1m": "1 minute",
-            "5m": "5 minutes",
-            "10m": "10 minutes"
+            "3s": None,
+            "30s": 30,
+            "1m": 60,
+            "5m": 300,
+            "10m": 600
         }
-        
+
         if interval not in interval_map:
             return []
 
         if interval == "3s":
-            data = db.query(SensorData).filter(SensorData.timestamp >= time_threshold)\
+            data = db.query(SensorData.timestamp, *volt_columns(), SensorData.jenis)\
+                .filter(SensorData.timestamp >= time_threshold)\
                 .order_by(SensorData.timestamp).all()
             return [
                 {
@@ -176,65 +282,69 @@ def get_db_data_for_interval(db: Session, interval: str):
                 for d in data
             ]
 
-        time_format = "%Y-%m-%d %H:%M:%S"
-        if interval in ["30s", "1m"]:
-            time_format = "%Y-%m-%d %H:%M:00"
-        elif interval in ["5m", "10m"]:
-            minute_divisor = 5 if interval == "5m" else 10
-            data = db.query(
-                func.strftime('%Y-%m-%d %H', SensorData.timestamp) +
-                ':' +
-                func.lpad((func.cast(func.strftime('%M', SensorData.timestamp), 'INTEGER') / minute_divisor) * minute_divisor, 2, '0') +
-                ':00.000000'
-                .label('time_bucket'),
-                func.avg(SensorData.mq135).label('mq135'),
-                func.avg(SensorData.mq2).label('mq2'),
-                func.avg(SensorData.mq4).label('mq4'),
-                func.avg(SensorData.mq7).label('mq7'),
-                func.max(SensorData.jenis).label('jenis')
-            ).filter(SensorData.timestamp >= time_threshold)\
-             .group_by('time_bucket')\
-             .order_by('time_bucket').all()
-            
-            return [
-                {
-                    "timestamp": d.time_bucket,
-                    "mq135": float(d.mq135) if d.mq135 is not None else None,
-                    "mq2": float(d.mq2) if d.mq2 is not None else None,
-                    "mq4": float(d.mq4) if d.mq4 is not None else None,
-                    "mq7": float(d.mq7) if d.mq7 is not None else None,
-                    "jenis": d.jenis
-                }
-                for d in data
-            ]
-
-        seconds = 30 if interval == "30s" else 60
-        data = db.query(
-            func.strftime('%Y-%m-%d %H:%M:', SensorData.timestamp) +
-            func.lpad((func.cast(func.strftime('%S', SensorData.timestamp), 'INTEGER') / seconds) * seconds, 2, '0') +
-            '.000000'
-            .label('time_bucket'),
-            func.avg(SensorData.mq135).label('mq135'),
-            func.avg(SensorData.mq2).label('mq2'),
-            func.avg(SensorData.mq4).label('mq4'),
-            func.avg(SensorData.mq7).label('mq7'),
-            func.max(SensorData.jenis).label('jenis')
-        ).filter(SensorData.timestamp >= time_threshold)\
-         .group_by('time_bucket')\
-         .order_by('time_bucket').all()
-
-        return [
-            {
-                "timestamp": d.time_bucket,
-                "mq135": float(d.mq135) if d.mq135 is not None else None,
-                "mq2": float(d.mq2) if d.mq2 is not None else None,
-                "mq4": float(d.mq4) if d.mq4 is not None else None,
-                "mq7": float(d.mq7) if d.mq7 is not None else None,
-                "jenis": d.jenis
-            }
-            for d in data
-        ]
+        return query_rollups(db, time_threshold, now, interval_map[interval])
 
     except Exception as e:
         logger.error(f"Error fetching DB data for interval {interval}: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def iter_sensor_export(session_factory, start: datetime, end: datetime, jenis: str = None,
+                       fmt: str = "csv", compress: bool = False, chunk_rows: int = 1000,
+                       device_id: str = DEVICE_ID):
+    """Generator sinkron untuk ekspor rentang waktu (dipakai StreamingResponse).
+
+    Baris dibaca lewat server-side cursor (yield_per), diserialisasi per potongan
+    chunk_rows dan, bila compress, dikompres gzip secara bertahap; memori tetap
+    konstan berapa pun panjang rentangnya. Sesi sendiri dipakai karena generator
+    berjalan setelah dependency request selesai.
+    """
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    fields = EXPORT_FIELDS
+
+    def emit(text):
+        data = text.encode()
+        return gz.compress(data) if gz else data
+
+    db = session_factory()
+    try:
+        stmt = select(
+            SensorData.id, SensorData.device_id, SensorData.timestamp, *volt_columns(), SensorData.jenis
+        ).where(SensorData.device_id == device_id, SensorData.timestamp >= start, SensorData.timestamp < end)
+        if jenis:
+            stmt = stmt.where(SensorData.jenis == jenis)
+        stmt = stmt.order_by(SensorData.timestamp).execution_options(yield_per=chunk_rows)
+
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(fields)
+        for part in db.execute(stmt).partitions():
+            for d in part:
+                if fmt == "csv":
+                    writer.writerow([d.id, d.device_id, d.timestamp.isoformat(), d.mq135, d.mq2, d.mq4, d.mq7, d.jenis])
+                else:
+                    buf.write(json.dumps({
+                        "id": d.id,
+                        "device_id": d.device_id,
+                        "timestamp": d.timestamp.isoformat(),
+                        "mq135": d.mq135,
+                        "mq2": d.mq2,
+                        "mq4": d.mq4,
+                        "mq7": d.mq7,
+                        "jenis": d.jenis
+                    }) + "\n")
+            chunk = emit(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+            if chunk:
+                yield chunk
+        tail = emit(buf.getvalue())
+        if gz:
+            tail += gz.flush()
+        if tail:
+            yield tail
+    finally:
+        db.close()
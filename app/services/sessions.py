@@ -0,0 +1,217 @@
+import threading
+import warnings
+from collections import Counter
+from datetime import datetime, timezone
+import logging
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import DEVICE_ID, SESSION_BASELINE_SECONDS, SESSION_STEADY_SECONDS
+from app.database import SessionLocal
+from app.models import MeasurementSession, SensorData
+from app.services.adc import CHANNELS, volt_columns
+
+logger = logging.getLogger(__name__)
+
+STATS = ("baseline", "peak", "steady", "time_to_peak")
+
+
+def summarize(ts, values, jenis, baseline_seconds=SESSION_BASELINE_SECONDS,
+              steady_seconds=SESSION_STEADY_SECONDS) -> dict:
+    """Ringkasan satu sesi dari array sampelnya (ts detik epoch, values N x 4, jenis N).
+
+    baseline      median `baseline_seconds` detik pertama
+    peak          nilai maksimum, time_to_peak detik sejak awal sesi
+    steady        rata-rata `steady_seconds` detik terakhir
+    final_jenis   label terbanyak di jendela steady-state
+    Tegangan <= 0 (pembacaan gagal yang disimpan sebagai 0 V) diabaikan.
+    """
+    summary = {f"{ch}_{stat}": None for ch in CHANNELS for stat in STATS}
+    summary.update(samples=len(ts), final_jenis=None)
+    if not len(ts):
+        return summary
+    t = np.asarray(ts, dtype=np.float64) - ts[0]
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(CHANNELS))
+    values = np.where(values > 0, values, np.nan)
+    valid = ~np.isnan(values)
+    head = t <= baseline_seconds
+    tail = t >= t[-1] - steady_seconds
+    with warnings.catch_warnings():
+        # Channel tanpa data (tidak aktif di sesi ini) menghasilkan NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        baseline = np.nanmedian(values[head], axis=0)
+        steady = np.nanmean(values[tail], axis=0)
+    peak_index = np.where(valid, values, -np.inf).argmax(axis=0)
+    peak = values[peak_index, np.arange(len(CHANNELS))]
+    for c, ch in enumerate(CHANNELS):
+        if not valid[:, c].any():
+            continue
+        summary[f"{ch}_baseline"] = None if np.isnan(baseline[c]) else float(baseline[c])
+        summary[f"{ch}_peak"] = float(peak[c])
+        summary[f"{ch}_steady"] = None if np.isnan(steady[c]) else float(steady[c])
+        summary[f"{ch}_time_to_peak"] = float(t[peak_index[c]])
+    labels = Counter(j for j in np.asarray(jenis, dtype=object)[tail] if j)
+    if labels:
+        summary["final_jenis"] = labels.most_common(1)[0][0]
+    return summary
+
+
+def session_to_dict(s: MeasurementSession) -> dict:
+    return {
+        "id": s.id,
+        "device_id": s.device_id,
+        "sensors": s.sensors.split(",") if s.sensors else [],
+        "started_at": s.started_at.isoformat() if s.started_at else None,
+        "ended_at": s.ended_at.isoformat() if s.ended_at else None,
+        "samples": s.samples,
+        "final_jenis": s.final_jenis,
+        "channels": {ch: {stat: getattr(s, f"{ch}_{stat}") for stat in STATS} for ch in CHANNELS},
+    }
+
+
+def summarize_from_db(db: Session, session_id: int) -> dict:
+    """Menghitung ulang ringkasan dari sampel sesi di sensor_data (satu scan lewat indeks session_id)."""
+    rows = db.query(SensorData.timestamp, *volt_columns(), SensorData.jenis)\
+        .filter(SensorData.session_id == session_id).order_by(SensorData.timestamp).all()
+    ts = np.array([row[0].timestamp() for row in rows], dtype=np.float64)
+    values = np.array([row[1:5] for row in rows], dtype=np.float64).reshape(-1, len(CHANNELS))
+    summary = summarize(ts, values, [row[5] for row in rows])
+    summary["ended_at"] = rows[-1][0] if rows else None
+    return summary
+
+
+class SessionManager:
+    """Sesi pengukuran aktif untuk akuisisi lokal.
+
+    open() membuat baris measurement_session saat akuisisi mulai dari keadaan
+    diam; setiap tick memanggil observe() yang mengembalikan session_id untuk
+    sampel dan menyimpan salinan kecilnya di memori. close() menghitung
+    ringkasan dari salinan tersebut (tanpa membaca ulang sensor_data, dan
+    tanpa menunggu writer mengosongkan antrian) lalu menyimpannya sekali.
+    """
+
+    def __init__(self, session_factory, device_id=DEVICE_ID):
+        self.session_factory = session_factory
+        self.device_id = device_id
+        self._lock = threading.Lock()
+        # open()/close() berurutan: dua start bersamaan tidak boleh membuat dua baris sesi
+        self._open_lock = threading.Lock()
+        self.current = None
+        self._ts = []
+        self._values = []
+        self._jenis = []
+
+    def open(self, sensors) -> int:
+        with self._open_lock:
+            return self._open(sensors)
+
+    def _open(self, sensors) -> int:
+        with self._lock:
+            if self.current is not None:
+                return self.current["id"]
+        db = self.session_factory()
+        try:
+            session = MeasurementSession(
+                device_id=self.device_id,
+                sensors=",".join(sorted(sensors)),
+                started_at=datetime.now(timezone.utc),
+                samples=0,
+            )
+            db.add(session)
+            db.commit()
+            db.refresh(session)
+        except Exception as e:
+            db.rollback()
+            # Akuisisi tetap berjalan, sampel saja yang tidak punya sesi
+            logger.error(f"❌ Gagal membuat sesi pengukuran: {e}")
+            return None
+        finally:
+            db.close()
+        with self._lock:
+            self.current = {"id": session.id, "started_at": session.started_at, "sensors": sorted(sensors)}
+            self._ts, self._values, self._jenis = [], [], []
+        logger.info(f"✅ Sesi pengukuran {session.id} dimulai ({session.sensors})")
+        return session.id
+
+    def observe(self, sample: dict):
+        """Dipanggil per tick akuisisi; session_id untuk sampel, None bila tidak ada sesi aktif."""
+        ts = sample["timestamp"]
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        with self._lock:
+            if self.current is None:
+                return None
+            self._ts.append(ts.timestamp())
+            self._values.append([sample.get(ch) for ch in CHANNELS])
+            self._jenis.append(sample.get("jenis"))
+            return self.current["id"]
+
+    def status(self) -> dict:
+        with self._lock:
+            if self.current is None:
+                return {"active": False}
+            return {"active": True, "id": self.current["id"], "sensors": self.current["sensors"],
+                    "started_at": self.current["started_at"].isoformat(), "samples": len(self._ts)}
+
+    def close(self):
+        """Menutup sesi aktif dan menyimpan ringkasannya; dict sesi atau None bila tidak ada."""
+        with self._open_lock:
+            with self._lock:
+                current, self.current = self.current, None
+                ts, values, jenis = self._ts, self._values, self._jenis
+                self._ts, self._values, self._jenis = [], [], []
+            if current is None:
+                return None
+            summary = summarize(np.array(ts), np.array(values, dtype=np.float64), jenis)
+            summary["ended_at"] = datetime.now(timezone.utc)
+            return self._store(current["id"], summary)
+
+    def _store(self, session_id: int, summary: dict):
+        db = self.session_factory()
+        try:
+            updated = db.query(MeasurementSession).filter(MeasurementSession.id == session_id)\
+                .update(summary, synchronize_session=False)
+            db.commit()
+            if not updated:
+                return None
+            session = db.get(MeasurementSession, session_id)
+            logger.info(f"✅ Sesi pengukuran {session_id} ditutup: {summary['samples']} sampel, "
+                        f"{summary['final_jenis'] or '-'}")
+            return session_to_dict(session)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Gagal menyimpan ringkasan sesi {session_id}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def resummarize(self, session_id: int, fallback_end=None):
+        """Ringkasan ulang dari sensor_data, mis. setelah kalibrasi atau impor data.
+
+        ended_at diisi dari sampel terakhir; sesi tanpa sampel memakai `fallback_end` bila ada.
+        """
+        db = self.session_factory()
+        try:
+            summary = summarize_from_db(db, session_id)
+        finally:
+            db.close()
+        if summary["ended_at"] is None:
+            summary["ended_at"] = fallback_end
+        if summary["ended_at"] is None:
+            summary.pop("ended_at")
+        return self._store(session_id, summary)
+
+    def recover(self):
+        # Saat startup: sesi yang tidak sempat ditutup (crash/restart) diringkas dari sensor_data
+        db = self.session_factory()
+        try:
+            orphans = db.query(MeasurementSession.id, MeasurementSession.started_at).filter(
+                MeasurementSession.device_id == self.device_id, MeasurementSession.ended_at.is_(None)).all()
+        except Exception as e:
+            logger.warning(f"⚠️ Sesi terbuka tidak bisa diperiksa: {e}")
+            return []
+        finally:
+            db.close()
+        return [self.resummarize(session_id, fallback_end=started_at) for session_id, started_at in orphans]
+
+
+session_manager = SessionManager(SessionLocal)
@@ -64,10 +64,13 @@ function initializeIntervalSelect() {
         { value: '10s', text: '10 detik' },
         { value: '30s', text: '30 detik' },
         { value: '1min', text: '1 menit' },
-        { value: '5min', text: '5 menit' }
+        { value: '5min', text: '5 menit' },
+        { value: '1h', text: '1 jam' },
+        { value: '24h', text: '24 jam' },
+        { value: '7d', text: '7 hari' }
     ];
     const currentOptions = Array.from(intervalSelect.options).map(opt => opt.value);
-    if (currentOptions.length < expectedOptions.length || !currentOptions.includes('10s')) {
+    if (currentOptions.length < expectedOptions.length || !currentOptions.includes('10s') || !currentOptions.includes('7d')) {
         intervalSelect.innerHTML = '';
         expectedOptions.forEach(opt => {
             const option = document.createElement('option');
@@ -76,11 +79,12 @@ function initializeIntervalSelect() {
             if (opt.value === '3s') option.selected = true;
             intervalSelect.appendChild(option);
         });
-        log('Initialized interval options: 3s, 10s, 30s, 1min, 5min');
+        log('Initialized interval options: 3s, 10s, 30s, 1min, 5min, 1h, 24h, 7d');
     }
 }
 
 const maxDataPoints = 1200;
+const historyRanges = ['1h', '24h', '7d'];
 const chartData = {
     labels: [],
     datasets: [
@@ -165,7 +169,11 @@ async function fetchChartData(interval) {
         if (sensorTableBody) sensorTableBody.innerHTML = '';
         sensorChart.update();
 
-        const response = await fetch(`/sensor/data/db/${interval}`);
+        // Rentang panjang dibaca dari rollup, rentang pendek dari data mentah
+        const url = historyRanges.includes(interval) ? `/sensor/data/history/${interval}` : `/sensor/data/db/${interval}`;
+        // Jumlah titik dibatasi sesuai lebar grafik; server melakukan downsampling LTTB
+        const maxPoints = Math.max(200, Math.min(maxDataPoints, sensorChartCanvas.clientWidth || maxDataPoints));
+        const response = await fetch(`${url}?max_points=${maxPoints}`);
         if (!response.ok) throw new Error(`HTTP error: ${response.status}`);
         const data = await response.json();
         if (data.length === 0) {
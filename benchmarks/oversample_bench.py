@@ -0,0 +1,111 @@
+"""Benchmark tahap oversample-and-decimate (app/services/oversampling.py).
+
+Rekaman data/*.csv dipakai sebagai sinyal acuan. Untuk setiap sampel keluaran
+dibuat K konversi sintetis per channel: acuan + derau gaussian, sebagian
+diganti lonjakan (outlier) dan sebagian jatuh ke 0 (dropout), seperti pada
+data_volts_2025-06-02_*. Setiap buffer K x 4 didesimasi lewat Decimator persis
+seperti di scheduler ADS1115, lalu dilaporkan biaya CPU per sampel keluaran,
+galat RMS terhadap acuan dan persentase keluaran kosong/dropout.
+
+K=1 adalah baseline tanpa oversampling: konversi tunggal disimpan apa adanya
+(dropout menjadi 0 V).
+
+Contoh:
+    python benchmarks/oversample_bench.py --k 1 4 8 16 --filters median mean
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark oversampling + filter digital")
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 4, 8, 16], help="Konversi per channel per sampel")
+    parser.add_argument("--filters", nargs="+", default=["median", "mean"], choices=["median", "mean"])
+    parser.add_argument("--files", default="data/*.csv", help="File rekaman acuan (dipisah koma, boleh glob)")
+    parser.add_argument("--samples", type=int, default=5000, help="Jumlah sampel keluaran")
+    parser.add_argument("--noise", type=float, default=40.0, help="Simpangan baku derau per konversi (hitungan)")
+    parser.add_argument("--spike-rate", type=float, default=0.02, help="Peluang konversi menjadi outlier")
+    parser.add_argument("--dropout-rate", type=float, default=0.02, help="Peluang konversi jatuh ke 0")
+    parser.add_argument("--reject", type=float, default=3.5, help="Ambang outlier (kelipatan MAD)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Cetak hasil sebagai JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import numpy as np
+    from app.services.adc import counts_to_volts, volts_to_counts
+    from app.services.oversampling import Decimator
+    from app.services.replay_reader import CHANNELS, load_recording, resolve_files
+
+    fsr_mv = 4096
+    rows = [values for path in resolve_files(args.files) for _, values in load_recording(path)]
+    if not rows:
+        raise SystemExit(f"Tidak ada rekaman yang cocok: {args.files}")
+    reference = np.array([[r[ch] for ch in CHANNELS] for r in rows], dtype=np.float64)
+    # Sampel acuan yang sendirinya dropout (0 V) tidak bisa dinilai
+    reference = reference[(reference > 0).all(axis=1)][:args.samples]
+    truth = volts_to_counts(reference, fsr_mv).astype(np.float64)
+    n, channels = truth.shape
+    rng = np.random.default_rng(args.seed)
+
+    results = []
+    for k in args.k:
+        # Semua konversi dibuat di muka agar yang diukur hanya desimasi
+        conversions = truth[:, None, :] + rng.normal(0.0, args.noise, (n, k, channels))
+        spikes = rng.random((n, k, channels)) < args.spike_rate
+        conversions[spikes] += rng.choice([-1, 1], spikes.sum()) * rng.uniform(2000, 8000, spikes.sum())
+        conversions[rng.random((n, k, channels)) < args.dropout_rate] = 0.0
+        conversions = np.clip(np.rint(conversions), 0, 32767)
+
+        for method in (args.filters if k > 1 else ["none"]):
+            output = np.empty((n, channels))
+            started = time.perf_counter()
+            if k == 1:
+                output[:] = conversions[:, 0, :]
+            else:
+                decimator = Decimator(k, channels, method, args.reject)
+                for i in range(n):
+                    decimator.buffer[:] = conversions[i]
+                    output[i] = decimator.decimate()
+            elapsed = time.perf_counter() - started
+
+            # Baseline menyimpan dropout sebagai 0 V; tahap filter mengeluarkan NaN (nilai valid terakhir dipakai)
+            empty = np.isnan(output) | (output <= 0)
+            error = counts_to_volts(np.where(empty, np.nan, output) - truth, fsr_mv) * 1000
+            results.append({
+                "k": k,
+                "filter": method,
+                "samples": n,
+                "us_per_output": elapsed / n * 1e6,
+                "ns_per_conversion": elapsed / (n * k * channels) * 1e9,
+                "rms_error_mv": float(np.sqrt(np.nanmean(error ** 2))),
+                "max_error_mv": float(np.nanmax(np.abs(error))),
+                "empty_pct": float(empty.mean() * 100),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Acuan: {n} sampel x {channels} channel, derau {args.noise} hitungan, "
+          f"outlier {args.spike_rate:.1%}, dropout {args.dropout_rate:.1%}")
+    header = f"{'K':>3} {'filter':>7} {'us/out':>8} {'ns/conv':>8} {'rms mV':>8} {'max mV':>9} {'kosong %':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['k']:>3} {r['filter']:>7} {r['us_per_output']:>8.1f} {r['ns_per_conversion']:>8.1f} "
+              f"{r['rms_error_mv']:>8.2f} {r['max_error_mv']:>9.1f} {r['empty_pct']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# Tanpa Raspberry Pi: sensor dibaca dari rekaman data/*.csv (harus diset sebelum app.config diimpor)
+os.environ.setdefault("SENSOR_BACKEND", "replay")
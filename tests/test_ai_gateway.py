@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services import ai_stub
+from app.services.ai_gateway import AIGateway, AIGatewayError, CircuitOpenError
+
+
+@pytest.fixture
+def stub():
+    # Stub AI dijalankan in-process lewat ASGITransport; loop klasifikasinya tidak pernah dimulai
+    ai_stub.faults.update(delay=0.0, fail_rate=0.0, status=503)
+    ai_stub.stats.update(requests=0, injected_failures=0)
+    yield ai_stub
+    ai_stub.faults.update(fail_rate=0.0)
+
+
+def post(gateway, path, **kwargs):
+    # Klien baru per panggilan (asyncio.run membuat event loop baru); breaker dan counter tetap milik gateway
+    async def run():
+        gateway.client = httpx.AsyncClient(base_url="http://ai-stub",
+                                           transport=httpx.ASGITransport(app=ai_stub.app))
+        try:
+            return await gateway.post(path, **kwargs)
+        finally:
+            await gateway.client.aclose()
+    return asyncio.run(run())
+
+
+def test_idempotent_call_is_retried(stub):
+    stub.faults.update(fail_rate=1.0)
+    with pytest.raises(AIGatewayError):
+        post(AIGateway("http://ai-stub", retries=2, backoff=0.001), "/stop-ai", idempotent=True)
+    assert stub.stats["requests"] == 3
+
+
+def test_non_idempotent_call_is_not_retried_after_sending(stub):
+    stub.faults.update(fail_rate=1.0)
+    gateway = AIGateway("http://ai-stub", retries=2, backoff=0.001)
+    with pytest.raises(AIGatewayError):
+        post(gateway, "/start-ai")
+    assert stub.stats["requests"] == 1
+    assert gateway.counters["retries"] == 0
+
+
+def test_stop_when_already_stopped_is_success(stub):
+    assert post(AIGateway("http://ai-stub"), "/stop-ai", idempotent=True)["status"] == "success"
+
+
+def test_breaker_opens_then_half_open_probe_closes_it(stub):
+    stub.faults.update(fail_rate=1.0)
+    gateway = AIGateway("http://ai-stub", retries=0, breaker_threshold=2, breaker_reset=0.05)
+    for _ in range(2):
+        with pytest.raises(AIGatewayError):
+            post(gateway, "/stop-ai", idempotent=True)
+    assert gateway.breaker.state == "open"
+
+    # Breaker terbuka: ditolak tanpa request ke stub
+    with pytest.raises(CircuitOpenError):
+        post(gateway, "/stop-ai", idempotent=True)
+    assert stub.stats["requests"] == 2
+
+    time.sleep(0.06)
+    stub.faults.update(fail_rate=0.0)
+    post(gateway, "/stop-ai", idempotent=True)
+    assert gateway.breaker.state == "closed"
+
+
+def test_failed_half_open_probe_reopens_breaker(stub):
+    stub.faults.update(fail_rate=1.0)
+    gateway = AIGateway("http://ai-stub", retries=0, breaker_threshold=1, breaker_reset=0.0)
+    gateway.breaker.record_failure()
+    with pytest.raises(AIGatewayError):
+        post(gateway, "/stop-ai", idempotent=True)
+    assert gateway.breaker.state == "open"
+
+
+def test_cancelled_half_open_probe_releases_breaker():
+    gateway = AIGateway("http://ai-stub", retries=0, breaker_threshold=1, breaker_reset=0.0)
+    gateway.breaker.record_failure()
+
+    async def cancelled(*args, **kwargs):
+        raise asyncio.CancelledError()
+
+    gateway.client = httpx.AsyncClient(base_url="http://ai-stub")
+    gateway.client.post = cancelled
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(gateway.post("/start-ai"))
+    assert gateway.breaker.state == "half-open"
+    assert gateway.breaker.allow()
@@ -0,0 +1,28 @@
+import pytest
+
+from app.services.calibration import CalibrationStore, save_capture
+
+FAILED = {"mq135": None, "mq2": None, "mq4": None, "mq7": None}
+
+
+def test_failed_capture_writes_nothing(tmp_path):
+    store = CalibrationStore(str(tmp_path / "calibration.json"))
+    with pytest.raises(ValueError):
+        save_capture("nose-2", FAILED, samples=0, store=store)
+    assert not (tmp_path / "calibration.json").exists()
+    assert store.get("nose-2") is None
+
+
+def test_partial_capture_reports_channel_status(tmp_path):
+    store = CalibrationStore(str(tmp_path / "calibration.json"))
+    save_capture("nose-2", {**FAILED, "mq135": 10.0}, samples=40, store=store)
+    entry = save_capture("nose-2", {**FAILED, "mq4": 5.0}, samples=40, store=store)
+
+    assert entry["complete"] is False
+    assert entry["channels"] == {"mq135": "previous", "mq2": "missing", "mq4": "calibrated", "mq7": "missing"}
+    assert entry["r0"]["mq135"] == 10.0
+
+    # Capture yang gagal total tidak menimpa R0 dan calibrated_at yang ada
+    with pytest.raises(ValueError):
+        save_capture("nose-2", FAILED, samples=40, store=store)
+    assert CalibrationStore(store.path).devices()["nose-2"]["calibrated_at"] == entry["calibrated_at"]
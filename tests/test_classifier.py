@@ -0,0 +1,25 @@
+import numpy as np
+
+from app.services import classifier
+from app.services.classifier import AromaClassifier, classify_batch, usable_rows
+
+
+def test_usable_rows_ignores_inactive_channels_but_not_dead_ones():
+    nan = np.nan
+    X = [[2.5, nan, nan, nan],   # satu sensor aktif
+         [2.5, 0.0, 3.7, 1.7],   # mq2 aktif tapi mati
+         [0.0, 0.0, 0.0, 0.0],   # bus mati
+         [nan, nan, nan, nan],   # tidak ada sensor aktif
+         [2.5, 2.1, 3.7, 1.7]]
+    assert usable_rows(X).tolist() == [True, False, False, False, True]
+
+
+def test_classify_batch_labels_single_sensor_runs(monkeypatch):
+    X = np.array([[1.0, 1.0, 1.0, 1.0], [1.1, 1.0, 1.0, 1.0], [3.0, 3.0, 3.0, 3.0], [3.1, 3.0, 3.0, 3.0]])
+    model = AromaClassifier.fit(X, ["arabika", "arabika", "robusta", "robusta"], k=1)
+    monkeypatch.setattr(classifier, "_model", model)
+
+    samples = [{"mq135": 3.05, "mq2": None, "mq4": None, "mq7": None},
+               {"mq135": 1.0, "mq2": 0.0, "mq4": 1.0, "mq7": 1.0}]
+    assert classify_batch(samples) == ["robusta", None]
+
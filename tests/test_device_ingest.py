@@ -0,0 +1,23 @@
+from app.services.device_ingest import MAX_JENIS, validate_batch
+
+
+def test_validate_batch_rejects_bad_rows_individually():
+    records = [
+        {"timestamp": "2025-06-01T10:00:00+07:00", "mq135": 2.48, "mq2": 2.06, "jenis": "arabika"},
+        {"timestamp": 1748746800, "mq135": 1.0},
+        {"timestamp": "2025-06-01T10:00:01+07:00", "mq135": 1.0, "jenis": 5},
+        {"timestamp": "2025-06-01T10:00:02+07:00", "mq135": 1.0, "jenis": "x" * (MAX_JENIS + 1)},
+        {"timestamp": "2025-06-01T10:00:03+07:00", "mq135": 9.0},
+        {"timestamp": "kemarin", "mq135": 1.0},
+        {"timestamp": "2025-06-01T10:00:04+07:00"},
+        {"timestamp": "2025-06-01T10:00:05+07:00", "mq135": "abc"},
+        "bukan objek",
+        {"timestamp": "2025-06-01T10:00:06+07:00", "mq135": 1.0, "device_id": "nose-3"},
+    ]
+    rows, rejected = validate_batch(records, default_device="nose-2")
+
+    assert [r["device_id"] for r in rows] == ["nose-2", "nose-2", "nose-3"]
+    assert rows[0]["jenis"] == "arabika" and rows[0]["mq4"] is None
+    assert rows[1]["timestamp"].tzinfo is not None
+    assert [r["index"] for r in rejected] == [2, 3, 4, 5, 6, 7, 8]
+    assert "jenis" in rejected[0]["error"] and "jenis" in rejected[1]["error"]
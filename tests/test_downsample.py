@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.services.downsample import downsample_indices, lttb_indices, minmax_indices
+
+
+def _signal(n=1000, spike=637):
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 50.0)
+    y[spike] = 10.0
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    x, y = _signal()
+    idx = lttb_indices(x, y, 50)
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 637 in idx
+
+
+def test_minmax_keeps_extremes_per_bucket():
+    x, y = _signal()
+    y[100] = -10.0
+    idx = minmax_indices(x, y, 40)
+    assert len(idx) <= 40
+    assert {0, len(x) - 1, 100, 637} <= set(idx.tolist())
+
+
+def test_short_input_returned_as_is():
+    x = np.arange(5, dtype=np.float64)
+    assert lttb_indices(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+    assert minmax_indices(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_nan_channel_does_not_break_selection():
+    x, y = _signal()
+    y[1::7] = np.nan  # lonjakan di 637 tetap valid
+    idx = lttb_indices(x, y, 50)
+    assert len(idx) == 50 and 637 in idx
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_indices_respects_budget_and_merges_channels(method):
+    x, y = _signal()
+    other = np.zeros_like(y)
+    other[250] = 5.0
+    dead = np.full_like(y, np.nan)
+    values = np.column_stack([y, other, dead, dead])
+    idx = downsample_indices(x, values, 100, method)
+    assert len(idx) <= 100
+    assert {637, 250} <= set(idx.tolist())
+
+
+def test_downsample_indices_rejects_unknown_method():
+    x, y = _signal()
+    with pytest.raises(ValueError):
+        downsample_indices(x, y[:, None], 10, "acak")
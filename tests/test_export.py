@@ -0,0 +1,71 @@
+import csv
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.sensor_service import EXPORT_PENDING_FILE, export_sensor_data_to_csv
+
+DAY = datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    # SQLite cukup untuk jalur ekspor; tabel dibuat manual karena model memakai partisi PostgreSQL
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE sensor_data (id INTEGER PRIMARY KEY, timestamp DATETIME, device_id TEXT,"
+            " mq135 FLOAT, mq2 FLOAT, mq4 FLOAT, mq7 FLOAT, mq135_raw INTEGER, mq2_raw INTEGER,"
+            " mq4_raw INTEGER, mq7_raw INTEGER, adc_fsr_mv INTEGER, session_id INTEGER, jenis TEXT,"
+            " ai_classification TEXT, exported BOOLEAN)"
+        ))
+        for i in range(1, 6):
+            conn.execute(text(
+                "INSERT INTO sensor_data (id, timestamp, device_id, mq135, jenis, exported)"
+                " VALUES (:id, :ts, 'local', :v, 'arabika', 0)"
+            ), {"id": i, "ts": DAY.replace(second=i), "v": float(i)})
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _ids(path):
+    with open(path, newline="") as f:
+        return [int(r["id"]) for r in csv.DictReader(f)]
+
+
+def test_interrupted_batch_is_truncated_and_reexported(db, tmp_path):
+    csv_path = os.path.join(tmp_path, "sensor_data_2025-06-01.csv")
+    assert export_sensor_data_to_csv(db, str(tmp_path), batch_size=2)["message"].startswith("Exported 5")
+    db.execute(text("UPDATE sensor_data SET exported = 0 WHERE id IN (4, 5)"))
+    db.commit()
+
+    # Batch 4-5 sudah ditulis ke CSV tapi proses mati sebelum commit
+    offset = 0
+    with open(csv_path, newline="") as f:
+        for line in f:
+            offset += len(line.encode())
+            if line.startswith("3,"):
+                break
+    with open(tmp_path / EXPORT_PENDING_FILE, "w") as f:
+        json.dump({"ids": [4, 5], "files": {csv_path: offset}}, f)
+
+    export_sensor_data_to_csv(db, str(tmp_path))
+    assert _ids(csv_path) == [1, 2, 3, 4, 5]
+    assert not os.path.exists(tmp_path / EXPORT_PENDING_FILE)
+
+
+def test_committed_batch_is_kept(db, tmp_path):
+    csv_path = os.path.join(tmp_path, "sensor_data_2025-06-01.csv")
+    export_sensor_data_to_csv(db, str(tmp_path))
+    # Proses mati setelah commit tapi sebelum file pending dihapus
+    with open(tmp_path / EXPORT_PENDING_FILE, "w") as f:
+        json.dump({"ids": [4, 5], "files": {csv_path: 0}}, f)
+
+    assert export_sensor_data_to_csv(db, str(tmp_path)) == {"message": "No new data to export"}
+    assert _ids(csv_path) == [1, 2, 3, 4, 5]
+    assert not os.path.exists(tmp_path / EXPORT_PENDING_FILE)
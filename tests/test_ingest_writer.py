@@ -0,0 +1,78 @@
+import json
+import os
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services.ingest_writer import IngestWriter
+
+
+class FakeWriter(IngestWriter):
+    """IngestWriter dengan _insert di memori: sampel {"bad": True} ditolak, `down` meniru database mati."""
+
+    def __init__(self, tmp_path, **options):
+        super().__init__(None, journal_path=str(tmp_path / "journal.ndjson"),
+                         dead_letter_path=str(tmp_path / "dead_letter.ndjson"), **options)
+        self.rows = []
+        self.down = False
+        self.fail_after = None
+
+    def _insert(self, samples):
+        if self.down or (self.fail_after is not None and len(self.rows) >= self.fail_after):
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(s.get("bad") for s in samples):
+            raise IntegrityError("INSERT", {}, Exception("violates check constraint"))
+        ids = list(range(len(self.rows) + 1, len(self.rows) + len(samples) + 1))
+        self.rows.extend(samples)
+        return ids
+
+
+def sample(n, **extra):
+    return {"timestamp": f"2025-06-01T10:00:{n:02d}", "mq135": 1.0, "n": n, **extra}
+
+
+def test_rejected_rows_are_bisected_into_dead_letter(tmp_path):
+    writer = FakeWriter(tmp_path)
+    batch = [sample(n, bad=n in (2, 5)) for n in range(8)]
+    committed, remaining, error = writer._write(batch)
+
+    assert [s["n"] for s in committed] == [0, 1, 3, 4, 6, 7]
+    assert [s["id"] for s in committed] == [1, 2, 3, 4, 5, 6]
+    assert not remaining and error is None
+    with open(writer.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [d["sample"]["n"] for d in dead] == [2, 5]
+    assert "check constraint" in dead[0]["error"]
+
+
+def test_outage_spills_to_journal_and_replays_in_order(tmp_path):
+    writer = FakeWriter(tmp_path, retry_interval=0.0)
+    writer.down = True
+    writer._flush([(0.0, sample(n)) for n in range(5)])
+    assert writer.journal_size() and not writer.rows
+
+    # Database pulih, tetapi putus lagi di tengah replay: offset menyimpan kemajuan
+    writer.down = False
+    writer.batch_size = 2
+    writer.fail_after = 2
+    writer._replay_journal()
+    assert [s["n"] for s in writer.rows] == [0, 1]
+    assert writer.has_journal()
+
+    writer.fail_after = None
+    writer._replay_journal()
+    assert [s["n"] for s in writer.rows] == [0, 1, 2, 3, 4]
+    assert not writer.has_journal()
+    assert not os.path.exists(writer.journal_path + ".replay.offset")
+
+
+def test_stop_drains_queue(tmp_path):
+    committed = []
+    writer = FakeWriter(tmp_path, batch_size=1000, flush_interval=60.0)
+    writer.commit_hook = committed.extend
+    for n in range(50):
+        writer.submit(sample(n))
+    writer.start()
+    writer.stop()
+
+    assert [s["n"] for s in writer.rows] == list(range(50))
+    assert len(committed) == 50 and writer.queue.empty()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.services.oversampling import Decimator, decimate
+
+
+def test_mad_rejects_spike_and_dropout():
+    buf = np.array([[100.0], [101.0], [99.0], [100.0], [5000.0], [0.0], [np.nan], [100.0]])
+    out, used = decimate(buf, "mean", reject=3.5)
+    assert used.tolist() == [5]
+    assert out[0] == pytest.approx(100.0)
+
+
+def test_floor_keeps_one_lsb_jitter_on_flat_signal():
+    # MAD nol pada sinyal datar; lantai 1 LSB mencegah semua konversi terbuang
+    buf = np.array([[200.0], [200.0], [200.0], [201.0], [200.0]])
+    out, used = decimate(buf, "median", reject=3.5)
+    assert used.tolist() == [5] and out[0] == 200.0
+
+
+def test_without_reject_spike_pulls_mean():
+    buf = np.array([[100.0], [100.0], [100.0], [500.0]])
+    out, used = decimate(buf, "mean", reject=0)
+    assert used.tolist() == [4] and out[0] == 200.0
+
+
+def test_min_valid_yields_nan_per_channel():
+    buf = np.array([[100.0, 0.0], [100.0, 0.0], [100.0, 50.0]])
+    out, used = decimate(buf, "median", min_valid=2)
+    assert out[0] == 100.0 and np.isnan(out[1])
+    assert used.tolist() == [3, 1]
+
+
+def test_decimator_tracks_stats_and_resets_buffer():
+    dec = Decimator(k=4, channels=2, method="median")
+    dec.buffer[:] = [[100.0, 0.0], [102.0, 0.0], [101.0, 0.0], [9000.0, 0.0]]
+    out = dec.decimate()
+    assert out[0] == 101.0 and np.isnan(out[1])
+    assert dec.stats == {"outputs": 1, "conversions": 8, "discarded": 5, "empty": 1}
+    assert np.isnan(dec.buffer).all()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        Decimator(k=0, channels=4)
+    with pytest.raises(ValueError):
+        decimate(np.ones((2, 2)), "modus")
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.services.adc import counts_to_volts, gain_range_mv
+from app.services.replay_reader import ReplaySource, load_recording, parse_recording
+
+
+@pytest.mark.parametrize("gain", [2 / 3, 1, 2])
+def test_replayed_counts_convert_back_at_configured_gain(gain):
+    fsr_mv = gain_range_mv(gain)
+    source = ReplaySource([(0.0, {"mq135": 1.234, "mq2": 5.5})], speed=0, fsr_mv=fsr_mv)
+    count = source.channel("mq135").value
+    assert float(counts_to_volts(count, fsr_mv)) == pytest.approx(1.234, abs=fsr_mv / 32767e3)
+    # Di atas rentang PGA hitungan jenuh seperti ADC sungguhan
+    assert source.channel("mq2").value == (32767 if fsr_mv < 5500 else round(5.5 / fsr_mv * 32767e3))
+
+
+def test_recording_parsing_shared_by_replay_and_dataset(tmp_path):
+    path = tmp_path / "arabika.csv"
+    path.write_text(
+        "timestamp,mq135,mq2,mq4,mq7,kualitas\n"
+        "2025-06-01T10:00:00,1.0,,1.5,2.0,arabika\n"
+        "rusak,1.0,1.0,1.0,1.0,arabika\n"
+        "2025-06-01T10:00:02,1.1,abc,1.6,2.1,\n"
+    )
+    ts, values, tags = parse_recording(str(path))
+    assert ts.tolist() == [ts[0], ts[0] + 2]
+    assert np.isnan(values[:, 1]).all() and values[1, 0] == 1.1
+    assert tags == ["arabika", ""]
+
+    # Replay memutar nilai kosong sebagai 0 V
+    assert load_recording(str(path)) == [
+        (0.0, {"mq135": 1.0, "mq2": 0.0, "mq4": 1.5, "mq7": 2.0}),
+        (2.0, {"mq135": 1.1, "mq2": 0.0, "mq4": 1.6, "mq7": 2.1}),
+    ]
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+
+from app.services.rollup import aggregate_rows
+
+
+def _row(second, mq135, jenis=None):
+    ts = datetime(2025, 6, 1, 10, 0, second, tzinfo=timezone.utc)
+    return {"timestamp": ts, "mq135": mq135, "mq2": None, "mq4": 1.0, "mq7": 1.0, "jenis": jenis}
+
+
+def test_aggregate_rows_skips_dead_reads_and_keeps_last_label():
+    rows = [_row(0, 2.0, "arabika"), _row(1, 0.0, "robusta"), _row(2, 4.0, "arabika"), _row(3, None)]
+    bucket = next(p for p in aggregate_rows(rows) if p["resolution"] == 10)
+
+    assert bucket["samples"] == 4
+    assert bucket["mq135_count"] == 2
+    assert bucket["mq135_sum"] == 6.0
+    assert (bucket["mq135_min"], bucket["mq135_max"]) == (2.0, 4.0)
+    assert bucket["mq2_count"] == 0 and bucket["mq2_sum"] is None
+    assert bucket["jenis"] is None  # label sampel terakhir di bucket
+
+
+def test_aggregate_rows_splits_buckets_per_resolution():
+    rows = [_row(0, 1.0), _row(9, 1.0), _row(10, 1.0)]
+    partials = aggregate_rows(rows)
+    assert [p["samples"] for p in partials if p["resolution"] == 10] == [2, 1]
+    assert [p["samples"] for p in partials if p["resolution"] == 60] == [3]
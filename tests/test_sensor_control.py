@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+from app import main
+
+
+def test_stop_single_sensor_after_start_all(monkeypatch):
+    closed = []
+    # Tanpa database dan thread ekspor: hanya mask akuisisi dan siklus sesi yang diuji
+    monkeypatch.setattr(main.session_manager, "open", lambda mask: 1)
+    monkeypatch.setattr(main.session_manager, "close", lambda: closed.append(True))
+    monkeypatch.setattr(main, "export_loop", lambda: None)
+    main.acquisition.set_mask(())
+    client = TestClient(main.app)
+
+    assert client.post("/sensor/start/all").json()["session_id"] == 1
+    assert main.acquisition.mask == {"all"}
+
+    client.post("/sensor/stop/mq135")
+    assert main.acquisition.mask == {"mq2", "mq4", "mq7"}
+    assert not closed
+
+    for sensor in ("mq2", "mq4", "mq7"):
+        client.post(f"/sensor/stop/{sensor}")
+    assert not main.acquisition.mask
+    assert closed == [True]
+
+
+def test_stop_all_route_stops_every_sensor(monkeypatch):
+    monkeypatch.setattr(main.session_manager, "open", lambda mask: 1)
+    monkeypatch.setattr(main.session_manager, "close", lambda: None)
+    monkeypatch.setattr(main, "export_loop", lambda: None)
+    main.acquisition.set_mask(())
+    client = TestClient(main.app)
+
+    client.post("/sensor/start/mq2")
+    client.post("/sensor/start/mq7")
+    client.post("/sensor/stop/all")
+    assert not main.acquisition.mask
@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.services.sessions import summarize
+
+
+def _session():
+    # 0..59 detik: baseline 1.0, puncak 3.0 di detik 20, steady 2.0
+    ts = np.arange(60, dtype=np.float64) + 1_700_000_000
+    mq135 = np.full(60, 1.0)
+    mq135[15:40] = 2.5
+    mq135[20] = 3.0
+    mq135[40:] = 2.0
+    mq135[45] = 0.0  # pembacaan gagal
+    mq2 = np.full(60, np.nan)  # channel tidak aktif
+    values = np.column_stack([mq135, mq2, np.full(60, 0.5), np.full(60, 0.7)])
+    jenis = ["arabika"] * 50 + ["robusta"] * 4 + [None] * 6
+    return ts, values, jenis
+
+
+def test_summarize_stats_per_channel():
+    ts, values, jenis = _session()
+    s = summarize(ts, values, jenis, baseline_seconds=10, steady_seconds=10)
+    assert s["samples"] == 60
+    assert s["mq135_baseline"] == 1.0
+    assert (s["mq135_peak"], s["mq135_time_to_peak"]) == (3.0, 20.0)
+    assert s["mq135_steady"] == 2.0  # sampel 0 V diabaikan
+    assert all(s[f"mq2_{stat}"] is None for stat in ("baseline", "peak", "steady", "time_to_peak"))
+    assert s["mq4_peak"] == 0.5
+
+
+def test_final_jenis_from_steady_window_only():
+    ts, values, jenis = _session()
+    s = summarize(ts, values, jenis, baseline_seconds=10, steady_seconds=10)
+    # jendela steady (detik 49..59): 1 arabika, 4 robusta, sisanya kosong
+    assert s["final_jenis"] == "robusta"
+
+
+def test_empty_session():
+    s = summarize([], np.empty((0, 4)), [])
+    assert s["samples"] == 0 and s["final_jenis"] is None
+    assert s["mq7_peak"] is None